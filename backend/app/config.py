@@ -17,12 +17,61 @@ class Settings(BaseSettings):
         os.getenv("DATABASE_URL_DEV")  # fallback to dev if neither is set
     )
     
-    # Print the correct message based on environment
-    if environment == "production":
-        print("connecting to production db")
-    else:
-        print("connecting to development db")
-    
+    # Database connection pool (per worker process)
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", 5))
+    db_max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    db_pool_timeout: float = float(os.getenv("DB_POOL_TIMEOUT", 30))
+    db_pool_recycle: int = int(os.getenv("DB_POOL_RECYCLE", 1800))  # seconds, -1 disables
+    db_pool_pre_ping: bool = os.getenv("DB_POOL_PRE_PING", "True").lower() in ("true", "1", "t")
+    db_echo: bool = os.getenv("DB_ECHO", "False").lower() in ("true", "1", "t")
+
+    # bcrypt runs on its own thread pool; calls beyond max_pending are rejected with 429
+    password_hash_workers: int = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+    password_hash_max_pending: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 32))
+    password_hash_nice: int = int(os.getenv("PASSWORD_HASH_NICE", 10))  # scheduling priority of the hashing threads
+
+    # Token buckets for login/register/forgot-password, per client IP and per account; 0 per minute disables one
+    auth_rate_limit_enabled: bool = os.getenv("AUTH_RATE_LIMIT_ENABLED", "True").lower() in ("true", "1", "t")
+    auth_rate_limit_ip_per_minute: float = float(os.getenv("AUTH_RATE_LIMIT_IP_PER_MINUTE", 30))
+    auth_rate_limit_ip_burst: float = float(os.getenv("AUTH_RATE_LIMIT_IP_BURST", 10))
+    auth_rate_limit_account_per_minute: float = float(os.getenv("AUTH_RATE_LIMIT_ACCOUNT_PER_MINUTE", 6))
+    auth_rate_limit_account_burst: float = float(os.getenv("AUTH_RATE_LIMIT_ACCOUNT_BURST", 5))
+    auth_rate_limit_max_keys: int = int(os.getenv("AUTH_RATE_LIMIT_MAX_KEYS", 100000))
+    # Comma-separated IPs of the reverse proxies whose X-Forwarded-For is believed, so the
+    # per-IP buckets see the caller's address; "*" trusts any peer. Passed to uvicorn by run.py
+    trusted_proxies: str = os.getenv("TRUSTED_PROXIES", "127.0.0.1")
+
+    # Authenticated-user cache; a size or TTL of 0 disables it
+    user_cache_size: int = int(os.getenv("USER_CACHE_SIZE", 10000))
+    user_cache_ttl: float = float(os.getenv("USER_CACHE_TTL", 60))
+
+    # Email outbox sender; disable the worker in processes that shouldn't send mail
+    email_outbox_worker: bool = os.getenv("EMAIL_OUTBOX_WORKER", "True").lower() in ("true", "1", "t")
+    email_outbox_batch_size: int = int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", 50))
+    email_outbox_poll_interval: float = float(os.getenv("EMAIL_OUTBOX_POLL_INTERVAL", 5))  # seconds
+    email_outbox_max_attempts: int = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", 8))
+    email_outbox_backoff_base: float = float(os.getenv("EMAIL_OUTBOX_BACKOFF_BASE", 30))  # seconds, doubles per attempt
+    email_outbox_backoff_max: float = float(os.getenv("EMAIL_OUTBOX_BACKOFF_MAX", 3600))
+    email_outbox_claim_seconds: float = float(os.getenv("EMAIL_OUTBOX_CLAIM_SECONDS", 300))
+    email_outbox_retention_days: float = float(os.getenv("EMAIL_OUTBOX_RETENTION_DAYS", 7))  # for sent and failed emails
+
+    # Retention jobs: expired invitations, used/expired reset tokens, old outbox rows
+    maintenance_interval_hours: float = float(os.getenv("MAINTENANCE_INTERVAL_HOURS", 6))
+    maintenance_chunk_size: int = int(os.getenv("MAINTENANCE_CHUNK_SIZE", 1000))  # rows per delete
+    maintenance_chunk_pause: float = float(os.getenv("MAINTENANCE_CHUNK_PAUSE", 0.1))  # seconds between deletes
+    # Set to False on processes that should never run the retention jobs
+    maintenance_scheduler: bool = os.getenv("MAINTENANCE_SCHEDULER", "True").lower() in ("true", "1", "t")
+
+    # Leader election for the retention jobs when several workers run: a Postgres
+    # advisory lock, or a file lock (next to the SQLite file by default) otherwise
+    leader_lock_id: int = int(os.getenv("LEADER_LOCK_ID", 727_001))
+    leader_lock_file: str = os.getenv("LEADER_LOCK_FILE", "")
+    leader_poll_interval: float = float(os.getenv("LEADER_POLL_INTERVAL", 5))  # seconds, also the failover time
+
+    # Hot list endpoints send their payload with orjson, skipping response_model
+    # validation (see app/responses.py); False validates every response again
+    fast_json_responses: bool = os.getenv("FAST_JSON_RESPONSES", "True").lower() in ("true", "1", "t")
+
     secret_key: str = os.getenv("SECRET_KEY")
     algorithm: str = os.getenv("ALGORITHM")
     access_token_expire_minutes: int = int(
@@ -37,10 +86,6 @@ class Settings(BaseSettings):
         else "http://localhost:5173",
         "http://localhost:5173"  # fallback to localhost if neither is set
     )
-    if environment == "production":
-        print("connecting to production frontend")
-    else:
-        print("connecting to development frontend")
 
 
 # Create settings instance
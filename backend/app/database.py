@@ -1,8 +1,93 @@
+import importlib
+from sqlalchemy import event
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
 from app.config import settings
+from app.metrics import instrument_engine
+from app.pool_stats import InstrumentedQueuePool, InstrumentedAsyncQueuePool
 
-engine = create_engine(settings.database_url, echo=True)
+# Async drivers used by the request path, keyed by the backend in the sync URL
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
 
-def get_session():
-    with Session(engine) as session:
-        yield session
\ No newline at end of file
+
+def to_async_url(database_url: str):
+    """Rewrites a sync database URL (psycopg2/pysqlite) to use the matching async driver."""
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for '{backend}' databases")
+    url = url.set(drivername=ASYNC_DRIVERS[backend])
+    # asyncpg doesn't understand libpq's sslmode, it takes ssl instead
+    if backend == "postgresql" and "sslmode" in url.query:
+        url = url.difference_update_query(["sslmode"]).update_query_dict({"ssl": url.query["sslmode"]})
+    return url
+
+
+def engine_options(database_url: str, poolclass) -> dict:
+    """Pool and logging options from Settings, shared by the sync and async engines."""
+    options = {"echo": settings.db_echo}
+    url = make_url(database_url)
+    # In-memory SQLite uses a single-connection pool that takes no sizing options
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return options
+    options.update(
+        poolclass=poolclass,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+    )
+    return options
+
+
+# Sync engine for scripts and scheduled jobs that run outside the event loop
+engine = create_engine(
+    settings.database_url,
+    **engine_options(settings.database_url, InstrumentedQueuePool),
+)
+
+# Async engine for the route handlers
+async_engine = create_async_engine(
+    to_async_url(settings.database_url),
+    **engine_options(settings.database_url, InstrumentedAsyncQueuePool),
+)
+
+# Per-request SQL statement counts and DB time for /metrics
+instrument_engine(engine)
+instrument_engine(async_engine)
+
+
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+# SQLite only enforces foreign keys, and so only runs ON DELETE CASCADE, when
+# asked to on each connection. Alembic connects on its own engine without this,
+# since batch migrations rebuild tables by dropping them.
+if make_url(settings.database_url).get_backend_name() == "sqlite":
+    event.listen(engine, "connect", _enable_sqlite_foreign_keys)
+    event.listen(async_engine.sync_engine, "connect", _enable_sqlite_foreign_keys)
+
+
+def upsert(session, model):
+    """
+    An INSERT into `model` that supports on_conflict_do_update, from the dialect
+    of the session's database (Postgres and SQLite both have ON CONFLICT).
+    """
+    dialect = importlib.import_module(f"sqlalchemy.dialects.{session.bind.dialect.name}")
+    return dialect.insert(model)
+
+
+async def get_session():
+    # expire_on_commit=False: reading an expired attribute would need implicit IO,
+    # which AsyncSession can't do, e.g. when FastAPI serializes a committed object
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
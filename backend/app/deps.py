@@ -1,20 +1,27 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.auth_utils import verify_access_token
 from app.database import get_session
 from app.models import User
+from app.schemas import CurrentUser
+from app.user_cache import user_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
-def get_current_user(
+async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    session: Session = Depends(get_session)
-) -> User:
+    session: AsyncSession = Depends(get_session)
+) -> CurrentUser:
     user_id = verify_access_token(token)
     if user_id is None:
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-    user = session.get(User, user_id)
+    cached = user_cache.get(user_id)
+    if cached:
+        return cached
+    user = await session.get(User, user_id)
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
-    return user
\ No newline at end of file
+    current_user = CurrentUser(id=user.id, email=user.email, name=user.name, created_at=user.created_at)
+    user_cache.set(current_user)
+    return current_user
\ No newline at end of file
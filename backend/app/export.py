@@ -0,0 +1,95 @@
+import csv
+import io
+import json
+from collections import defaultdict
+from sqlalchemy import literal, tuple_, union_all
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.database import async_engine
+from app.models import Expense, ExpensePayer, ExpenseShare, User
+
+# Expenses fetched per page; each page's payers and shares come in one more query
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_COLUMNS = [
+    "expense_id", "created_at", "type", "description", "total_amount",
+    "role", "user_id", "user_name", "amount",
+]
+
+
+def expenses_page_statement(group_id: int, after=None):
+    """
+    The next EXPORT_BATCH_SIZE expenses of the group, oldest first, after the
+    (created_at, id) key `after`. The ix_expenses_group_id_created_at_id index
+    returns them in order, so no page costs a sort however long the history is.
+    """
+    statement = select(
+        Expense.id, Expense.created_at, Expense.type, Expense.description, Expense.total_amount
+    ).where(Expense.group_id == group_id)
+    if after is not None:
+        statement = statement.where(tuple_(Expense.created_at, Expense.id) > tuple_(*after))
+    return statement.order_by(Expense.created_at, Expense.id).limit(EXPORT_BATCH_SIZE)
+
+
+def participants_statement(expense_ids):
+    """One row per payer and per share of the given expenses, joined to the user's name."""
+    paid = (
+        select(
+            ExpensePayer.expense_id, literal("payer").label("role"), ExpensePayer.user_id,
+            User.name.label("user_name"), ExpensePayer.paid_amount.label("amount"),
+        )
+        .join(User, User.id == ExpensePayer.user_id)
+        .where(ExpensePayer.expense_id.in_(expense_ids))
+    )
+    owed = (
+        select(
+            ExpenseShare.expense_id, literal("share").label("role"), ExpenseShare.user_id,
+            User.name.label("user_name"), ExpenseShare.share_amount.label("amount"),
+        )
+        .join(User, User.id == ExpenseShare.user_id)
+        .where(ExpenseShare.expense_id.in_(expense_ids))
+    )
+    combined = union_all(paid, owed).subquery()
+    # Only this page's rows are sorted
+    return select(*combined.c).order_by(combined.c.expense_id, combined.c.role, combined.c.user_id)
+
+
+async def stream_rows(group_id: int):
+    """Yields the export a page of expenses at a time, as lists of tuples in EXPORT_COLUMNS order."""
+    # The request's session is closed before a StreamingResponse body is sent,
+    # so the export opens its own session for the lifetime of the stream
+    async with AsyncSession(async_engine) as session:
+        after = None
+        while True:
+            expenses = (await session.exec(expenses_page_statement(group_id, after))).all()
+            if not expenses:
+                return
+            participants = defaultdict(list)
+            for expense_id, *participant in await session.exec(participants_statement([e.id for e in expenses])):
+                participants[expense_id].append(participant)
+            rows = []
+            for expense_id, created_at, *details in expenses:
+                expense = (expense_id, created_at.isoformat(), *details)
+                rows.extend((*expense, *participant) for participant in participants[expense_id])
+            yield rows
+            if len(expenses) < EXPORT_BATCH_SIZE:
+                return
+            after = (expenses[-1].created_at, expenses[-1].id)
+
+
+async def stream_csv(group_id: int):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    async for rows in stream_rows(group_id):
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+async def stream_ndjson(group_id: int):
+    async for rows in stream_rows(group_id):
+        yield "".join(json.dumps(dict(zip(EXPORT_COLUMNS, row))) + "\n" for row in rows)
@@ -0,0 +1,128 @@
+from datetime import datetime, timezone
+from typing import List, Optional
+from sqlalchemy import case
+from sqlmodel import select, update, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.database import upsert
+from app.models import Expense, Group, GroupStats, Membership
+
+# total_spent values closer than this are considered equal when verifying
+DRIFT_TOLERANCE = 0.005
+
+
+def spent(expense_type: str, amount: float) -> float:
+    """How much an expense adds to total_spent: its amount, unless it is a settlement."""
+    return amount if expense_type == "regular" else 0.0
+
+
+async def record(
+    session: AsyncSession,
+    group_id: int,
+    members: int = 0,
+    expenses: int = 0,
+    total_spent: float = 0.0,
+    at: Optional[datetime] = None,
+):
+    """
+    Adds the deltas to a group's stats and moves its last activity to `at` (now
+    by default). Nothing is committed here, so the stats change lands in the
+    same transaction as the write it describes. Call it once that write is in
+    the session: a group without a stats row is rebuilt from the source tables
+    instead, and those then already include it.
+    """
+    at = at or datetime.now(timezone.utc)
+    # Incremented in SQL so concurrent writers don't lose each other's updates
+    result = await session.exec(
+        update(GroupStats)
+        .where(GroupStats.group_id == group_id)
+        .values(
+            member_count=GroupStats.member_count + members,
+            expense_count=GroupStats.expense_count + expenses,
+            total_spent=GroupStats.total_spent + total_spent,
+            last_activity_at=_later(at),
+        )
+    )
+    if result.rowcount == 0:
+        # A group created before the stats existed; start it from the source tables.
+        # If a concurrent writer inserts the row first, this write's deltas are
+        # added to theirs instead, as the UPDATE above would have done
+        statement = upsert(session, GroupStats).values(
+            group_id=group_id, **await compute_group_stats(session, group_id)
+        )
+        await session.exec(statement.on_conflict_do_update(
+            index_elements=[GroupStats.group_id],
+            set_={
+                "member_count": GroupStats.member_count + members,
+                "expense_count": GroupStats.expense_count + expenses,
+                "total_spent": GroupStats.total_spent + total_spent,
+                "last_activity_at": _later(statement.excluded.last_activity_at),
+            },
+        ))
+
+
+async def compute_group_stats(session: AsyncSession, group_id: int) -> dict:
+    """
+    Recomputes a group's stats from the memberships and expenses tables. Edits,
+    deletions and membership changes leave no timestamp behind, so the
+    recomputed last_activity_at is a lower bound: the newest expense, or the
+    group's creation.
+    """
+    member_count = (await session.exec(
+        select(func.count(Membership.id)).where(Membership.group_id == group_id)
+    )).one()
+    expense_count, total_spent, newest_expense = (await session.exec(
+        select(
+            func.count(Expense.id),
+            func.coalesce(func.sum(case((Expense.type == "regular", Expense.total_amount), else_=0)), 0),
+            func.max(Expense.created_at),
+        ).where(Expense.group_id == group_id)
+    )).one()
+    created_at = (await session.exec(select(Group.created_at).where(Group.id == group_id))).one()
+    return {
+        "member_count": member_count,
+        "expense_count": expense_count,
+        "total_spent": float(total_spent),
+        "last_activity_at": _aware(max(filter(None, (created_at, newest_expense)), key=_aware)),
+    }
+
+
+async def find_drift(session: AsyncSession, group_id: int) -> List[dict]:
+    """Compares a group's stats against the source tables and lists every mismatching field."""
+    expected = await compute_group_stats(session, group_id)
+    stats = await session.get(GroupStats, group_id)
+    if stats is None:
+        return [{"field": field, "expected": value, "actual": None} for field, value in expected.items()]
+    drift = []
+    for field in ("member_count", "expense_count"):
+        if getattr(stats, field) != expected[field]:
+            drift.append({"field": field, "expected": expected[field], "actual": getattr(stats, field)})
+    if abs(stats.total_spent - expected["total_spent"]) > DRIFT_TOLERANCE:
+        drift.append({"field": "total_spent", "expected": expected["total_spent"], "actual": stats.total_spent})
+    if _aware(stats.last_activity_at) < expected["last_activity_at"]:
+        drift.append({"field": "last_activity_at", "expected": expected["last_activity_at"], "actual": stats.last_activity_at})
+    return drift
+
+
+async def rebuild_group(session: AsyncSession, group_id: int):
+    """Replaces a group's stats with values recomputed from the source tables."""
+    statement = upsert(session, GroupStats).values(group_id=group_id, **await compute_group_stats(session, group_id))
+    await session.exec(statement.on_conflict_do_update(
+        index_elements=[GroupStats.group_id],
+        set_={
+            "member_count": statement.excluded.member_count,
+            "expense_count": statement.excluded.expense_count,
+            "total_spent": statement.excluded.total_spent,
+            # Keep a later last activity that the source tables can't see
+            "last_activity_at": _later(statement.excluded.last_activity_at),
+        },
+    ))
+
+
+def _later(at):
+    # The stored last_activity_at or `at`, whichever is later, as a SQL expression
+    return case((GroupStats.last_activity_at < at, at), else_=GroupStats.last_activity_at)
+
+
+def _aware(value: datetime) -> datetime:
+    # SQLite hands timestamps back without their timezone; they are stored in UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
@@ -0,0 +1,75 @@
+import hashlib
+from typing import Optional
+from fastapi import Request, Response
+from sqlmodel import select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models import Group, Membership
+
+# Clients must revalidate every time, and shared caches must not store per-user data
+CACHE_CONTROL = "private, no-cache"
+
+
+async def bump(session: AsyncSession, *group_ids: int):
+    """
+    Increments the version of each group. Nothing is committed here, so the new
+    version lands in the same transaction as the write it describes.
+    """
+    if group_ids:
+        # Incremented in SQL so concurrent writers each move the version on
+        await session.exec(
+            update(Group).where(Group.id.in_(group_ids)).values(version=Group.version + 1)
+        )
+
+
+async def bump_user_groups(session: AsyncSession, user_id: int):
+    """Increments the version of every group a user belongs to, e.g. after a rename."""
+    # Ids first, so the UPDATE is a primary key lookup however the planner would
+    # order an IN (subquery) against a small groups table
+    group_ids = (await session.exec(
+        select(Membership.group_id).where(Membership.user_id == user_id)
+    )).all()
+    await bump(session, *group_ids)
+
+
+async def member_group_version(session: AsyncSession, group_id: int, user_id: int) -> Optional[int]:
+    """
+    The group's version if the user is a member, else None. One lookup on the
+    memberships (user_id, group_id) index and the groups primary key, so it can
+    stand in for the membership check of the read endpoints.
+    """
+    return (await session.exec(
+        select(Group.version)
+        .join(Membership, Membership.group_id == Group.id)
+        .where(Group.id == group_id, Membership.user_id == user_id)
+    )).first()
+
+
+def make_etag(*parts) -> str:
+    """A strong ETag for a representation identified by `parts` (route, versions, query)."""
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def query_key(request: Request) -> tuple:
+    """The request's query parameters in a stable order, so each page/filter gets its own ETag."""
+    return tuple(sorted(request.query_params.multi_items()))
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """If-None-Match uses the weak comparison, so W/ prefixes are ignored (RFC 9110 13.1.2)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in header.split(","))
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def set_etag(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
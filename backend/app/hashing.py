@@ -0,0 +1,142 @@
+import asyncio
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from fastapi import HTTPException
+from app.config import settings
+
+
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    """The bcrypt CryptContext, built on first use so passlib isn't imported at startup."""
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def _hash(password: str) -> str:
+    return get_pwd_context().hash(password)
+
+
+def _verify(password: str, password_hash: str) -> bool:
+    return get_pwd_context().verify(password, password_hash)
+
+
+class HashMetrics:
+    """Cumulative timings for password hashing work."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+        self.hash_seconds_total = 0.0
+        self.hash_seconds_max = 0.0
+        self.queue_wait_seconds_total = 0.0
+        self.queue_wait_seconds_max = 0.0
+
+    def record(self, queue_wait: float, hash_time: float):
+        with self._lock:
+            self.completed += 1
+            self.hash_seconds_total += hash_time
+            self.hash_seconds_max = max(self.hash_seconds_max, hash_time)
+            self.queue_wait_seconds_total += queue_wait
+            self.queue_wait_seconds_max = max(self.queue_wait_seconds_max, queue_wait)
+
+    def record_rejection(self):
+        with self._lock:
+            self.rejected += 1
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a small thread pool so it never blocks the event loop
+    (bcrypt releases the GIL while hashing). At most `max_pending` calls may be
+    queued or running; beyond that callers get a 429 straight away instead of
+    piling up behind a login storm.
+    """
+
+    # Assumed cost of one hash until the first one has been timed
+    DEFAULT_HASH_SECONDS = 0.25
+
+    def __init__(self, max_workers: int, max_pending: int, nice: int = 0):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.nice = nice
+        self.pending = 0
+        self.metrics = HashMetrics()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="password-hash", initializer=self._lower_priority,
+        )
+
+    def _lower_priority(self):
+        # On Linux each thread has its own nice value, so a login burst only gets
+        # the CPU the event loop thread leaves over. Elsewhere this is a no-op
+        if self.nice and hasattr(os, "setpriority"):
+            try:
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), self.nice)
+            except OSError:
+                pass
+
+    @property
+    def saturated(self) -> bool:
+        return self.pending >= self.max_pending
+
+    def retry_after(self) -> int:
+        """Whole seconds until the hashes queued now should have drained, at least 1."""
+        m = self.metrics
+        per_hash = m.hash_seconds_total / m.completed if m.completed else self.DEFAULT_HASH_SECONDS
+        return max(1, math.ceil(self.pending / self.max_workers * per_hash))
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        return await self._run(_verify, password, password_hash)
+
+    async def _run(self, func, *args):
+        # Only touched from the event loop thread, so a plain counter is enough
+        if self.saturated:
+            self.metrics.record_rejection()
+            raise HTTPException(
+                status_code=429,
+                detail="Server is busy, please try again shortly.",
+                headers={"Retry-After": str(self.retry_after())},
+            )
+
+        submitted = time.perf_counter()
+
+        def job():
+            started = time.perf_counter()
+            result = func(*args)
+            return result, started - submitted, time.perf_counter() - started
+
+        self.pending += 1
+        try:
+            result, queue_wait, hash_time = await asyncio.get_running_loop().run_in_executor(self._executor, job)
+        finally:
+            self.pending -= 1
+        self.metrics.record(queue_wait, hash_time)
+        return result
+
+    def snapshot(self) -> dict:
+        m = self.metrics
+        return {
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "completed": m.completed,
+            "rejected": m.rejected,
+            "hash_seconds_total": round(m.hash_seconds_total, 6),
+            "hash_seconds_max": round(m.hash_seconds_max, 6),
+            "queue_wait_seconds_total": round(m.queue_wait_seconds_total, 6),
+            "queue_wait_seconds_max": round(m.queue_wait_seconds_max, 6),
+        }
+
+
+password_hasher = PasswordHasher(
+    max_workers=settings.password_hash_workers,
+    max_pending=settings.password_hash_max_pending,
+    nice=settings.password_hash_nice,
+)
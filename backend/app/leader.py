@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from typing import Callable, Optional
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool
+from app.config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLock:
+    """A lock at most one process holds, released by the OS or database if it dies."""
+
+    def try_acquire(self) -> bool:
+        """Takes the lock without waiting; returns whether this process now holds it."""
+        raise NotImplementedError
+
+    def is_held(self) -> bool:
+        """Whether a lock taken earlier is still held."""
+        return True
+
+    def release(self):
+        raise NotImplementedError
+
+
+class PostgresAdvisoryLock(LeaderLock):
+    """
+    A session-level pg_try_advisory_lock on a dedicated connection outside the
+    pool. Postgres drops the lock when that connection goes away, which includes
+    the worker being killed, so another worker can take over.
+    """
+
+    def __init__(self, database_url: str, key: int):
+        self.key = key
+        self._engine = create_engine(database_url, poolclass=NullPool)
+        self._connection = None
+
+    def try_acquire(self) -> bool:
+        # Autocommit, so the connection doesn't sit idle in a transaction while it holds the lock
+        connection = self._engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        try:
+            acquired = connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key}).scalar()
+        except Exception:
+            connection.close()
+            raise
+        if not acquired:
+            connection.close()
+            return False
+        self._connection = connection
+        return True
+
+    def is_held(self) -> bool:
+        # The lock lives as long as the connection, so a connection that fails a
+        # ping has lost it, and another worker may already have taken it
+        try:
+            self._connection.execute(text("SELECT 1"))
+            return True
+        except Exception:
+            self._close()
+            return False
+
+    def release(self):
+        if self._connection is None:
+            return
+        try:
+            self._connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.key})
+        finally:
+            self._close()
+
+    def _close(self):
+        try:
+            self._connection.close()
+        except Exception:
+            pass
+        self._connection = None
+
+
+class FileLock(LeaderLock):
+    """
+    An exclusive non-blocking lock on a file (flock, or msvcrt on Windows). The
+    OS releases it when the process exits, however it exits. Only processes on
+    the same machine see it, which is enough for SQLite.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def try_acquire(self) -> bool:
+        file = open(self.path, "a+")
+        try:
+            if fcntl is not None:
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            file.close()
+            return False
+        # For whoever looks at the file: which process is the leader
+        file.truncate(0)
+        file.write(f"{os.getpid()}\n")
+        file.flush()
+        self._file = file
+        return True
+
+    def release(self):
+        if self._file is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._file.close()
+            self._file = None
+
+
+def default_lock_file(database_url: str) -> str:
+    """Next to the SQLite database file, or in the temp directory for an in-memory one."""
+    database = make_url(database_url).database
+    if database and database != ":memory:":
+        return os.path.abspath(database) + ".leader.lock"
+    return os.path.join(tempfile.gettempdir(), "splitmoney-leader.lock")
+
+
+def create_leader_lock(database_url: str = None) -> LeaderLock:
+    """A Postgres advisory lock when the database is Postgres, otherwise a file lock."""
+    database_url = database_url or settings.database_url
+    if make_url(database_url).get_backend_name() == "postgresql":
+        return PostgresAdvisoryLock(database_url, settings.leader_lock_id)
+    return FileLock(settings.leader_lock_file or default_lock_file(database_url))
+
+
+class LeaderElection:
+    """
+    Background task that makes one worker process the leader. Every worker
+    tries to take `lock` every `poll_interval` seconds; the one that gets it
+    calls `on_elected`, and the leader checks each interval that it still holds
+    the lock, calling `on_deposed` if not. When the leader dies its lock is
+    released and a surviving worker takes over within one interval.
+
+    The lock calls block, so they run on a thread. Losing the database
+    connection can leave an old leader running for up to one interval after a
+    new one is elected, so the jobs it guards must tolerate an overlap.
+    """
+
+    def __init__(self, lock: LeaderLock, poll_interval: float, on_elected: Callable[[], None],
+                 on_deposed: Callable[[], None]):
+        self.lock = lock
+        self.poll_interval = poll_interval
+        self.on_elected = on_elected
+        self.on_deposed = on_deposed
+        self.is_leader = False
+        self.elected_at: Optional[float] = None
+        self.elections = 0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.is_leader:
+            self._step_down()
+            await asyncio.to_thread(self.lock.release)
+
+    async def _run(self):
+        while True:
+            try:
+                if not self.is_leader:
+                    if await asyncio.to_thread(self.lock.try_acquire):
+                        self.is_leader = True
+                        self.elected_at = time.time()
+                        self.elections += 1
+                        logger.info("Worker %d is now the leader", os.getpid())
+                        self.on_elected()
+                elif not await asyncio.to_thread(self.lock.is_held):
+                    logger.warning("Worker %d lost the leader lock", os.getpid())
+                    self._step_down()
+            except Exception:
+                logger.exception("Leader election: lock check failed")
+            await asyncio.sleep(self.poll_interval)
+
+    def _step_down(self):
+        self.is_leader = False
+        self.elected_at = None
+        self.on_deposed()
+
+    def snapshot(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "is_leader": int(self.is_leader),
+            "held_seconds": round(time.time() - self.elected_at, 3) if self.elected_at else 0,
+            "elections": self.elections,
+            "lock": type(self.lock).__name__,
+        }
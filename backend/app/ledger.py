@@ -0,0 +1,112 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+from sqlalchemy import literal_column, union_all
+from sqlmodel import select, delete, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.database import upsert
+from app.models import Expense, ExpensePayer, ExpenseShare, GroupBalance
+
+# Balances closer than this are considered equal when verifying the ledger
+DRIFT_TOLERANCE = 0.005
+
+
+async def apply_expense(
+    session: AsyncSession,
+    group_id: int,
+    payers: Iterable[Tuple[int, float]],
+    shares: Iterable[Tuple[int, float]],
+    sign: int = 1,
+):
+    """
+    Adds (sign=1) or removes (sign=-1) an expense's effect on the group ledger.
+    `payers` and `shares` are (user_id, amount) pairs. Nothing is committed here,
+    so the ledger change lands in the same transaction as the expense itself.
+    """
+    deltas = defaultdict(float)
+    for user_id, amount in payers:
+        deltas[user_id] += amount
+    for user_id, amount in shares:
+        deltas[user_id] -= amount
+
+    rows = [
+        {"group_id": group_id, "user_id": user_id, "net_balance": sign * delta}
+        # Sorted, so concurrent writers lock the rows in the same order
+        for user_id, delta in sorted(deltas.items())
+        if delta != 0
+    ]
+    if not rows:
+        return
+    # One upsert for every member: a member's first row in the group is inserted,
+    # later ones are incremented in SQL, so concurrent writers neither lose each
+    # other's updates nor both insert the same first row
+    statement = upsert(session, GroupBalance).values(rows)
+    await session.exec(statement.on_conflict_do_update(
+        index_elements=[GroupBalance.group_id, GroupBalance.user_id],
+        set_={"net_balance": GroupBalance.net_balance + statement.excluded.net_balance},
+    ))
+
+
+async def clear_group(session: AsyncSession, group_id: int):
+    """Removes every ledger row of a group (used when rebuilding it)."""
+    await session.exec(delete(GroupBalance).where(GroupBalance.group_id == group_id))
+
+
+async def compute_group_balances(session: AsyncSession, group_id: int) -> Dict[int, float]:
+    """
+    Recomputes a group's balances from the raw expense_payers/expense_shares rows.
+    The sums run in the database, grouped by user, so one row per member comes
+    back however long the group's history is.
+    """
+    paid = (
+        select(ExpensePayer.user_id, func.sum(ExpensePayer.paid_amount).label("paid"), literal_column("0.0").label("owed"))
+        .join(Expense, Expense.id == ExpensePayer.expense_id)
+        .where(Expense.group_id == group_id)
+        .group_by(ExpensePayer.user_id)
+    )
+    owed = (
+        select(ExpenseShare.user_id, literal_column("0.0").label("paid"), func.sum(ExpenseShare.share_amount).label("owed"))
+        .join(Expense, Expense.id == ExpenseShare.expense_id)
+        .where(Expense.group_id == group_id)
+        .group_by(ExpenseShare.user_id)
+    )
+    # Paid and owed are summed separately and subtracted once per member
+    totals = union_all(paid, owed).subquery()
+    rows = await session.exec(
+        select(totals.c.user_id, func.sum(totals.c.paid), func.sum(totals.c.owed))
+        .group_by(totals.c.user_id)
+    )
+    return {user_id: paid_total - owed_total for user_id, paid_total, owed_total in rows}
+
+
+async def get_ledger_balances(session: AsyncSession, group_id: int) -> Dict[int, float]:
+    """Returns the persisted ledger of a group as {user_id: net_balance}."""
+    rows = (await session.exec(
+        select(GroupBalance.user_id, GroupBalance.net_balance)
+        .where(GroupBalance.group_id == group_id)
+    )).all()
+    return dict(rows)
+
+
+async def find_drift(session: AsyncSession, group_id: int) -> List[dict]:
+    """Compares the ledger against the raw tables and lists every mismatching member."""
+    expected = await compute_group_balances(session, group_id)
+    actual = await get_ledger_balances(session, group_id)
+    drift = []
+    for user_id in sorted(set(expected) | set(actual)):
+        expected_balance = expected.get(user_id, 0.0)
+        actual_balance = actual.get(user_id, 0.0)
+        if abs(expected_balance - actual_balance) > DRIFT_TOLERANCE:
+            drift.append({
+                "user_id": user_id,
+                "expected": expected_balance,
+                "actual": actual_balance,
+            })
+    return drift
+
+
+async def rebuild_group(session: AsyncSession, group_id: int):
+    """Replaces a group's ledger with balances recomputed from the raw tables."""
+    await clear_group(session, group_id)
+    balances = await compute_group_balances(session, group_id)
+    for user_id, balance in balances.items():
+        session.add(GroupBalance(group_id=group_id, user_id=user_id, net_balance=balance))
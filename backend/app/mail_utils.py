@@ -1,17 +1,22 @@
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig
-from app.config import settings
 import os
+from functools import lru_cache
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=os.getenv("MAIL_USERNAME"),
-    MAIL_PASSWORD=os.getenv("MAIL_PASSWORD"),
-    MAIL_FROM=os.getenv("MAIL_FROM"),
-    MAIL_PORT=int(os.getenv("MAIL_PORT", 587)),
-    MAIL_SERVER=os.getenv("MAIL_SERVER"),
-    MAIL_STARTTLS=os.getenv("MAIL_STARTTLS", "True") == "True",
-    MAIL_SSL_TLS=os.getenv("MAIL_SSL_TLS", "False") == "True",
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True
-)
 
-fast_mail = FastMail(conf)
+@lru_cache(maxsize=None)
+def get_mail_config():
+    """
+    SMTP settings, built on first use: importing fastapi_mail pulls in httpx and
+    rich, which a worker only needs once it sends mail.
+    """
+    from fastapi_mail import ConnectionConfig
+    return ConnectionConfig(
+        MAIL_USERNAME=os.getenv("MAIL_USERNAME"),
+        MAIL_PASSWORD=os.getenv("MAIL_PASSWORD"),
+        MAIL_FROM=os.getenv("MAIL_FROM"),
+        MAIL_PORT=int(os.getenv("MAIL_PORT", 587)),
+        MAIL_SERVER=os.getenv("MAIL_SERVER"),
+        MAIL_STARTTLS=os.getenv("MAIL_STARTTLS", "True") == "True",
+        MAIL_SSL_TLS=os.getenv("MAIL_SSL_TLS", "False") == "True",
+        USE_CREDENTIALS=True,
+        VALIDATE_CERTS=True
+    )
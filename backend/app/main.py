@@ -4,14 +4,19 @@ from app.routers import auth, groups, expenses
 # The import below is no longer needed and will cause an error
 # from app.database import create_db_and_tables 
 from app.config import settings
+from app.database import engine, async_engine
+from app.pool_stats import pool_snapshot
+from app.hashing import password_hasher
+from app.user_cache import user_cache
+from app.rate_limit import auth_limiter
+from app.metrics import MetricsMiddleware, registry, CONTENT_TYPE
+from app.templating import preload_templates
+from app.outbox import outbox_sender
 from contextlib import asynccontextmanager
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from app.cleanup import cleanup_expired_invitations
+from app.maintenance import maintenance_scheduler
+from app.leader import LeaderElection, create_leader_lock
 import logging
-from fastapi.responses import JSONResponse
-
-# Initialize the scheduler
-scheduler = AsyncIOScheduler()
+from fastapi.responses import JSONResponse, Response
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -19,20 +24,37 @@ logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    logger.info("Starting in %s mode", settings.environment)
     if settings.debug:
         print("Debug mode enabled")
+
+    # Compile the email templates now rather than on the first invite
+    preload_templates()
     
-    # Add the cleanup job to the scheduler to run once every 2 day
-    scheduler.add_job(cleanup_expired_invitations, 'interval', days=2, id="cleanup_job")
-    # Start the scheduler
-    scheduler.start()
-    print("Scheduler started. Cleanup job is scheduled.")
+    # Every worker takes part in the election; only the leader runs the
+    # retention jobs, and another worker takes over if it dies
+    app.state.leader = None
+    if settings.maintenance_scheduler:
+        app.state.leader = LeaderElection(
+            create_leader_lock(),
+            poll_interval=settings.leader_poll_interval,
+            on_elected=maintenance_scheduler.start,
+            on_deposed=maintenance_scheduler.stop,
+        )
+        app.state.leader.start()
+
+    if settings.email_outbox_worker:
+        outbox_sender.start()
 
     yield  # Application runs here
 
-    # Shutdown the scheduler when the application is closing
-    scheduler.shutdown()
-    print("Scheduler shut down.")
+    if settings.email_outbox_worker:
+        await outbox_sender.stop()
+
+    # Stops the jobs if this worker leads (a purge in progress finishes its
+    # current chunk) and hands the lock to another worker
+    if app.state.leader is not None:
+        await app.state.leader.stop()
 
 app = FastAPI(title="SplitMoney API", lifespan=lifespan)
 
@@ -54,6 +76,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Added last so it wraps CORS as well and times the whole request
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(groups.router, prefix="/api", tags=["Groups"])
@@ -63,6 +88,65 @@ app.include_router(expenses.router, prefix="/api", tags=["Expenses"])
 async def root():
     return {"message": "Welcome to SplitMoney API"}
 
+@app.get("/health/db-pool")
+async def db_pool_stats():
+    """Connection pool saturation for this worker, to size DB_POOL_SIZE/DB_MAX_OVERFLOW."""
+    return {
+        "async": pool_snapshot(async_engine.pool),
+        "sync": pool_snapshot(engine.pool),
+    }
+
+@app.get("/health/hashing")
+async def hashing_stats():
+    """Password hashing queue depth, bcrypt latency and queue wait for this worker."""
+    return password_hasher.snapshot()
+
+@app.get("/health/auth-limits")
+async def auth_limit_stats():
+    """Auth rate limits and the number of token buckets this worker is tracking."""
+    return auth_limiter.snapshot()
+
+@app.get("/health/leader")
+async def leader_stats():
+    """Whether this worker holds the leader lock and so runs the retention jobs."""
+    leader = app.state.leader
+    return leader.snapshot() if leader is not None else {"enabled": False}
+
+@app.get("/health/user-cache")
+async def user_cache_stats():
+    """Hit/miss counters of the authenticated-user cache for this worker."""
+    return user_cache.snapshot()
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition of this worker's request, SQL, pool, hashing and cache metrics."""
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
+def _snapshot_gauges(prefix: str, help: str, snapshot: dict, labels: dict = None):
+    return [
+        (f"{prefix}_{key}", "gauge", f"{help} ({key}).", [(labels or {}, value)])
+        for key, value in snapshot.items()
+        if isinstance(value, (int, float)) and not isinstance(value, bool)
+    ]
+
+def _health_collector():
+    """Re-exports the /health/* snapshots as gauges at scrape time."""
+    metrics = []
+    for name, pool in (("async", async_engine.pool), ("sync", engine.pool)):
+        metrics += _snapshot_gauges("db_pool", "Connection pool statistics", pool_snapshot(pool), {"engine": name})
+    metrics += _snapshot_gauges("password_hash", "Password hashing executor", password_hasher.snapshot())
+    metrics += _snapshot_gauges("user_cache", "Authenticated-user cache", user_cache.snapshot())
+    metrics += _snapshot_gauges("auth_limits", "Auth rate limiter", auth_limiter.snapshot())
+    if getattr(app.state, "leader", None) is not None:
+        metrics += _snapshot_gauges("leader_election", "Leader election", app.state.leader.snapshot())
+    # Both pools emit the same names, so merge their samples under one HELP/TYPE header
+    merged = {}
+    for name, type_, help, samples in metrics:
+        merged.setdefault(name, (name, type_, help, []))[3].extend(samples)
+    return list(merged.values())
+
+registry.register_collector(_health_collector)
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     logger.error(f"Global exception: {exc}")
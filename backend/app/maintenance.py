@@ -0,0 +1,168 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, NamedTuple, Optional
+from sqlmodel import Session, select, delete
+from app.config import settings
+from app.database import engine
+from app.metrics import registry, Counter, Gauge, Histogram
+from app.models import GroupInvitation, PasswordResetToken, EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+# Scheduler executor the jobs run on: one thread, so they never run concurrently
+# with each other and never on the event loop
+EXECUTOR = "maintenance"
+JOB_PREFIX = "maintenance:"
+
+maintenance_rows_deleted_total = registry.register(Counter(
+    "maintenance_rows_deleted_total", "Rows removed by the retention jobs.", ["job"]))
+maintenance_job_seconds = registry.register(Histogram(
+    "maintenance_job_seconds", "Wall time of one maintenance job run, pauses included.", ["job"],
+    buckets=(0.01, 0.1, 0.5, 1, 5, 15, 60, 300, 900, 3600)))
+maintenance_job_lag_seconds = registry.register(Gauge(
+    "maintenance_job_lag_seconds", "How late the last run of a maintenance job started, against its schedule.", ["job"]))
+maintenance_job_last_success_timestamp_seconds = registry.register(Gauge(
+    "maintenance_job_last_success_timestamp_seconds", "Unix time the maintenance job last finished without error.", ["job"]))
+maintenance_job_failures_total = registry.register(Counter(
+    "maintenance_job_failures_total", "Maintenance job runs that raised.", ["job"]))
+
+
+class RetentionRule(NamedTuple):
+    """Rows of `model` matching `condition(now)` are deleted every `interval_hours`."""
+    name: str
+    model: type
+    condition: Callable[[datetime], object]
+    interval_hours: float
+
+
+RETENTION_RULES = [
+    RetentionRule(
+        "group_invitations", GroupInvitation,
+        lambda now: (GroupInvitation.status == "accepted") | (GroupInvitation.expires_at < now),
+        interval_hours=settings.maintenance_interval_hours,
+    ),
+    RetentionRule(
+        "password_reset_tokens", PasswordResetToken,
+        lambda now: (PasswordResetToken.used == True) | (PasswordResetToken.expires_at < now),  # noqa: E712
+        interval_hours=settings.maintenance_interval_hours,
+    ),
+    # Delivered and given-up emails are kept for a while to look into bounces
+    RetentionRule(
+        "email_outbox", EmailOutbox,
+        lambda now: EmailOutbox.status.in_(("sent", "failed"))
+        & (EmailOutbox.created_at < now - timedelta(days=settings.email_outbox_retention_days)),
+        interval_hours=settings.maintenance_interval_hours,
+    ),
+]
+
+def purge(rule: RetentionRule, chunk_size: int, pause: float, stopping: Optional[threading.Event] = None) -> int:
+    """
+    Deletes the rows matching `rule` in chunks of `chunk_size`, each in its own
+    short transaction, sleeping `pause` seconds in between so other writers get
+    the table back. Once `stopping` is set, stops after the current chunk.
+    Returns the number of rows deleted.
+    """
+    now = datetime.now(timezone.utc)
+    deleted = 0
+    with Session(engine) as session:
+        while not (stopping and stopping.is_set()):
+            # Rows become deletable roughly in insertion order, so walking the
+            # primary key finds a chunk near the start without extra indexes
+            ids = session.exec(
+                select(rule.model.id).where(rule.condition(now)).order_by(rule.model.id).limit(chunk_size)
+            ).all()
+            if not ids:
+                break
+            session.exec(delete(rule.model).where(rule.model.id.in_(ids)))
+            session.commit()
+            deleted += len(ids)
+            maintenance_rows_deleted_total.inc(rule.name, amount=len(ids))
+            if len(ids) < chunk_size:
+                break
+            if stopping:
+                stopping.wait(pause)
+            else:
+                time.sleep(pause)
+    return deleted
+
+
+def run_job(name: str, func: Callable[[], int]):
+    """Runs one maintenance job and records its duration, success and rows removed."""
+    start = time.perf_counter()
+    try:
+        rows = func()
+    except Exception:
+        maintenance_job_failures_total.inc(name)
+        logger.exception("Maintenance job %s failed", name)
+        return
+    finally:
+        maintenance_job_seconds.observe(time.perf_counter() - start, name)
+    maintenance_job_last_success_timestamp_seconds.set(time.time(), name)
+    logger.info("Maintenance job %s removed %d row(s) in %.1f s", name, rows, time.perf_counter() - start)
+
+
+def purge_job(rule: RetentionRule, stopping: threading.Event):
+    run_job(rule.name, lambda: purge(rule, settings.maintenance_chunk_size, settings.maintenance_chunk_pause, stopping))
+
+
+def _record_lag(event):
+    if event.job_id.startswith(JOB_PREFIX) and event.scheduled_run_times:
+        lag = (datetime.now(timezone.utc) - max(event.scheduled_run_times)).total_seconds()
+        maintenance_job_lag_seconds.set(max(0.0, lag), event.job_id[len(JOB_PREFIX):])
+
+
+class MaintenanceScheduler:
+    """
+    Runs the retention jobs on an APScheduler in the worker that holds the
+    leader lock (see app/leader.py). A scheduler can't be restarted once shut
+    down, so each start builds a new one, with its own stop flag: a purge left
+    over from before a stop never sees the flag cleared by the next start.
+    """
+
+    def __init__(self):
+        self.scheduler = None
+        self._stopping = None
+
+    @property
+    def running(self) -> bool:
+        return self.scheduler is not None
+
+    def start(self):
+        if self.scheduler is not None:
+            return
+        # Imported here, so only the worker that runs the jobs loads APScheduler
+        from apscheduler.events import EVENT_JOB_SUBMITTED
+        from apscheduler.executors.pool import ThreadPoolExecutor
+        from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+        self._stopping = threading.Event()
+        scheduler = AsyncIOScheduler()
+        scheduler.add_executor(ThreadPoolExecutor(max_workers=1), alias=EXECUTOR)
+        scheduler.add_listener(_record_lag, EVENT_JOB_SUBMITTED)
+        for rule in RETENTION_RULES:
+            scheduler.add_job(
+                purge_job, "interval", hours=rule.interval_hours, args=[rule, self._stopping],
+                id=JOB_PREFIX + rule.name, executor=EXECUTOR,
+                # A run that is still going, or was missed while the process was down, isn't repeated
+                max_instances=1, coalesce=True,
+            )
+        scheduler.start()
+        self.scheduler = scheduler
+        logger.info("Maintenance jobs scheduled")
+
+    def stop(self):
+        """
+        Stops the jobs without waiting for them: this runs on the event loop, and
+        a running purge ends on its own after its current chunk.
+        """
+        if self.scheduler is None:
+            return
+        self._stopping.set()
+        self.scheduler.shutdown(wait=False)
+        self.scheduler = None
+        logger.info("Maintenance jobs stopped")
+
+
+maintenance_scheduler = MaintenanceScheduler()
@@ -0,0 +1,267 @@
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from sqlalchemy import event
+from starlette.routing import Match
+
+# Latency buckets in seconds, from a cached lookup up to a slow bcrypt login under load
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Route label for requests that match no route, so scanners can't blow up label cardinality
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Sequence[str]) -> Tuple[str, ...]:
+        if len(labels) != len(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {labels}")
+        return tuple(str(v) for v in labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.extend(self._samples(labels, value))
+        return lines
+
+    def _samples(self, labels, value) -> List[str]:
+        return [f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, *labels: str, amount: float = 1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def inc(self, *labels: str, amount: float = 1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, then sum and count
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self, labels, state) -> List[str]:
+        bucket_counts, total, count = state
+        names = self.label_names + ("le",)
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, bucket_counts):
+            cumulative += bucket_count
+            lines.append(f"{self.name}_bucket{_format_labels(names, labels + (_format_value(float(bound)),))} {cumulative}")
+        lines.append(f"{self.name}_bucket{_format_labels(names, labels + ('+Inf',))} {count}")
+        lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {_format_value(total)}")
+        lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {count}")
+        return lines
+
+
+# A collector returns (name, type, help, [(labels dict, value), ...]) for values
+# that already live elsewhere, read at scrape time
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Tuple[dict, float]]]]]
+
+
+class MetricsRegistry:
+    """Holds this worker's metrics and renders them in Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Collector] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Collector):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            for name, type_, help, samples in collector():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {type_}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(tuple(labels), tuple(labels.values()))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_requests_total = registry.register(Counter(
+    "http_requests_total", "Requests handled, by route template and status code.",
+    ("method", "route", "status"),
+))
+http_request_duration_seconds = registry.register(Histogram(
+    "http_request_duration_seconds", "Time from receiving a request to the end of its response body.",
+    ("method", "route"),
+))
+http_requests_in_progress = registry.register(Gauge(
+    "http_requests_in_progress", "Requests currently being handled.",
+    ("method", "route"),
+))
+http_request_db_statements = registry.register(Histogram(
+    "http_request_db_statements", "SQL statements sent while handling one request.",
+    ("method", "route"), buckets=STATEMENT_BUCKETS,
+))
+http_request_db_seconds = registry.register(Histogram(
+    "http_request_db_seconds", "Time spent executing SQL while handling one request.",
+    ("method", "route"),
+))
+db_statements_total = registry.register(Counter(
+    "db_statements_total", "SQL statements sent by this worker, including background jobs.",
+))
+db_statement_seconds_total = registry.register(Counter(
+    "db_statement_seconds_total", "Time spent executing SQL by this worker, including background jobs.",
+))
+
+
+class RequestDbStats:
+    """Statements and DB time accumulated by the request currently being handled."""
+
+    __slots__ = ("statements", "seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+
+
+_request_db_stats: ContextVar[Optional[RequestDbStats]] = ContextVar("request_db_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._metrics_started
+    db_statements_total.inc()
+    db_statement_seconds_total.inc(amount=elapsed)
+    stats = _request_db_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.seconds += elapsed
+
+
+def instrument_engine(engine):
+    """Times every statement an engine (sync or async) sends and charges it to the current request."""
+    engine = getattr(engine, "sync_engine", engine)
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def route_template(app, scope) -> str:
+    """The path template of the route a request will hit, e.g. /api/groups/{group_id}."""
+    partial = None
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            partial = route.path
+    return partial or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """
+    Records count, latency, in-flight requests and SQL work per route template.
+    A plain ASGI middleware rather than BaseHTTPMiddleware, so it adds no extra
+    task per request and sees the full duration of streamed responses.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(scope["app"], scope)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        stats = RequestDbStats()
+        token = _request_db_stats.set(stats)
+        http_requests_in_progress.inc(method, route)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_request_duration_seconds.observe(time.perf_counter() - start, method, route)
+            http_requests_in_progress.dec(method, route)
+            http_requests_total.inc(method, route, str(status))
+            http_request_db_statements.observe(stats.statements, method, route)
+            http_request_db_seconds.observe(stats.seconds, method, route)
+            _request_db_stats.reset(token)
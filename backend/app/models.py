@@ -1,11 +1,17 @@
 from typing import Optional, List, TYPE_CHECKING
 from datetime import datetime, timezone
 from sqlmodel import SQLModel, Field, Relationship, UniqueConstraint
-from sqlalchemy import Column, TIMESTAMP
+from sqlalchemy import Column, ForeignKey, TIMESTAMP, Index, Text
 
 if TYPE_CHECKING:
     from .models import Group, Membership, Expense, ExpensePayer, ExpenseShare
 
+# Rows owned by a group or an expense are removed by the database along with
+# their parent (ON DELETE CASCADE), so deleting a group is a single statement
+# and never loads its history into Python. The relationships are passive_deletes
+# to leave that to the database rather than loading children to delete them.
+CASCADE_DELETE = {"cascade": "all, delete", "passive_deletes": True}
+
 
 class User(SQLModel, table=True):
     __tablename__ = "users"
@@ -42,26 +48,34 @@ class Group(SQLModel, table=True):
         default_factory=lambda: datetime.now(timezone.utc),
         sa_column=Column(TIMESTAMP(timezone=True), nullable=False),
     )
+    # Bumped by every write that changes what the group's read endpoints return;
+    # their ETags are derived from it (see app/group_versions.py)
+    version: int = Field(default=1, nullable=False)
 
     # The user who created the group.
     creator: User = Relationship(back_populates="groups_created")
 
     # Users who are members of this group.
-    memberships: List["Membership"] = Relationship(back_populates="group")
+    memberships: List["Membership"] = Relationship(back_populates="group", sa_relationship_kwargs=CASCADE_DELETE)
 
     # Expenses recorded in this group.
-    expenses: List["Expense"] = Relationship(back_populates="group")
+    expenses: List["Expense"] = Relationship(back_populates="group", sa_relationship_kwargs=CASCADE_DELETE)
 
 
 # Membership Table → joins User and Group
 # Tracks which users are members of which groups
 class Membership(SQLModel, table=True):
     __tablename__ = "memberships"
-    __table_args__ = (UniqueConstraint("user_id", "group_id"),)
+    # The unique constraint's index covers lookups by user_id; the second index
+    # serves member listings and counts by group_id
+    __table_args__ = (
+        UniqueConstraint("user_id", "group_id"),
+        Index("ix_memberships_group_id_user_id", "group_id", "user_id"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="users.id", nullable=False)
-    group_id: int = Field(foreign_key="groups.id", nullable=False)
+    group_id: int = Field(sa_column_args=[ForeignKey("groups.id", ondelete="CASCADE")], nullable=False)
 
     # The user in this membership.
     user: User = Relationship(back_populates="memberships")
@@ -72,9 +86,13 @@ class Membership(SQLModel, table=True):
 
 class Expense(SQLModel, table=True):
     __tablename__ = "expenses"
+    # Matches the group filter plus the (created_at, id) keyset order of the listings
+    __table_args__ = (
+        Index("ix_expenses_group_id_created_at_id", "group_id", "created_at", "id"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
-    group_id: int = Field(foreign_key="groups.id", nullable=False)
+    group_id: int = Field(sa_column_args=[ForeignKey("groups.id", ondelete="CASCADE")], nullable=False)
     description: Optional[str] = Field(default=None)
     type: str = Field(default="regular")  # "regular" or "settlement"
     total_amount: float = Field(nullable=False)
@@ -87,19 +105,22 @@ class Expense(SQLModel, table=True):
     group: Group = Relationship(back_populates="expenses")
 
     # Who paid, and how much.
-    payers: List["ExpensePayer"] = Relationship(back_populates="expense")
+    payers: List["ExpensePayer"] = Relationship(back_populates="expense", sa_relationship_kwargs=CASCADE_DELETE)
 
     # Who owes, and how much.
-    shares: List["ExpenseShare"] = Relationship(back_populates="expense")
+    shares: List["ExpenseShare"] = Relationship(back_populates="expense", sa_relationship_kwargs=CASCADE_DELETE)
 
 
 # ExpensePayer Table → joins Expense and User
 # Tracks who paid for a specific expense, and how much
 class ExpensePayer(SQLModel, table=True):
     __tablename__ = "expense_payers"
+    __table_args__ = (
+        Index("ix_expense_payers_expense_id_user_id", "expense_id", "user_id"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
-    expense_id: int = Field(foreign_key="expenses.id", nullable=False)
+    expense_id: int = Field(sa_column_args=[ForeignKey("expenses.id", ondelete="CASCADE")], nullable=False)
     user_id: int = Field(foreign_key="users.id", nullable=False)
     paid_amount: float = Field(nullable=False)
 
@@ -111,9 +132,12 @@ class ExpensePayer(SQLModel, table=True):
 # Tracks how much each user owes (is responsible to share) in a specific expense
 class ExpenseShare(SQLModel, table=True):
     __tablename__ = "expense_shares"
+    __table_args__ = (
+        Index("ix_expense_shares_expense_id_user_id", "expense_id", "user_id"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
-    expense_id: int = Field(foreign_key="expenses.id", nullable=False)
+    expense_id: int = Field(sa_column_args=[ForeignKey("expenses.id", ondelete="CASCADE")], nullable=False)
     user_id: int = Field(foreign_key="users.id", nullable=False)
     share_amount: float = Field(nullable=False)
 
@@ -121,6 +145,35 @@ class ExpenseShare(SQLModel, table=True):
     user: User = Relationship(back_populates="expense_shares")
 
 
+# GroupBalance Table → running net balance per member of a group
+# Kept in step with expense_payers/expense_shares so summaries don't rescan history
+class GroupBalance(SQLModel, table=True):
+    __tablename__ = "group_balances"
+
+    group_id: int = Field(sa_column_args=[ForeignKey("groups.id", ondelete="CASCADE")], primary_key=True)
+    user_id: int = Field(foreign_key="users.id", primary_key=True)
+    net_balance: float = Field(default=0, nullable=False)
+
+
+# GroupStats Table → per-group counters for the groups overview
+# Kept in step by the membership and expense endpoints so the overview doesn't
+# count rows on every dashboard load (see app/group_stats.py)
+class GroupStats(SQLModel, table=True):
+    __tablename__ = "group_stats"
+
+    group_id: int = Field(sa_column_args=[ForeignKey("groups.id", ondelete="CASCADE")], primary_key=True)
+    member_count: int = Field(default=0, nullable=False)
+    # Every expense, settlements included
+    expense_count: int = Field(default=0, nullable=False)
+    # Sum of regular expenses; settlements move money but aren't spending
+    total_spent: float = Field(default=0, nullable=False)
+    # Last change to the group's expenses or members
+    last_activity_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(TIMESTAMP(timezone=True), nullable=False),
+    )
+
+
 class UserCreate(SQLModel):
     email: str
     password: str
@@ -128,9 +181,12 @@ class UserCreate(SQLModel):
 
 class GroupInvitation(SQLModel, table=True):
     __tablename__ = "group_invitations"
+    __table_args__ = (
+        Index("ix_group_invitations_group_id_invitee_email", "group_id", "invitee_email"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
-    group_id: int = Field(foreign_key="groups.id", nullable=False)
+    group_id: int = Field(sa_column_args=[ForeignKey("groups.id", ondelete="CASCADE")], nullable=False)
     invitee_email: str = Field(index=True, nullable=False)
     token: str = Field(unique=True, index=True, nullable=False)
     expires_at: datetime = Field(
@@ -149,7 +205,7 @@ class PasswordResetToken(SQLModel, table=True):
     __tablename__ = "password_reset_tokens"
 
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: int = Field(foreign_key="users.id", nullable=False)
+    user_id: int = Field(foreign_key="users.id", index=True, nullable=False)
     token: str = Field(unique=True, index=True, nullable=False)
     expires_at: datetime = Field(
         sa_column=Column(TIMESTAMP(timezone=True), nullable=False)
@@ -160,4 +216,33 @@ class PasswordResetToken(SQLModel, table=True):
         sa_column=Column(TIMESTAMP(timezone=True), nullable=False),
     )
 
-    user: User = Relationship()
\ No newline at end of file
+    user: User = Relationship()
+
+
+class EmailOutbox(SQLModel, table=True):
+    """
+    Emails waiting to be sent. Rows are written in the same transaction as the
+    invitation or reset token they belong to, and app/outbox.py delivers them.
+    """
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        # The sender's poll: pending rows that are due, oldest first
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    recipient: str = Field(nullable=False)
+    subject: str = Field(nullable=False)
+    body: str = Field(sa_column=Column(Text, nullable=False))
+    status: str = Field(default="pending", nullable=False)  # pending, sent, failed
+    attempts: int = Field(default=0, nullable=False)
+    last_error: Optional[str] = Field(default=None, sa_column=Column(Text))
+    next_attempt_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(TIMESTAMP(timezone=True), nullable=False),
+    )
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(TIMESTAMP(timezone=True), nullable=False),
+    )
+    sent_at: Optional[datetime] = Field(default=None, sa_column=Column(TIMESTAMP(timezone=True)))
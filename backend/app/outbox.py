@@ -0,0 +1,281 @@
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+from email.utils import formataddr
+from typing import TYPE_CHECKING, List
+from sqlmodel import select, update, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.config import settings
+from app.database import async_engine
+from app.mail_utils import get_mail_config
+from app.metrics import registry, Counter, Gauge, Histogram
+from app.models import EmailOutbox
+
+if TYPE_CHECKING:
+    import aiosmtplib
+
+logger = logging.getLogger(__name__)
+
+email_outbox_depth = registry.register(Gauge(
+    "email_outbox_depth", "Emails waiting in the outbox, including ones backing off after a failure.",
+))
+email_outbox_oldest_pending_seconds = registry.register(Gauge(
+    "email_outbox_oldest_pending_seconds", "Age of the oldest email still waiting in the outbox.",
+))
+email_send_seconds = registry.register(Histogram(
+    "email_send_seconds", "Time to hand one email to the SMTP server.",
+))
+email_delivery_seconds = registry.register(Histogram(
+    "email_delivery_seconds", "Time from writing an email to the outbox to handing it to the SMTP server.",
+    buckets=(0.1, 0.5, 1, 5, 15, 60, 300, 900, 3600, 14400),
+))
+email_outbox_sent_total = registry.register(Counter(
+    "email_outbox_sent_total", "Emails handed to the SMTP server.",
+))
+email_outbox_retries_total = registry.register(Counter(
+    "email_outbox_retries_total", "Failed send attempts that were scheduled for a retry.",
+))
+email_outbox_failed_total = registry.register(Counter(
+    "email_outbox_failed_total", "Emails given up on: rejected permanently or out of attempts.",
+))
+email_smtp_connections_total = registry.register(Counter(
+    "email_smtp_connections_total", "SMTP connections opened by the outbox sender (one per batch).",
+))
+
+
+def enqueue_email(session: AsyncSession, recipient: str, subject: str, body: str) -> EmailOutbox:
+    """
+    Adds an HTML email to the outbox. Nothing is committed here, so the email is
+    stored if and only if the caller's transaction commits.
+    """
+    email = EmailOutbox(recipient=recipient, subject=subject, body=body)
+    session.add(email)
+    return email
+
+
+def _is_permanent(error: Exception) -> bool:
+    """5xx replies (unknown mailbox, rejected content) won't succeed on a retry."""
+    import aiosmtplib
+    if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+        return all(refused.code >= 500 for refused in error.recipients)
+    return isinstance(error, aiosmtplib.SMTPResponseException) and error.code >= 500
+
+
+def _aware(value: datetime) -> datetime:
+    # SQLite hands timestamps back without their timezone; they are stored in UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class OutboxSender:
+    """
+    Background task that drains the email_outbox table. Due rows are claimed in
+    batches by one UPDATE that pushes next_attempt_at out by `claim_seconds` and
+    returns exactly the rows it claimed, so several workers can share the table (FOR
+    UPDATE SKIP LOCKED on Postgres keeps them from waiting on each other). If the
+    process dies mid-batch they become due again once the claim lapses. Each batch
+    goes out over a single SMTP connection. Failures are retried with exponential
+    backoff and jitter until `max_attempts`, after which the row is marked failed;
+    permanent (5xx) rejections are marked failed straight away.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        poll_interval: float,
+        max_attempts: int,
+        backoff_base: float,
+        backoff_max: float,
+        claim_seconds: float,
+        mail_config=None,
+    ):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.claim_seconds = claim_seconds
+        self._mail_config = mail_config
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = None
+
+    @property
+    def mail_config(self):
+        # Built on the first send rather than at import, see app.mail_utils
+        if self._mail_config is None:
+            self._mail_config = get_mail_config()
+        return self._mail_config
+
+    def start(self):
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._stopping = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+    def notify(self):
+        """Wakes the sender straight away, e.g. after a request committed an email."""
+        self._wakeup.set()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                claimed = await self.drain_once()
+            except Exception:
+                logger.exception("Email outbox: send cycle failed")
+                claimed = 0
+            # A full batch means more are probably due, so go again without waiting
+            if claimed < self.batch_size and not self._stopping:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    async def drain_once(self) -> int:
+        """Claims and sends one batch; returns how many emails it claimed."""
+        batch = await self._claim_batch()
+        if batch:
+            await self._send_batch(batch)
+        await self._update_depth()
+        return len(batch)
+
+    async def _claim_batch(self) -> List[EmailOutbox]:
+        now = datetime.now(timezone.utc)
+        due = (EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= now)
+        # SQLite ignores SKIP LOCKED; there the claim is still atomic because the
+        # UPDATE runs under the database's write lock and re-checks that each row
+        # is due, so a row another worker has just claimed is left out
+        candidates = (
+            select(EmailOutbox.id)
+            .where(*due)
+            .order_by(EmailOutbox.next_attempt_at)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            batch = (await session.exec(
+                update(EmailOutbox)
+                .where(EmailOutbox.id.in_(candidates), *due)
+                .values(next_attempt_at=now + timedelta(seconds=self.claim_seconds))
+                .returning(EmailOutbox)
+                .execution_options(synchronize_session=False)
+            )).scalars().all()
+            await session.commit()
+        # Only the rows this UPDATE returned were claimed here
+        return sorted(batch, key=lambda email: email.id)
+
+    def backoff_delay(self, attempts: int) -> float:
+        """Seconds to wait after the `attempts`-th failure: doubling, capped, with jitter."""
+        delay = min(self.backoff_base * 2 ** (attempts - 1), self.backoff_max)
+        return delay * random.uniform(0.5, 1.0)
+
+    def _build_message(self, email: EmailOutbox) -> EmailMessage:
+        config = self.mail_config
+        message = EmailMessage()
+        message["From"] = formataddr((config.MAIL_FROM_NAME, config.MAIL_FROM)) if config.MAIL_FROM_NAME else config.MAIL_FROM
+        message["To"] = email.recipient
+        message["Subject"] = email.subject
+        message.set_content(email.body, subtype="html")
+        return message
+
+    async def _connect(self) -> "aiosmtplib.SMTP":
+        # Imported here, so a worker that never sends mail never loads the SMTP client
+        import aiosmtplib
+        config = self.mail_config
+        smtp = aiosmtplib.SMTP(
+            hostname=config.MAIL_SERVER,
+            port=config.MAIL_PORT,
+            timeout=config.TIMEOUT,
+            use_tls=config.MAIL_SSL_TLS,
+            start_tls=config.MAIL_STARTTLS,
+            validate_certs=config.VALIDATE_CERTS,
+            local_hostname=config.LOCAL_HOSTNAME,
+        )
+        await smtp.connect()
+        email_smtp_connections_total.inc()
+        if config.USE_CREDENTIALS:
+            await smtp.login(config.MAIL_USERNAME, config.MAIL_PASSWORD.get_secret_value())
+        return smtp
+
+    async def _send_batch(self, batch: List[EmailOutbox]):
+        sent, failed = [], []
+        if self.mail_config.SUPPRESS_SEND:
+            sent = batch
+        else:
+            try:
+                smtp = await self._connect()
+            except Exception as error:
+                failed = [(email, error) for email in batch]
+            else:
+                from aiosmtplib import SMTPServerDisconnected
+                try:
+                    for i, email in enumerate(batch):
+                        start = time.perf_counter()
+                        try:
+                            await smtp.send_message(self._build_message(email))
+                        except SMTPServerDisconnected as error:
+                            # The rest of the batch can't go out on this connection
+                            failed.extend((e, error) for e in batch[i:])
+                            break
+                        except Exception as error:
+                            failed.append((email, error))
+                        else:
+                            email_send_seconds.observe(time.perf_counter() - start)
+                            sent.append(email)
+                finally:
+                    try:
+                        await smtp.quit()
+                    except Exception:
+                        pass
+
+        now = datetime.now(timezone.utc)
+        for email in sent:
+            email.status = "sent"
+            email.attempts += 1
+            email.sent_at = now
+            email.last_error = None
+            email_outbox_sent_total.inc()
+            email_delivery_seconds.observe((now - _aware(email.created_at)).total_seconds())
+        for email, error in failed:
+            email.attempts += 1
+            email.last_error = f"{type(error).__name__}: {error}"
+            if email.attempts >= self.max_attempts or _is_permanent(error):
+                email.status = "failed"
+                email_outbox_failed_total.inc()
+                logger.error(f"Email outbox: giving up on email {email.id} to {email.recipient}: {email.last_error}")
+            else:
+                email.next_attempt_at = now + timedelta(seconds=self.backoff_delay(email.attempts))
+                email_outbox_retries_total.inc()
+                logger.warning(f"Email outbox: attempt {email.attempts} for email {email.id} failed: {email.last_error}")
+
+        async with AsyncSession(async_engine) as session:
+            session.add_all(batch)
+            await session.commit()
+
+    async def _update_depth(self):
+        async with AsyncSession(async_engine) as session:
+            depth, oldest = (await session.exec(
+                select(func.count(EmailOutbox.id), func.min(EmailOutbox.created_at))
+                .where(EmailOutbox.status == "pending")
+            )).one()
+        email_outbox_depth.set(depth)
+        age = (datetime.now(timezone.utc) - _aware(oldest)).total_seconds() if oldest else 0
+        email_outbox_oldest_pending_seconds.set(age)
+
+
+outbox_sender = OutboxSender(
+    batch_size=settings.email_outbox_batch_size,
+    poll_interval=settings.email_outbox_poll_interval,
+    max_attempts=settings.email_outbox_max_attempts,
+    backoff_base=settings.email_outbox_backoff_base,
+    backoff_max=settings.email_outbox_backoff_max,
+    claim_seconds=settings.email_outbox_claim_seconds,
+)
@@ -0,0 +1,42 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+from app.models import Expense
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(expense: Expense) -> str:
+    """Opaque cursor pointing just after `expense` in (created_at, id) descending order."""
+    payload = json.dumps({"created_at": expense.created_at.isoformat(), "id": expense.id})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(payload["created_at"]), int(payload["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def paginate_expenses(statement, cursor: Optional[str], limit: int):
+    """
+    Applies keyset pagination on (created_at, id), newest first. One extra row is
+    fetched so the caller can tell whether another page exists.
+    """
+    if cursor:
+        created_at, expense_id = decode_cursor(cursor)
+        statement = statement.where(tuple_(Expense.created_at, Expense.id) < tuple_(created_at, expense_id))
+    return statement.order_by(Expense.created_at.desc(), Expense.id.desc()).limit(limit + 1)
+
+
+def split_page(rows, limit: int):
+    """Returns (items, next_cursor) from the limit + 1 rows fetched by paginate_expenses."""
+    items = list(rows[:limit])
+    next_cursor = encode_cursor(items[-1]) if len(rows) > limit else None
+    return items, next_cursor
@@ -0,0 +1,72 @@
+import threading
+import time
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+
+class PoolStats:
+    """Cumulative checkout counters for one connection pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_checkout(self, waited: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+
+class _InstrumentedPoolMixin:
+    # Stats live on the class rather than the instance so they survive
+    # Pool.recreate(), which builds a fresh pool from the constructor args
+    stats: PoolStats
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.stats.record_checkout(time.perf_counter() - start, timed_out=True)
+            raise
+        self.stats.record_checkout(time.perf_counter() - start)
+        return connection
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    """QueuePool for the sync engine that records checkout wait times and timeouts."""
+    stats = PoolStats()
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool for the async engine that records checkout wait times and timeouts."""
+    stats = PoolStats()
+
+
+def pool_snapshot(pool) -> dict:
+    """Live and cumulative statistics for a pool, safe to serialize as JSON."""
+    snapshot = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        snapshot.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            # QueuePool.overflow() counts from -size, so clamp it to connections beyond pool_size
+            "overflow": max(pool.overflow(), 0),
+        })
+    stats = getattr(pool, "stats", None)
+    if stats is not None:
+        snapshot.update({
+            "checkouts": stats.checkouts,
+            "timeouts": stats.timeouts,
+            "wait_seconds_total": round(stats.wait_seconds_total, 6),
+            "wait_seconds_max": round(stats.wait_seconds_max, 6),
+        })
+    return snapshot
@@ -0,0 +1,32 @@
+from sqlalchemy import event
+
+
+class QueryCounter:
+    """
+    Records every statement an engine sends to the database while active:
+
+        with QueryCounter(async_engine) as queries:
+            client.get("/api/groups/1/members")
+        assert queries.count <= 2, queries.statements
+
+    Accepts a sync or async engine; the listener goes on the underlying sync
+    engine, which is where the async one executes its cursors.
+    """
+
+    def __init__(self, engine):
+        self.engine = getattr(engine, "sync_engine", engine)
+        self.statements = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append((statement, parameters, executemany))
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, "before_cursor_execute", self._record)
@@ -0,0 +1,133 @@
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+from fastapi import HTTPException, Request
+from app.config import settings
+from app.hashing import password_hasher
+from app.metrics import registry, Counter
+
+auth_admitted_total = registry.register(Counter(
+    "auth_admitted_total", "Auth requests let through by the admission checks.", ["endpoint"]))
+auth_rejected_total = registry.register(Counter(
+    "auth_rejected_total", "Auth requests rejected with 429, by the check that refused them.", ["endpoint", "reason"]))
+
+
+class RateLimitBackend(ABC):
+    """
+    Where the token buckets live. The in-memory backend below keeps them per
+    worker; a backend backed by a shared store (Redis, say) makes the limits
+    apply across workers. Assign it to `auth_limiter.backend` at startup.
+    """
+
+    @abstractmethod
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        """
+        Takes one token from the bucket at `key`, which refills at `rate` tokens
+        per second up to `burst`. Returns 0 if a token was taken, otherwise the
+        seconds until one will be available.
+        """
+
+    def snapshot(self) -> dict:
+        return {}
+
+
+class MemoryBackend(RateLimitBackend):
+    """
+    Token buckets in a dict, bounded at `max_keys`: past that the least recently
+    used bucket is dropped, which only forgets a caller that has been quiet the
+    longest. Only touched from the event loop, so no locking is needed.
+    """
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self.evictions = 0
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [burst, now]
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / rate
+
+    def snapshot(self) -> dict:
+        return {"keys": len(self._buckets), "max_keys": self.max_keys, "evictions": self.evictions}
+
+
+class AuthLimiter:
+    """
+    Admission checks for the auth endpoints that run bcrypt or send mail, done
+    before they touch the database: a token bucket per client IP, one per
+    account (the email being logged into, registered or reset), and the
+    password hasher's queue limit. A refused request gets a 429 with Retry-After
+    straight away. A per_minute of 0 turns that bucket off.
+    """
+
+    def __init__(self, backend: RateLimitBackend, ip_per_minute: float, ip_burst: float,
+                 account_per_minute: float, account_burst: float, enabled: bool = True):
+        self.backend = backend
+        self.ip_per_minute = ip_per_minute
+        self.ip_burst = ip_burst
+        self.account_per_minute = account_per_minute
+        self.account_burst = account_burst
+        self.enabled = enabled
+
+    async def admit(self, request: Request, endpoint: str, account: Optional[str] = None, hashes: bool = True):
+        """
+        Raises a 429 if this request is over a limit. `hashes` says whether the
+        endpoint runs bcrypt, and so should be refused while the hasher is full.
+        """
+        if not self.enabled:
+            return
+        client_ip = request.client.host if request.client else "unknown"
+        checks = [("ip", f"ip:{client_ip}", self.ip_per_minute, self.ip_burst)]
+        if account:
+            checks.append(("account", f"account:{account.strip().lower()}", self.account_per_minute, self.account_burst))
+        for reason, key, per_minute, burst in checks:
+            if per_minute <= 0:
+                continue
+            wait = await self.backend.take(f"{endpoint}:{key}", per_minute / 60, burst)
+            if wait:
+                self._reject(endpoint, reason, wait)
+        # Checked last so a request over its own limits doesn't count as load
+        if hashes and password_hasher.saturated:
+            self._reject(endpoint, "busy", password_hasher.retry_after())
+        auth_admitted_total.inc(endpoint)
+
+    def _reject(self, endpoint: str, reason: str, wait: float):
+        auth_rejected_total.inc(endpoint, reason)
+        raise HTTPException(
+            status_code=429,
+            detail="Too many attempts, please try again later.",
+            headers={"Retry-After": str(max(1, math.ceil(wait)))},
+        )
+
+    def snapshot(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "ip_per_minute": self.ip_per_minute,
+            "account_per_minute": self.account_per_minute,
+            **self.backend.snapshot(),
+        }
+
+
+auth_limiter = AuthLimiter(
+    backend=MemoryBackend(max_keys=settings.auth_rate_limit_max_keys),
+    ip_per_minute=settings.auth_rate_limit_ip_per_minute,
+    ip_burst=settings.auth_rate_limit_ip_burst,
+    account_per_minute=settings.auth_rate_limit_account_per_minute,
+    account_burst=settings.auth_rate_limit_account_burst,
+    enabled=settings.auth_rate_limit_enabled,
+)
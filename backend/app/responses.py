@@ -0,0 +1,44 @@
+from typing import Any, Optional
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from app.config import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+    from pydantic_core import to_json
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered by orjson (or pydantic-core if orjson isn't
+    installed) instead of the stdlib encoder. Datetimes come out as pydantic
+    writes them, UTC as "Z", so a response looks the same whichever path
+    produced it.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+        return to_json(content)
+
+
+def fast_json(content: Any, response: Optional[Response] = None):
+    """
+    Returns `content` (plain dicts, lists, numbers, strings and datetimes) as a
+    FastJSONResponse, which FastAPI sends as-is. The route's response_model
+    still documents the endpoint in OpenAPI but is no longer validated against,
+    so this is for hot endpoints whose payload is built field by field to match
+    it. Headers set on the injected `response` (e.g. ETags) are carried over.
+
+    With FAST_JSON_RESPONSES=False the content is returned unchanged and goes
+    through response_model validation as before, which catches a payload that
+    has drifted from its schema.
+    """
+    if not settings.fast_json_responses:
+        return content
+    fast = FastJSONResponse(content)
+    if response is not None:
+        fast.headers.update(response.headers)
+    return fast
@@ -1,6 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Body
-from sqlmodel import Session, select
-from passlib.context import CryptContext
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Request
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.database import get_session
 from app.models import User, UserCreate, PasswordResetToken
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
@@ -8,31 +8,35 @@ from datetime import timedelta, datetime, timezone
 from app.auth_utils import create_access_token
 from app.config import settings
 from app.deps import get_current_user
-from app.schemas import PasswordResetRequest, PasswordResetConfirm
+from app.hashing import password_hasher
+from app.rate_limit import auth_limiter
+from app.user_cache import user_cache
+from app import group_versions
+from app.schemas import PasswordResetRequest, PasswordResetConfirm, CurrentUser
 import re
 import secrets
-from pathlib import Path
+from app.templating import render_email
 from fastapi import BackgroundTasks
-from fastapi_mail import MessageSchema
-from fastapi_mail import FastMail
-from app.mail_utils import fast_mail
+from app.outbox import enqueue_email, outbox_sender
 
 router = APIRouter()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # Get user by email
-def get_user_by_email(session: Session, email: str):
+async def get_user_by_email(session: AsyncSession, email: str):
     statement = select(User).where(User.email == email)
-    return session.exec(statement).first()
+    return (await session.exec(statement)).first()
 
 # Register endpoint
 @router.post("/register", response_model=User)
-async def register_user(user_data: UserCreate, session: Session = Depends(get_session)):
+async def register_user(request: Request, user_data: UserCreate, session: AsyncSession = Depends(get_session)):
+    await auth_limiter.admit(request, "register", account=user_data.email)
     try:
         print(f"Registering user: {user_data.email}")  # Debug log
-        db_user = get_user_by_email(session, user_data.email)
+        db_user = await get_user_by_email(session, user_data.email)
         if db_user:
             raise HTTPException(status_code=400, detail="Email already registered")
+        # Hand the connection back while queued for bcrypt; the insert below checks out a new one
+        await session.close()
 
         # Extract name from email
         name = user_data.email.split("@")[0]
@@ -40,14 +44,16 @@ async def register_user(user_data: UserCreate, session: Session = Depends(get_se
         user = User(
             email=user_data.email,
             name=name,
-            password_hash=pwd_context.hash(user_data.password)
+            password_hash=await password_hasher.hash(user_data.password)
         )
 
         session.add(user)
-        session.commit()
-        session.refresh(user)
+        await session.commit()
+        await session.refresh(user)
         print(f"User registered successfully: {user.id}")  # Debug log
         return user
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Registration error: {e}")  # Debug log
         raise HTTPException(status_code=500, detail=f"Registration failed: {str(e)}")
@@ -56,22 +62,26 @@ async def register_user(user_data: UserCreate, session: Session = Depends(get_se
 @router.put("/users/me/name")
 async def update_user_name(
     data: dict = Body(...),
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user)
+    session: AsyncSession = Depends(get_session),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     new_name = data.get("name")
     if not new_name:
         raise HTTPException(status_code=400, detail="Name is required")
-    current_user.name = new_name
-    session.add(current_user)
-    session.commit()
-    session.refresh(current_user)
-    return {"message": "Name updated successfully", "name": current_user.name}
+    user = await session.get(User, current_user.id)
+    user.name = new_name
+    session.add(user)
+    # Names appear in the group summaries, so their ETags have to change too
+    await group_versions.bump_user_groups(session, user.id)
+    await session.commit()
+    await session.refresh(user)
+    user_cache.invalidate(user.id)
+    return {"message": "Name updated successfully", "name": user.name}
 
 # Get user by id
 @router.get("/users/{user_id}", response_model=User)
-async def get_user(user_id: int, session: Session = Depends(get_session)):
-    user = session.get(User, user_id)
+async def get_user(user_id: int, session: AsyncSession = Depends(get_session)):
+    user = await session.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -79,11 +89,15 @@ async def get_user(user_id: int, session: Session = Depends(get_session)):
 
 @router.post("/token")
 async def login_for_access_token(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
-    user = get_user_by_email(session, form_data.username)
-    if not user or not pwd_context.verify(form_data.password, user.password_hash):
+    await auth_limiter.admit(request, "token", account=form_data.username)
+    user = await get_user_by_email(session, form_data.username)
+    # Hand the connection back before queueing for bcrypt, so a burst of logins can't drain the pool
+    await session.close()
+    if not user or not await password_hasher.verify(form_data.password, user.password_hash):
         raise HTTPException(
             status_code=401, detail="Incorrect email or password")
     access_token = create_access_token(data={"sub": str(user.id)})
@@ -92,8 +106,8 @@ async def login_for_access_token(
 @router.put("/users/me/password")
 async def change_password(
     data: dict = Body(...),
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user)
+    session: AsyncSession = Depends(get_session),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     new_password = data.get("new_password")
     if not new_password:
@@ -107,21 +121,26 @@ async def change_password(
         raise HTTPException(status_code=400, detail="Password must be at least 8 characters and include uppercase, lowercase, and a digit.")
     
     # Update password
-    current_user.password_hash = pwd_context.hash(new_password)
-    session.add(current_user)
-    session.commit()
+    user = await session.get(User, current_user.id)
+    user.password_hash = await password_hasher.hash(new_password)
+    session.add(user)
+    await session.commit()
+    user_cache.invalidate(user.id)
     
     return {"message": "Password updated successfully"}
 
 @router.post("/forgot-password")
 async def forgot_password(
     request: PasswordResetRequest,
-    session: Session = Depends(get_session)
+    http_request: Request,
+    session: AsyncSession = Depends(get_session)
 ):
     """Request a password reset for the given email"""
+    # No bcrypt here, but each call may send an email
+    await auth_limiter.admit(http_request, "forgot-password", account=request.email, hashes=False)
     try:
         # Find user by email
-        user = get_user_by_email(session, request.email)
+        user = await get_user_by_email(session, request.email)
         if not user:
             # Don't reveal if email exists or not for security
             return {"message": "If the email exists, a password reset link has been sent."}
@@ -131,12 +150,12 @@ async def forgot_password(
         expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
         
         # Invalidate any existing reset tokens for this user
-        existing_tokens = session.exec(
+        existing_tokens = (await session.exec(
             select(PasswordResetToken).where(
                 PasswordResetToken.user_id == user.id,
                 PasswordResetToken.used == False
             )
-        ).all()
+        )).all()
         
         for existing_token in existing_tokens:
             existing_token.used = True
@@ -149,29 +168,14 @@ async def forgot_password(
             expires_at=expires_at
         )
         session.add(reset_token)
-        session.commit()
-        
-        # Send email with reset link
-        reset_link = f"{settings.frontend_base_url}/reset-password/{token}"
-        
-        # Read the HTML template
-        template_path = Path(__file__).parent.parent / "templates" / "password_reset.html"
-        with open(template_path, "r", encoding="utf-8") as f:
-            template_str = f.read()
-        
-        # Populate the template
-        body = template_str.replace("{{ user_name }}", user.name)
-        body = body.replace("{{ reset_link }}", reset_link)
 
-        message = MessageSchema(
-            subject="Reset Your SplitMoney Password",
-            recipients=[user.email],
-            body=body,
-            subtype="html"
-        )
-        
-        # Send email using the configured fast_mail instance
-        await fast_mail.send_message(message)
+        # The email is committed with the token and sent by the outbox worker,
+        # so the response doesn't wait on SMTP
+        reset_link = f"{settings.frontend_base_url}/reset-password/{token}"
+        body = render_email("password_reset.html", user_name=user.name, reset_link=reset_link)
+        enqueue_email(session, user.email, "Reset Your SplitMoney Password", body)
+        await session.commit()
+        outbox_sender.notify()
         
         return {"message": "If the email exists, a password reset link has been sent."}
         
@@ -182,18 +186,20 @@ async def forgot_password(
 @router.post("/reset-password")
 async def reset_password(
     request: PasswordResetConfirm,
-    session: Session = Depends(get_session)
+    http_request: Request,
+    session: AsyncSession = Depends(get_session)
 ):
     """Reset password using the provided token"""
+    await auth_limiter.admit(http_request, "reset-password")
     try:
         # Find the reset token
-        reset_token = session.exec(
+        reset_token = (await session.exec(
             select(PasswordResetToken).where(
                 PasswordResetToken.token == request.token,
                 PasswordResetToken.used == False,
                 PasswordResetToken.expires_at > datetime.now(timezone.utc)
             )
-        ).first()
+        )).first()
         
         if not reset_token:
             raise HTTPException(
@@ -202,19 +208,20 @@ async def reset_password(
             )
         
         # Get the user
-        user = session.get(User, reset_token.user_id)
+        user = await session.get(User, reset_token.user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
         # Update password
-        user.password_hash = pwd_context.hash(request.new_password)
+        user.password_hash = await password_hasher.hash(request.new_password)
         session.add(user)
         
         # Mark token as used
         reset_token.used = True
         session.add(reset_token)
         
-        session.commit()
+        await session.commit()
+        user_cache.invalidate(user.id)
         
         return {"message": "Password reset successfully"}
         
@@ -227,16 +234,16 @@ async def reset_password(
 @router.get("/reset-password/{token}")
 async def verify_reset_token(
     token: str,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
     """Verify if a reset token is valid"""
-    reset_token = session.exec(
+    reset_token = (await session.exec(
         select(PasswordResetToken).where(
             PasswordResetToken.token == token,
             PasswordResetToken.used == False,
             PasswordResetToken.expires_at > datetime.now(timezone.utc)
         )
-    ).first()
+    )).first()
     
     if not reset_token:
         raise HTTPException(
@@ -1,46 +1,91 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select, delete
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlmodel import select, exists, insert, delete
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Literal, Optional
+from datetime import datetime, timezone
 from app.database import get_session
 from app.deps import get_current_user
 from app.models import Expense, ExpensePayer, ExpenseShare, Group, Membership, User
-from app.schemas import ExpenseWithDetailsOut
+from app.schemas import ExpensePage, GroupExpensePage, BulkExpenseCreate, BulkExpenseResult, CurrentUser
+from app.export import stream_csv, stream_ndjson
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate_expenses, split_page
+from app.responses import fast_json
+from app import ledger, group_versions, group_stats
 from collections import defaultdict
 
 router = APIRouter()
 
-# Get all expenses for the current user across all their groups
-@router.get("/expenses", response_model=List[ExpenseWithDetailsOut])
-async def get_expenses(
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user)
+def filter_expenses(
+    statement,
+    type: Optional[str],
+    start: Optional[datetime],
+    end: Optional[datetime],
+    participant_id: Optional[int],
 ):
-    user_group_ids = session.exec(
-        select(Membership.group_id).where(Membership.user_id == current_user.id)
-    ).all()
+    """Adds the optional listing filters to an Expense select, all evaluated in SQL."""
+    if type:
+        statement = statement.where(Expense.type == type)
+    if start:
+        statement = statement.where(Expense.created_at >= start)
+    if end:
+        statement = statement.where(Expense.created_at < end)
+    if participant_id is not None:
+        # A participant either paid for or has a share in the expense
+        statement = statement.where(
+            exists().where(ExpensePayer.expense_id == Expense.id, ExpensePayer.user_id == participant_id)
+            | exists().where(ExpenseShare.expense_id == Expense.id, ExpenseShare.user_id == participant_id)
+        )
+    return statement
 
-    if not user_group_ids:
-        return []
+# Get all expenses for the current user across all their groups, newest first
+@router.get("/expenses", response_model=ExpensePage)
+async def get_expenses(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    group_id: Optional[int] = None,
+    type: Optional[Literal["regular", "settlement"]] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    participant_id: Optional[int] = None,
+    session: AsyncSession = Depends(get_session),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    # A join rather than IN (subquery) so the planner starts from the user's
+    # memberships and walks each group's slice of the (group_id, created_at, id) index
+    statement = (
+        select(Expense)
+        .join(Membership, Membership.group_id == Expense.group_id)
+        .where(Membership.user_id == current_user.id)
+    )
+    if group_id is not None:
+        statement = statement.where(Expense.group_id == group_id)
+    statement = filter_expenses(statement, type, start, end, participant_id)
 
-    expenses = session.exec(
-        select(Expense).where(Expense.group_id.in_(user_group_ids))
-    ).all()
+    rows = (await session.exec(paginate_expenses(statement, cursor, limit))).all()
+    expenses, next_cursor = split_page(rows, limit)
+    if not expenses:
+        return fast_json({"items": [], "next_cursor": None})
     expense_ids = [exp.id for exp in expenses]
 
-    payers = session.exec(
-        select(ExpensePayer).where(ExpensePayer.expense_id.in_(expense_ids))
-    ).all()
-    shares = session.exec(
-        select(ExpenseShare).where(ExpenseShare.expense_id.in_(expense_ids))
-    ).all()
+    # Plain columns rather than ORM objects: each row goes straight into the
+    # response, so there is nothing to track and no model_dump per row
+    payers = (await session.exec(
+        select(ExpensePayer.id, ExpensePayer.expense_id, ExpensePayer.user_id, ExpensePayer.paid_amount)
+        .where(ExpensePayer.expense_id.in_(expense_ids))
+    )).all()
+    shares = (await session.exec(
+        select(ExpenseShare.id, ExpenseShare.expense_id, ExpenseShare.user_id, ExpenseShare.share_amount)
+        .where(ExpenseShare.expense_id.in_(expense_ids))
+    )).all()
 
     payers_by_expense = defaultdict(list)
     for p in payers:
-        payers_by_expense[p.expense_id].append(p.model_dump())
+        payers_by_expense[p.expense_id].append(p._asdict())
 
     shares_by_expense = defaultdict(list)
     for s in shares:
-        shares_by_expense[s.expense_id].append(s.model_dump())
+        shares_by_expense[s.expense_id].append(s._asdict())
 
     result = []
     for exp in expenses:
@@ -54,34 +99,87 @@ async def get_expenses(
             "payers": payers_by_expense[exp.id],
             "shares": shares_by_expense[exp.id],
         })
-    return result
+    # Built field by field to match ExpensePage, so it isn't validated again
+    return fast_json({"items": result, "next_cursor": next_cursor})
 
-# Get expenses for a specific group
-@router.get("/groups/{group_id}/expenses", response_model=List[Expense])
+# Get expenses for a specific group, newest first
+@router.get("/groups/{group_id}/expenses", response_model=GroupExpensePage)
 async def get_group_expenses(
     group_id: int,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    type: Optional[Literal["regular", "settlement"]] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    participant_id: Optional[int] = None,
+    session: AsyncSession = Depends(get_session),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    # Security check: ensure user is a member of the group they're requesting
-    membership = session.exec(
+    # Security check: ensure user is a member of the group they're requesting,
+    # reading the group's version (before the page, see get_group_summary) in the same lookup
+    version = await group_versions.member_group_version(session, group_id, current_user.id)
+    if version is None:
+        raise HTTPException(status_code=403, detail="You are not a member of this group")
+    # Every page and filter combination is its own representation
+    etag = group_versions.make_etag("group-expenses", group_id, version, group_versions.query_key(request))
+    if group_versions.is_not_modified(request, etag):
+        return group_versions.not_modified(etag)
+    group_versions.set_etag(response, etag)
+
+    statement = filter_expenses(
+        select(Expense).where(Expense.group_id == group_id), type, start, end, participant_id
+    )
+    rows = (await session.exec(paginate_expenses(statement, cursor, limit))).all()
+    expenses, next_cursor = split_page(rows, limit)
+    items = [
+        {
+            "id": exp.id,
+            "group_id": exp.group_id,
+            "description": exp.description,
+            "type": exp.type,
+            "total_amount": exp.total_amount,
+            "created_at": exp.created_at,
+        }
+        for exp in expenses
+    ]
+    # The ETag set above is carried over to the response
+    return fast_json({"items": items, "next_cursor": next_cursor}, response)
+
+# Export a group's full expense history as CSV or NDJSON
+@router.get("/groups/{group_id}/export")
+async def export_group_expenses(
+    group_id: int,
+    format: Literal["csv", "ndjson"] = "csv",
+    session: AsyncSession = Depends(get_session),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    membership = (await session.exec(
         select(Membership).where(
             Membership.group_id == group_id,
             Membership.user_id == current_user.id
         )
-    ).first()
+    )).first()
     if not membership:
         raise HTTPException(status_code=403, detail="You are not a member of this group")
-    
-    statement = select(Expense).where(Expense.group_id == group_id)
-    expenses = session.exec(statement).all()
-    return expenses
+
+    # Streamed a page of expenses at a time, so memory stays flat however long the history is
+    if format == "csv":
+        body, media_type = stream_csv(group_id), "text/csv"
+    else:
+        body, media_type = stream_ndjson(group_id), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="group-{group_id}-expenses.{format}"'},
+    )
 
 # Create a new expense
 @router.post("/expenses", response_model=Expense)
-async def create_expense(expense_data: dict, session: Session = Depends(get_session)):
+async def create_expense(expense_data: dict, session: AsyncSession = Depends(get_session)):
     # Validate group exists
-    group = session.get(Group, expense_data["group_id"])
+    group = await session.get(Group, expense_data["group_id"])
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
     
@@ -93,45 +191,131 @@ async def create_expense(expense_data: dict, session: Session = Depends(get_sess
     )
     
     session.add(expense)
-    session.commit()
-    session.refresh(expense)
+    await session.flush()  # assigns expense.id without ending the transaction
     
-    # Add payers
-    for payer_data in expense_data.get("payers", []):
-        payer = ExpensePayer(
-            expense_id=expense.id,
-            user_id=payer_data["user_id"],
-            paid_amount=payer_data["paid_amount"]
-        )
-        session.add(payer)
+    # Payers and shares in one multi-row INSERT each, however many there are
+    payers = expense_data.get("payers", [])
+    shares = expense_data.get("shares", [])
+    if payers:
+        await session.exec(insert(ExpensePayer), params=[
+            {"expense_id": expense.id, "user_id": p["user_id"], "paid_amount": p["paid_amount"]} for p in payers
+        ])
+    if shares:
+        await session.exec(insert(ExpenseShare), params=[
+            {"expense_id": expense.id, "user_id": s["user_id"], "share_amount": s["share_amount"]} for s in shares
+        ])
     
-    # Add shares
-    for share_data in expense_data.get("shares", []):
-        share = ExpenseShare(
-            expense_id=expense.id,
-            user_id=share_data["user_id"],
-            share_amount=share_data["share_amount"]
-        )
-        session.add(share)
+    await ledger.apply_expense(
+        session,
+        expense.group_id,
+        [(p["user_id"], p["paid_amount"]) for p in payers],
+        [(s["user_id"], s["share_amount"]) for s in shares],
+    )
+    await group_stats.record(
+        session, expense.group_id, expenses=1, total_spent=group_stats.spent(expense.type, expense.total_amount)
+    )
+    await group_versions.bump(session, expense.group_id)
     
-    session.commit()
-    session.refresh(expense)
+    await session.commit()
+    await session.refresh(expense)
     return expense
 
+# Create many expenses in one transaction, e.g. when importing a trip's receipts
+@router.post("/expenses/bulk", response_model=BulkExpenseResult)
+async def create_expenses_bulk(
+    data: BulkExpenseCreate,
+    session: AsyncSession = Depends(get_session),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    # One query for the membership of every group involved
+    group_ids = {item.group_id for item in data.expenses}
+    members_by_group = defaultdict(set)
+    for group_id, user_id in (await session.exec(
+        select(Membership.group_id, Membership.user_id).where(Membership.group_id.in_(group_ids))
+    )).all():
+        members_by_group[group_id].add(user_id)
+
+    for index, item in enumerate(data.expenses):
+        members = members_by_group[item.group_id]
+        if current_user.id not in members:
+            raise HTTPException(status_code=403, detail=f"Expense {index}: you are not a member of group {item.group_id}")
+        participants = {p.user_id for p in item.payers} | {s.user_id for s in item.shares}
+        if not participants <= members:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Expense {index}: users {sorted(participants - members)} are not members of group {item.group_id}",
+            )
+
+    # Multi-row INSERT ... RETURNING, with ids in the same order as the request
+    now = datetime.now(timezone.utc)
+    expense_rows = [
+        {
+            "group_id": item.group_id,
+            "description": item.description or "",
+            "type": "regular",
+            "total_amount": item.total_amount,
+            "created_at": now,
+        }
+        for item in data.expenses
+    ]
+    if session.bind.dialect.name == "sqlite":
+        # SQLAlchemy can't match SQLite's RETURNING rows to their parameters, so
+        # sort_by_parameter_order would send one INSERT per expense. SQLite has
+        # one writer at a time and hands out rowids in VALUES order, so the
+        # sorted ids are in request order.
+        expense_ids = sorted((await session.exec(
+            insert(Expense).returning(Expense.id), params=expense_rows
+        )).scalars().all())
+    else:
+        expense_ids = (await session.exec(
+            insert(Expense).returning(Expense.id, sort_by_parameter_order=True), params=expense_rows
+        )).scalars().all()
+
+    payer_rows = [
+        {"expense_id": expense_id, "user_id": p.user_id, "paid_amount": p.paid_amount}
+        for expense_id, item in zip(expense_ids, data.expenses) for p in item.payers
+    ]
+    share_rows = [
+        {"expense_id": expense_id, "user_id": s.user_id, "share_amount": s.share_amount}
+        for expense_id, item in zip(expense_ids, data.expenses) for s in item.shares
+    ]
+    if payer_rows:
+        await session.exec(insert(ExpensePayer), params=payer_rows)
+    if share_rows:
+        await session.exec(insert(ExpenseShare), params=share_rows)
+
+    # One ledger update per group rather than per expense
+    for group_id in group_ids:
+        items = [item for item in data.expenses if item.group_id == group_id]
+        await ledger.apply_expense(
+            session,
+            group_id,
+            [(p.user_id, p.paid_amount) for item in items for p in item.payers],
+            [(s.user_id, s.share_amount) for item in items for s in item.shares],
+        )
+        await group_stats.record(
+            session, group_id, expenses=len(items), total_spent=sum(item.total_amount for item in items), at=now
+        )
+    await group_versions.bump(session, *sorted(group_ids))
+
+    await session.commit()
+    return {"ids": expense_ids}
+
 # Get a specific expense
 @router.get("/expenses/{expense_id}", response_model=Expense)
-async def get_expense(expense_id: int, session: Session = Depends(get_session)):
-    expense = session.get(Expense, expense_id)
+async def get_expense(expense_id: int, session: AsyncSession = Depends(get_session)):
+    expense = await session.get(Expense, expense_id)
     if not expense:
         raise HTTPException(status_code=404, detail="Expense not found")
     return expense
 
 # Update an expense
 @router.put("/expenses/{expense_id}", response_model=Expense)
-async def update_expense(expense_id: int, expense_data: dict, session: Session = Depends(get_session)):
-    expense = session.get(Expense, expense_id)
+async def update_expense(expense_id: int, expense_data: dict, session: AsyncSession = Depends(get_session)):
+    expense = await session.get(Expense, expense_id)
     if not expense:
         raise HTTPException(status_code=404, detail="Expense not found")
+    old_spent = group_stats.spent(expense.type, expense.total_amount)
     
     # Update basic fields
     if "description" in expense_data:
@@ -139,66 +323,84 @@ async def update_expense(expense_id: int, expense_data: dict, session: Session =
     if "total_amount" in expense_data:
         expense.total_amount = expense_data["total_amount"]
     
-    # Update payers (delete existing and add new)
-    existing_payers = session.exec(select(ExpensePayer).where(ExpensePayer.expense_id == expense_id)).all()
-    for payer in existing_payers:
-        session.delete(payer)
-    
-    for payer_data in expense_data.get("payers", []):
-        payer = ExpensePayer(
-            expense_id=expense_id,
-            user_id=payer_data["user_id"],
-            paid_amount=payer_data["paid_amount"]
-        )
-        session.add(payer)
-    
-    # Update shares (delete existing and add new)
-    existing_shares = session.exec(select(ExpenseShare).where(ExpenseShare.expense_id == expense_id)).all()
-    for share in existing_shares:
-        session.delete(share)
-    
-    for share_data in expense_data.get("shares", []):
-        share = ExpenseShare(
-            expense_id=expense_id,
-            user_id=share_data["user_id"],
-            share_amount=share_data["share_amount"]
-        )
-        session.add(share)
+    # Reverse the old split in the ledger before applying the new one
+    existing_payers = (await session.exec(
+        select(ExpensePayer.user_id, ExpensePayer.paid_amount).where(ExpensePayer.expense_id == expense_id)
+    )).all()
+    existing_shares = (await session.exec(
+        select(ExpenseShare.user_id, ExpenseShare.share_amount).where(ExpenseShare.expense_id == expense_id)
+    )).all()
+    await ledger.apply_expense(session, expense.group_id, existing_payers, existing_shares, sign=-1)
+
+    # Replace the payers and shares with one DELETE and one multi-row INSERT
+    # each, however many the expense has
+    payers = expense_data.get("payers", [])
+    shares = expense_data.get("shares", [])
+    await session.exec(delete(ExpensePayer).where(ExpensePayer.expense_id == expense_id))
+    await session.exec(delete(ExpenseShare).where(ExpenseShare.expense_id == expense_id))
+    if payers:
+        await session.exec(insert(ExpensePayer), params=[
+            {"expense_id": expense_id, "user_id": p["user_id"], "paid_amount": p["paid_amount"]} for p in payers
+        ])
+    if shares:
+        await session.exec(insert(ExpenseShare), params=[
+            {"expense_id": expense_id, "user_id": s["user_id"], "share_amount": s["share_amount"]} for s in shares
+        ])
+
+    await ledger.apply_expense(
+        session,
+        expense.group_id,
+        [(p["user_id"], p["paid_amount"]) for p in payers],
+        [(s["user_id"], s["share_amount"]) for s in shares],
+    )
+    await group_stats.record(
+        session, expense.group_id, total_spent=group_stats.spent(expense.type, expense.total_amount) - old_spent
+    )
+    await group_versions.bump(session, expense.group_id)
     
     session.add(expense)
-    session.commit()
-    session.refresh(expense)
+    await session.commit()
+    await session.refresh(expense)
     return expense
 
 # Delete an expense
 @router.delete("/expenses/{expense_id}")
-async def delete_expense(expense_id: int, session: Session = Depends(get_session)):
-    expense = session.get(Expense, expense_id)
+async def delete_expense(expense_id: int, session: AsyncSession = Depends(get_session)):
+    expense = await session.get(Expense, expense_id)
     if not expense:
         raise HTTPException(status_code=404, detail="Expense not found")
     
-    # Delete related payers and shares first
-    session.exec(delete(ExpensePayer).where(ExpensePayer.expense_id == expense_id))
-    session.exec(delete(ExpenseShare).where(ExpenseShare.expense_id == expense_id))
+    # Take the expense out of the group ledger
+    payers = (await session.exec(
+        select(ExpensePayer.user_id, ExpensePayer.paid_amount).where(ExpensePayer.expense_id == expense_id)
+    )).all()
+    shares = (await session.exec(
+        select(ExpenseShare.user_id, ExpenseShare.share_amount).where(ExpenseShare.expense_id == expense_id)
+    )).all()
+    await ledger.apply_expense(session, expense.group_id, payers, shares, sign=-1)
     
-    # Delete the expense
-    session.delete(expense)
-    session.commit()
+    # Delete the expense; the database cascades to its payers and shares
+    await session.delete(expense)
+    await group_stats.record(
+        session, expense.group_id, expenses=-1, total_spent=-group_stats.spent(expense.type, expense.total_amount)
+    )
+    await group_versions.bump(session, expense.group_id)
+    await session.commit()
     
     return {"message": "Expense deleted successfully"}
 
 # Get expense details with payers and shares
 @router.get("/expenses/{expense_id}/details")
-async def get_expense_details(expense_id: int, session: Session = Depends(get_session)):
-    expense = session.get(Expense, expense_id)
+async def get_expense_details(expense_id: int, session: AsyncSession = Depends(get_session)):
+    expense = await session.get(Expense, expense_id)
     if not expense:
         raise HTTPException(status_code=404, detail="Expense not found")
     
     # Get payers
-    payers = session.exec(select(ExpensePayer).where(ExpensePayer.expense_id == expense_id)).all()
+    payers = (await session.exec(select(ExpensePayer).where(ExpensePayer.expense_id == expense_id))).all()
     
     # Get shares
-    shares = session.exec(select(ExpenseShare).where(ExpenseShare.expense_id == expense_id)).all()
+    shares = (await session.exec(select(ExpenseShare).where(ExpenseShare.expense_id == expense_id))).all()
     
     return {
         "expense": expense,
@@ -1,16 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, Body, BackgroundTasks
-from sqlmodel import Session, select, delete, func
+from fastapi import APIRouter, Depends, HTTPException, Body, Request, Response
+from sqlmodel import select, delete
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List
 from app.database import get_session
 from app.deps import get_current_user
-from app.models import Group, User, Membership, Expense, ExpensePayer, ExpenseShare, GroupInvitation
-from app.schemas import Debt, UserInfo # Import new schemas
-from sqlalchemy.orm import selectinload
-from app.mail_utils import fast_mail
-from fastapi_mail import MessageSchema
+from app.models import Group, User, Membership, Expense, ExpensePayer, ExpenseShare, GroupInvitation, GroupBalance, GroupStats
+from app.schemas import Debt, UserInfo, CurrentUser, MyBalances # Import new schemas
+from app import ledger, group_versions, group_stats
+from app.settlement import simplify_debts, to_cents, from_cents
+from app.outbox import enqueue_email, outbox_sender
 from datetime import datetime, timezone, timedelta
 import secrets
-from pathlib import Path
+from app.templating import render_email
 from app.config import settings
 
 router = APIRouter()
@@ -18,20 +19,20 @@ router = APIRouter()
 # Get all groups for the current user
 @router.get("/groups", response_model=List[Group])
 async def get_groups(
-    session: Session = Depends(get_session), 
-    current_user: User = Depends(get_current_user)
+    session: AsyncSession = Depends(get_session), 
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     # Get groups where the current user is a member
     statement = select(Group).join(Membership).where(
         Membership.user_id == current_user.id
     )
-    groups = session.exec(statement).all()
+    groups = (await session.exec(statement)).all()
     return groups
 
 
 # Create a new group
 @router.post("/groups", response_model=Group)
-async def create_group(group_data: dict, session: Session = Depends(get_session)):
+async def create_group(group_data: dict, session: AsyncSession = Depends(get_session)):
     # For now, we'll use a simple dict. You can create a GroupCreate model later
     group = Group(
         name=group_data["name"],
@@ -39,8 +40,8 @@ async def create_group(group_data: dict, session: Session = Depends(get_session)
     )
 
     session.add(group)
-    session.commit()
-    session.refresh(group)
+    await session.commit()
+    await session.refresh(group)
 
     # Add creator as a member
     membership = Membership(
@@ -48,102 +49,95 @@ async def create_group(group_data: dict, session: Session = Depends(get_session)
         group_id=group.id
     )
     session.add(membership)
-    session.commit()
+    session.add(GroupStats(group_id=group.id, member_count=1, last_activity_at=group.created_at))
+    await session.commit()
 
     return group
 
 @router.get("/groups/summary")
 async def get_groups_summary(
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_session),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    # Get all groups for the user
-    statement = select(Group).join(Membership).where(Membership.user_id == current_user.id)
-    groups = session.exec(statement).all()
-
-    # For all group IDs, get member and expense counts in bulk
-    group_ids = [g.id for g in groups]
-    if not group_ids:
-        return []
-
-    # Member counts
-    member_counts = dict(
-        session.exec(
-            select(Membership.group_id, func.count(Membership.user_id))
-            .where(Membership.group_id.in_(group_ids))
-            .group_by(Membership.group_id)
-        ).all()
-    )
-    # Expense counts
-    expense_counts = dict(
-        session.exec(
-            select(Expense.group_id, func.count(Expense.id))
-            .where(Expense.group_id.in_(group_ids))
-            .group_by(Expense.group_id)
-        ).all()
-    )
+    # The user's groups with their maintained stats, in one indexed join
+    # instead of counting memberships and expenses on every load
+    rows = (await session.exec(
+        select(
+            Group.id, Group.name, Group.created_at, Group.version,
+            GroupStats.member_count, GroupStats.expense_count,
+            GroupStats.total_spent, GroupStats.last_activity_at,
+        )
+        .join(Membership, Membership.group_id == Group.id)
+        .outerjoin(GroupStats, GroupStats.group_id == Group.id)
+        .where(Membership.user_id == current_user.id)
+    )).all()
+
+    # Joining or leaving a group changes the set, any other write a version, so
+    # an unchanged ETag means the stats would come out the same
+    etag = group_versions.make_etag("groups-summary", sorted((row.id, row.version) for row in rows))
+    if group_versions.is_not_modified(request, etag):
+        return group_versions.not_modified(etag)
+    group_versions.set_etag(response, etag)
 
     # Compose result
     result = []
-    for g in groups:
+    for row in rows:
         result.append({
-            "id": g.id,
-            "name": g.name,
-            # "created_by": g.created_by,
-            "created_at": g.created_at,
-            "member_count": member_counts.get(g.id, 0),
-            "expense_count": expense_counts.get(g.id, 0),
+            "id": row.id,
+            "name": row.name,
+            "created_at": row.created_at,
+            "member_count": row.member_count or 0,
+            "expense_count": row.expense_count or 0,
+            "total_spent": row.total_spent or 0,
+            "last_activity_at": row.last_activity_at or row.created_at,
         })
     return result
 
 # Get a specific group
 @router.get("/groups/{group_id}", response_model=Group)
-async def get_group(group_id: int, session: Session = Depends(get_session)):
-    group = session.get(Group, group_id)
+async def get_group(group_id: int, session: AsyncSession = Depends(get_session)):
+    group = await session.get(Group, group_id)
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
     return group
 
 # Get group members
 @router.get("/groups/{group_id}/members")
-async def get_group_members(group_id: int, session: Session = Depends(get_session)):
-    group = session.get(Group, group_id)
+async def get_group_members(group_id: int, session: AsyncSession = Depends(get_session)):
+    group = await session.get(Group, group_id)
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
 
-    # Get all members of the group
-    memberships = session.exec(
-        select(Membership).where(Membership.group_id == group_id)
-    ).all()
-
-    members = []
-    for membership in memberships:
-        user = session.get(User, membership.user_id)
-        if user:
-            members.append({
-                "id": user.id,
-                "email": user.email,
-                "name": user.name,
-                "created_at": user.created_at
-            })
+    # One joined query for every member, not a session.get per membership
+    rows = (await session.exec(
+        select(User.id, User.email, User.name, User.created_at)
+        .join(Membership, Membership.user_id == User.id)
+        .where(Membership.group_id == group_id)
+        .order_by(Membership.id)
+    )).all()
+    members = [dict(row._mapping) for row in rows]
 
     return {"members": members}
 
 # Remove user from group
 @router.delete("/groups/{group_id}/members/{user_id}")
-async def remove_member(group_id: int, user_id: int, session: Session = Depends(get_session)):
-    membership = session.exec(
+async def remove_member(group_id: int, user_id: int, session: AsyncSession = Depends(get_session)):
+    membership = (await session.exec(
         select(Membership).where(
             Membership.user_id == user_id,
             Membership.group_id == group_id
         )
-    ).first()
+    )).first()
 
     if not membership:
         raise HTTPException(status_code=404, detail="Membership not found")
 
-    session.delete(membership)
-    session.commit()
+    await session.delete(membership)
+    await group_stats.record(session, group_id, members=-1)
+    await group_versions.bump(session, group_id)
+    await session.commit()
 
     return {"message": "User removed from group successfully"}
 
@@ -152,10 +146,10 @@ async def remove_member(group_id: int, user_id: int, session: Session = Depends(
 async def update_group(
     group_id: int,
     group_data: dict = Body(...),
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user)
+    session: AsyncSession = Depends(get_session),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    group = session.get(Group, group_id)
+    group = await session.get(Group, group_id)
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
     if group.created_by != current_user.id:
@@ -163,19 +157,20 @@ async def update_group(
     if "name" in group_data:
         group.name = group_data["name"]
     session.add(group)
-    session.commit()
-    session.refresh(group)
+    await group_versions.bump(session, group_id)
+    await session.commit()
+    await session.refresh(group)
     return group
 
 # Delete group by creator
 @router.delete("/groups/{group_id}")
 async def delete_group(
     group_id: int,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user)
+    session: AsyncSession = Depends(get_session),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     # Fetch the group
-    group = session.get(Group, group_id)
+    group = await session.get(Group, group_id)
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
 
@@ -183,40 +178,10 @@ async def delete_group(
     if group.created_by != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this group")
 
-    # Get all expenses for this group
-    expenses = session.exec(
-        select(Expense).where(Expense.group_id == group_id)
-    ).all()
-    
-    expense_ids = [exp.id for exp in expenses]
-
-    # Delete related expense shares and payers FIRST (child records)
-    if expense_ids:
-        session.exec(
-            delete(ExpenseShare).where(ExpenseShare.expense_id.in_(expense_ids))
-        )
-        session.exec(
-            delete(ExpensePayer).where(ExpensePayer.expense_id.in_(expense_ids))
-        )
-    
-    # Delete expenses (parent records)
-    session.exec(
-        delete(Expense).where(Expense.group_id == group_id)
-    )
-
-    # Delete memberships
-    session.exec(
-        delete(Membership).where(Membership.group_id == group_id)
-    )
-
-    # Delete group invitations
-    session.exec(
-        delete(GroupInvitation).where(GroupInvitation.group_id == group_id)
-    )
-
-    # Finally, delete the group
-    session.delete(group)
-    session.commit()
+    # One statement: the database cascades to memberships, expenses with their
+    # payers and shares, ledger rows and invitations, without loading any of them
+    await session.exec(delete(Group).where(Group.id == group_id))
+    await session.commit()
 
     return {"message": "Group deleted successfully"}
 
@@ -224,94 +189,97 @@ async def delete_group(
 @router.get("/groups/{group_id}/summary", response_model=List[Debt])
 async def get_group_summary(
     group_id: int,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_session),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    # Ensure the user is a member of the group
-    membership = session.exec(
-        select(Membership).where(
-            Membership.group_id == group_id,
-            Membership.user_id == current_user.id
-        )
-    ).first()
-    if not membership:
+    # Ensure the user is a member of the group, reading its version in the same lookup.
+    # The version is read before the balances, so a write landing in between can
+    # only make the ETag older than the body, never newer
+    version = await group_versions.member_group_version(session, group_id, current_user.id)
+    if version is None:
         raise HTTPException(status_code=403, detail="You are not a member of this group")
+    etag = group_versions.make_etag("group-summary", group_id, version)
+    if group_versions.is_not_modified(request, etag):
+        return group_versions.not_modified(etag)
+    group_versions.set_etag(response, etag)
+
+    # 1. Read each member's running balance from the ledger
+    rows = (await session.exec(
+        select(User.id, User.name, GroupBalance.net_balance)
+        .join(Membership, Membership.user_id == User.id)
+        .outerjoin(
+            GroupBalance,
+            (GroupBalance.group_id == Membership.group_id) & (GroupBalance.user_id == User.id)
+        )
+        .where(Membership.group_id == group_id)
+    )).all()
+    balances = {user_id: net_balance or 0 for user_id, _, net_balance in rows}
+    member_map = {user_id: UserInfo(id=user_id, name=name) for user_id, name, _ in rows}
 
-    # 1. Calculate balances for each member
-    balances = {}
-    members = session.exec(select(User).join(Membership).where(Membership.group_id == group_id)).all()
-    for member in members:
-        balances[member.id] = 0
-
-    expenses = session.exec(
-        select(Expense)
-        .where(Expense.group_id == group_id)
-        .options(selectinload(Expense.payers), selectinload(Expense.shares))
-    ).all()
-
-    for expense in expenses:
-        for payer in expense.payers:
-            if payer.user_id in balances:
-                balances[payer.user_id] += payer.paid_amount
-        for share in expense.shares:
-            if share.user_id in balances:
-                balances[share.user_id] -= share.share_amount
-
-    # 2. Separate into debtors and creditors
-    debtors = {}
-    creditors = {}
-
-    for user_id, balance in balances.items():
-        if balance < -0.01:
-            debtors[user_id] = balance
-        elif balance > 0.01:
-            creditors[user_id] = balance
-    
-    # 3. Simplify debts
-    transactions = []
-    while debtors and creditors:
-        debtor_id, debt = min(debtors.items(), key=lambda item: item[1])
-        creditor_id, credit = max(creditors.items(), key=lambda item: item[1])
-
-        amount = min(abs(debt), credit)
-
-        transactions.append({
-            "from_user_id": debtor_id,
-            "to_user_id": creditor_id,
-            "amount": amount
-        })
-
-        debtors[debtor_id] += amount
-        creditors[creditor_id] -= amount
-
-        if abs(debtors[debtor_id]) < 0.01:
-            del debtors[debtor_id]
-        if abs(creditors[creditor_id]) < 0.01:
-            del creditors[creditor_id]
+    # 2. Simplify debts on exact integer cents
+    transfers = simplify_debts({user_id: to_cents(balance) for user_id, balance in balances.items()})
 
-    # 4. Format the response with user names
+    # 3. Format the response with user names
     response_debts = []
-    member_map = {member.id: member for member in members}
-    for t in transactions:
-        from_user = member_map.get(t["from_user_id"])
-        to_user = member_map.get(t["to_user_id"])
+    for t in transfers:
+        from_user = member_map.get(t.from_user_id)
+        to_user = member_map.get(t.to_user_id)
         if from_user and to_user:
             response_debts.append(
                 Debt(
-                    from_user=UserInfo(id=from_user.id, name=from_user.name),
-                    to_user=UserInfo(id=to_user.id, name=to_user.name),
-                    amount=t["amount"]
+                    from_user=from_user,
+                    to_user=to_user,
+                    amount=from_cents(t.amount_cents)
                 )
             )
 
     return response_debts
 
+# The current user's net balance in each of their groups, and overall
+@router.get("/me/balances", response_model=MyBalances)
+async def get_my_balances(
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_session),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    # One query: the user's memberships, each joined to its group and to the
+    # user's row in that group's ledger by primary key, so the cost follows the
+    # number of groups rather than the length of their histories
+    rows = (await session.exec(
+        select(Group.id, Group.name, Group.version, GroupBalance.net_balance)
+        .join(Membership, Membership.group_id == Group.id)
+        .outerjoin(
+            GroupBalance,
+            (GroupBalance.group_id == Membership.group_id) & (GroupBalance.user_id == Membership.user_id)
+        )
+        .where(Membership.user_id == current_user.id)
+        .order_by(Group.id)
+    )).all()
+
+    # Every write that moves a balance bumps its group's version
+    etag = group_versions.make_etag("my-balances", current_user.id, [(row.id, row.version) for row in rows])
+    if group_versions.is_not_modified(request, etag):
+        return group_versions.not_modified(etag)
+    group_versions.set_etag(response, etag)
+
+    # Rounded to cents, and totalled in cents so the total matches the rows
+    cents = [(row.id, row.name, to_cents(row.net_balance or 0)) for row in rows]
+    return {
+        "groups": [
+            {"group_id": group_id, "group_name": name, "net_balance": from_cents(balance)}
+            for group_id, name, balance in cents
+        ],
+        "total": from_cents(sum(balance for _, _, balance in cents)),
+    }
+
 @router.post("/groups/{group_id}/invite")
 async def invite_user_to_group(
     group_id: int,
-    background_tasks: BackgroundTasks,
     data: dict = Body(...),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
   
 ):
     invitee_email = data.get("email")
@@ -319,47 +287,47 @@ async def invite_user_to_group(
         raise HTTPException(status_code=400, detail="Email is required")
 
     # Check if group exists
-    group = session.get(Group, group_id)
+    group = await session.get(Group, group_id)
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
 
     # Check if user with the invitee's email exists
-    invitee_user = session.exec(select(User).where(User.email == invitee_email)).first()
+    invitee_user = (await session.exec(select(User).where(User.email == invitee_email))).first()
     
     if invitee_user:
         # Check if already a member
-        membership = session.exec(
+        membership = (await session.exec(
             select(Membership).where(
                 Membership.group_id == group_id,
                 Membership.user_id == invitee_user.id
             )
-        ).first()
+        )).first()
 
         if membership:
             raise HTTPException(status_code=400, detail="User is already a member of the group")
         
     # Check if there's already any invitation for this email and group (pending or accepted)
-    existing_invitation = session.exec(
+    existing_invitation = (await session.exec(
         select(GroupInvitation).where(
             GroupInvitation.group_id == group_id,
             GroupInvitation.invitee_email == invitee_email
         )
-    ).first()
+    )).first()
     
     if existing_invitation:
         if existing_invitation.status == "pending":
             raise HTTPException(status_code=400, detail="An invitation has already been sent to this email")
         
 
-    # This is the important part. By accessing group.creator here, we ensure the relationship is loaded
-    # before the background task runs and the session is closed.
-    creator_name = group.creator.name
+    # Load the creator explicitly: AsyncSession can't lazy-load group.creator
+    creator = await session.get(User, group.created_by)
+    creator_name = creator.name
 
     # Generate token and expiration
     token = secrets.token_urlsafe(32)
     expires_at = datetime.now(timezone.utc) + timedelta(days=1)
 
-    # Store invitation
+    # Store the invitation and its email together, so neither exists without the other
     invitation = GroupInvitation(
         group_id=group_id,
         invitee_email=invitee_email,
@@ -367,43 +335,32 @@ async def invite_user_to_group(
         expires_at=expires_at
     )
     session.add(invitation)
-    session.commit()
 
-    # --- Send HTML email in background ---
     invite_link = f"{settings.frontend_base_url}/invite/{token}"
-    
-    # Read the HTML template
-    template_path = Path(__file__).parent.parent / "templates" / "invitation.html"
-    with open(template_path, "r",  encoding="utf-8") as f:
-        template_str = f.read()
-    
-    # Populate the template
-    body = template_str.replace("{{ creator_name }}", creator_name)
-    body = body.replace("{{ group_name }}", group.name)
-    body = body.replace("{{ invite_link }}", invite_link)
-
-    message = MessageSchema(
-        subject="You're invited to join a SplitMoney group!",
-        recipients=[invitee_email],
-        body=body,
-        subtype="html"
+    body = render_email(
+        "invitation.html",
+        creator_name=creator_name,
+        group_name=group.name,
+        invite_link=invite_link,
     )
-    background_tasks.add_task(fast_mail.send_message, message)
+    enqueue_email(session, invitee_email, "You're invited to join a SplitMoney group!", body)
+    await session.commit()
+    outbox_sender.notify()
 
     return {"message": "Invitation sent successfully."}
 
 @router.get("/invites/accept/{token}")
 async def accept_invitation_from_link(
     token: str,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user)
+    session: AsyncSession = Depends(get_session),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     This endpoint is designed to be hit from a browser link (GET request).
     """
-    invitation = session.exec(
+    invitation = (await session.exec(
         select(GroupInvitation).where(GroupInvitation.token == token)
-    ).first()
+    )).first()
     
     if not invitation:
         raise HTTPException(status_code=404, detail="Invitation not found or invalid.")
@@ -415,28 +372,30 @@ async def accept_invitation_from_link(
         raise HTTPException(status_code=403, detail="This invitation is for a different user.")
 
     # Add user to group if not already a member
-    existing_membership = session.exec(
+    existing_membership = (await session.exec(
         select(Membership).where(
             Membership.user_id == current_user.id,
             Membership.group_id == invitation.group_id
         )
-    ).first()
+    )).first()
 
     if not existing_membership:
         membership = Membership(user_id=current_user.id, group_id=invitation.group_id)
         session.add(membership)
+        await group_stats.record(session, invitation.group_id, members=1)
 
     invitation.status = "accepted"
     session.add(invitation)
-    session.commit()
+    await group_versions.bump(session, invitation.group_id)
+    await session.commit()
     return {"message": "You have successfully joined the group!", "group_id": invitation.group_id}
 
 @router.post("/groups/{group_id}/settle")
 async def settle_up(
     group_id: int,
     data: dict = Body(...),  # expects { "to_user_id": int, "amount": float }
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user)
+    session: AsyncSession = Depends(get_session),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     to_user_id = data.get("to_user_id")
     amount = data.get("amount")
@@ -451,8 +410,7 @@ async def settle_up(
         total_amount=amount
     )
     session.add(expense)
-    session.commit()
-    session.refresh(expense)
+    await session.flush()  # assigns expense.id without ending the transaction
 
     # Add payer (current user pays)
     payer = ExpensePayer(
@@ -470,7 +428,16 @@ async def settle_up(
     )
     session.add(share)
 
-    session.commit()
-    session.refresh(expense)
+    await ledger.apply_expense(
+        session,
+        group_id,
+        [(current_user.id, amount)],
+        [(to_user_id, amount)],
+    )
+    await group_stats.record(session, group_id, expenses=1)
+    await group_versions.bump(session, group_id)
+
+    await session.commit()
+    await session.refresh(expense)
     return {"message": "Settlement recorded", "expense_id": expense.id}
 
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, Field, field_validator
 from typing import List, Optional
 from datetime import datetime
 import re
@@ -15,6 +15,27 @@ class ExpenseCreate(BaseModel):
     payers: List[dict]  # [{"user_id": 1, "paid_amount": 50.0}]
     shares: List[dict]  # [{"user_id": 1, "share_amount": 25.0}]
 
+class PayerIn(BaseModel):
+    user_id: int
+    paid_amount: float
+
+class ShareIn(BaseModel):
+    user_id: int
+    share_amount: float
+
+class BulkExpenseItem(BaseModel):
+    group_id: int
+    description: Optional[str] = None
+    total_amount: float
+    payers: List[PayerIn]
+    shares: List[ShareIn]
+
+class BulkExpenseCreate(BaseModel):
+    expenses: List[BulkExpenseItem] = Field(..., min_length=1, max_length=1000)
+
+class BulkExpenseResult(BaseModel):
+    ids: List[int]
+
 class ExpenseUpdate(BaseModel):
     description: Optional[str] = None
     total_amount: Optional[float] = None 
@@ -29,6 +50,23 @@ class Debt(BaseModel):
     to_user: UserInfo
     amount: float
 
+class GroupBalanceOut(BaseModel):
+    group_id: int
+    group_name: str
+    # Positive: the group owes you; negative: you owe the group
+    net_balance: float
+
+class MyBalances(BaseModel):
+    groups: List[GroupBalanceOut]
+    total: float
+
+class CurrentUser(BaseModel):
+    """Identity of the authenticated user, as cached by get_current_user."""
+    id: int
+    email: str
+    name: str
+    created_at: datetime
+
 class UserCreate(BaseModel):
     email: str
     password: str
@@ -58,13 +96,29 @@ class ExpenseShareOut(BaseModel):
 class ExpenseWithDetailsOut(BaseModel):
     id: int
     group_id: int
-    description: str = None
+    description: Optional[str] = None
     type: str
     total_amount: float
     created_at: str
     payers: List[ExpensePayerOut]
     shares: List[ExpenseShareOut]
 
+class ExpensePage(BaseModel):
+    items: List[ExpenseWithDetailsOut]
+    next_cursor: Optional[str] = None
+
+class ExpenseOut(BaseModel):
+    id: int
+    group_id: int
+    description: Optional[str] = None
+    type: str
+    total_amount: float
+    created_at: datetime
+
+class GroupExpensePage(BaseModel):
+    items: List[ExpenseOut]
+    next_cursor: Optional[str] = None
+
 class PasswordResetRequest(BaseModel):
     email: str
 
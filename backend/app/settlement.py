@@ -0,0 +1,47 @@
+import heapq
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, List, NamedTuple
+
+
+class Transfer(NamedTuple):
+    from_user_id: int
+    to_user_id: int
+    amount_cents: int
+
+
+def to_cents(amount: float) -> int:
+    """Converts a money amount to integer cents, rounding half away from zero."""
+    return int(Decimal(str(amount)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP) * 100)
+
+
+def from_cents(cents: int) -> float:
+    return cents / 100
+
+
+def simplify_debts(balances: Dict[int, int]) -> List[Transfer]:
+    """
+    Turns net balances (in cents, positive = owed money) into a list of transfers
+    that settles them. The largest debtor always pays the largest creditor, so every
+    transfer clears at least one member and n members need at most n - 1 transfers.
+    Runs in O(n log n); ties are broken by the lower user id so output is deterministic.
+    """
+    # heapq is a min-heap, so amounts are negated to pop the largest first
+    debtors = [(balance, user_id) for user_id, balance in balances.items() if balance < 0]
+    creditors = [(-balance, user_id) for user_id, balance in balances.items() if balance > 0]
+    heapq.heapify(debtors)
+    heapq.heapify(creditors)
+
+    transfers = []
+    while debtors and creditors:
+        debt, debtor_id = heapq.heappop(debtors)
+        credit, creditor_id = heapq.heappop(creditors)
+
+        amount = min(-debt, -credit)
+        transfers.append(Transfer(debtor_id, creditor_id, amount))
+
+        if debt + amount < 0:
+            heapq.heappush(debtors, (debt + amount, debtor_id))
+        if credit + amount < 0:
+            heapq.heappush(creditors, (credit + amount, creditor_id))
+
+    return transfers
@@ -0,0 +1,38 @@
+from functools import lru_cache
+from pathlib import Path
+from app.config import settings
+
+TEMPLATES_DIR = Path(__file__).parent / "templates"
+
+# Compiled at startup so a broken template fails the deploy, not the first invite
+EMAIL_TEMPLATES = ("invitation.html", "password_reset.html")
+
+
+def create_environment(debug: bool):
+    """
+    Templates are compiled once and kept in memory. Only in debug mode does Jinja
+    stat the file on each render and recompile it after an edit. Values are
+    HTML-escaped, so a group or user name can't inject markup into the email.
+    """
+    from jinja2 import Environment, FileSystemLoader, StrictUndefined, select_autoescape
+    return Environment(
+        loader=FileSystemLoader(TEMPLATES_DIR),
+        autoescape=select_autoescape(["html"]),
+        auto_reload=debug,
+        undefined=StrictUndefined,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_templates():
+    # Created on first use, so importing the app doesn't import Jinja
+    return create_environment(settings.debug)
+
+
+def preload_templates():
+    for name in EMAIL_TEMPLATES:
+        get_templates().get_template(name)
+
+
+def render_email(name: str, **context) -> str:
+    return get_templates().get_template(name).render(**context)
@@ -0,0 +1,69 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+from app.config import settings
+from app.schemas import CurrentUser
+
+
+class UserCache:
+    """
+    TTL + LRU cache of the authenticated user's identity fields, keyed by user id,
+    so get_current_user doesn't hit the database on every request. Entries expire
+    after `ttl` seconds; past `max_size` the least recently used one is evicted.
+    Only touched from the event loop, so no locking is needed.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self.ttl > 0
+
+    def get(self, user_id: int) -> Optional[CurrentUser]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, user = entry
+        if expires_at <= time.monotonic():
+            del self._entries[user_id]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return user
+
+    def set(self, user: CurrentUser):
+        if not self.enabled:
+            return
+        self._entries[user.id] = (time.monotonic() + self.ttl, user)
+        self._entries.move_to_end(user.id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, user_id: int):
+        """Drops a user after their name, email or password changed."""
+        self._entries.pop(user_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def snapshot(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+user_cache = UserCache(max_size=settings.user_cache_size, ttl=settings.user_cache_ttl)
@@ -0,0 +1,249 @@
+"""
+Benchmark suite: latency of the main API paths against a seeded dataset.
+
+Seeds a database with seed_data.py, then drives the app in-process (no
+network) through each case below and records p50/p95/p99 latency, throughput
+and SQL statements per request. Results are written as JSON; pass an earlier
+results file with --compare to flag cases whose p50 or p95 got slower by more
+than --threshold.
+
+By default it runs against a throwaway SQLite file. Pass --database-url to use
+a local Postgres instead; point it at a scratch database, since the dataset is
+added to whatever is there.
+
+Run from the backend/ directory:
+    python -m benchmarks.api_bench
+    python -m benchmarks.api_bench --groups 200 --expenses 500 --output after.json --compare before.json
+    python -m benchmarks.api_bench --database-url postgresql://localhost/splitmoney_bench
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+
+# Latency percentiles compared by --compare
+COMPARED_METRICS = ("p50_ms", "p95_ms")
+
+
+def summarize(latencies, statements):
+    latencies = sorted(latencies)
+    n = len(latencies)
+    return {
+        "requests": n,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[max(0, int(n * 0.95) - 1)] * 1000,
+        "p99_ms": latencies[max(0, int(n * 0.99) - 1)] * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "max_ms": latencies[-1] * 1000,
+        "requests_per_second": n / sum(latencies),
+        "db_statements_per_request": statements / n,
+    }
+
+
+def check_response(response):
+    # A 304 is the expected answer to a conditional GET, not a failure
+    if response.status_code != 304:
+        response.raise_for_status()
+
+
+async def run_case(client, make_request, iterations, warmup):
+    """Sends `warmup` untimed requests, then `iterations` timed ones, one at a time."""
+    from app.database import async_engine
+    from app.query_counter import QueryCounter
+
+    for i in range(warmup):
+        check_response(await make_request(i))
+    latencies = []
+    with QueryCounter(async_engine) as queries:
+        for i in range(iterations):
+            start = time.perf_counter()
+            response = await make_request(i)
+            latencies.append(time.perf_counter() - start)
+            check_response(response)
+    return summarize(latencies, queries.count)
+
+
+async def run_suite(args, data):
+    import httpx
+    from app.auth_utils import create_access_token
+    from app.database import async_engine
+    from app.main import app
+    from seed_data import SEED_PASSWORD
+
+    # Benchmark as the member of the most groups, so the cross-group endpoints have work to do
+    memberships = {}
+    for group_id, user_ids in data.members.items():
+        for user_id in user_ids:
+            memberships.setdefault(user_id, []).append(group_id)
+    user_id = max(memberships, key=lambda u: len(memberships[u]))
+    group_ids = memberships[user_id]
+    headers = {"Authorization": f"Bearer {create_access_token(data={'sub': str(user_id)})}"}
+
+    def new_expense(i):
+        group_id = group_ids[i % len(group_ids)]
+        members = data.members[group_id]
+        amount = 10.0 * len(members)
+        return {
+            "group_id": group_id,
+            "description": f"bench {i}",
+            "total_amount": amount,
+            "payers": [{"user_id": user_id, "paid_amount": amount}],
+            "shares": [{"user_id": m, "share_amount": 10.0} for m in members],
+        }
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+        etags = {g: (await client.get(f"/api/groups/{g}/summary")).headers["etag"] for g in group_ids}
+        cases = {
+            "get_group_summary": (
+                lambda i: client.get(f"/api/groups/{group_ids[i % len(group_ids)]}/summary"), args.iterations),
+            "get_groups_summary": (lambda i: client.get("/api/groups/summary"), args.iterations),
+            # A poll that already has the current version, answered 304 without the summary queries
+            "get_group_summary_not_modified": (
+                lambda i: client.get(f"/api/groups/{group_ids[i % len(group_ids)]}/summary",
+                                     headers={"If-None-Match": etags[group_ids[i % len(group_ids)]]}),
+                args.iterations),
+            "get_my_balances": (lambda i: client.get("/api/me/balances"), args.iterations),
+            "get_expenses": (lambda i: client.get("/api/expenses", params={"limit": 50}), args.iterations),
+            "create_expense": (lambda i: client.post("/api/expenses", json=new_expense(i)), args.iterations),
+            "login": (lambda i: client.post(
+                "/auth/token", data={"username": data.user_emails[user_id], "password": SEED_PASSWORD},
+            ), args.login_iterations),
+        }
+        results = {}
+        for name, (make_request, iterations) in cases.items():
+            if args.cases and name not in args.cases:
+                continue
+            results[name] = await run_case(client, make_request, iterations, args.warmup)
+            print_result(name, results[name])
+    await async_engine.dispose()
+    return {"user_groups": len(group_ids)}, results
+
+
+def print_header():
+    print(f"{'case':<30} {'reqs':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'stmts':>6}")
+
+
+def print_result(name, r):
+    print(
+        f"{name:<30} {r['requests']:>5} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} "
+        f"{r['requests_per_second']:>8.1f} {r['db_statements_per_request']:>6.1f}"
+    )
+
+
+def compare(previous, current, threshold):
+    """Prints the change per case and returns the regressions beyond `threshold`."""
+    if previous["dataset"] != current["dataset"] or previous["database"] != current["database"]:
+        print("\nWarning: the previous run used a different dataset or database, so the comparison is rough.")
+    print(f"\n{'case':<30} {'metric':<7} {'before':>9} {'after':>9} {'change':>8}")
+    regressions = []
+    for name, result in current["results"].items():
+        before = previous["results"].get(name)
+        if before is None:
+            continue
+        for metric in COMPARED_METRICS:
+            change = result[metric] / before[metric] - 1
+            flag = "  REGRESSION" if change > threshold else ""
+            print(f"{name:<30} {metric[:-3]:<7} {before[metric]:>9.2f} {result[metric]:>9.2f} {change:>+8.1%}{flag}")
+            if flag:
+                regressions.append((name, metric, change))
+    return regressions
+
+
+def use_database(argv):
+    """
+    Points the app at --database-url, or a fresh SQLite file, before anything
+    from app is imported; the settings read the URL at import time. Returns
+    the URL and the scratch directory to delete afterwards, if any.
+    """
+    pre = argparse.ArgumentParser(add_help=False)
+    pre.add_argument("--database-url")
+    database_url = pre.parse_known_args(argv)[0].database_url
+    scratch = None
+    if database_url is None:
+        scratch = tempfile.mkdtemp(prefix="splitmoney-bench-")
+        database_url = f"sqlite:///{os.path.join(scratch, 'bench.db')}"
+    os.environ["ENVIRONMENT"] = "development"
+    os.environ["DATABASE_URL_DEV"] = database_url
+    # Keep the outbox sender's polling out of the measured statement counts
+    os.environ["EMAIL_OUTBOX_WORKER"] = "False"
+    # The login case signs in to one account far more often than the auth rate limits allow
+    os.environ["AUTH_RATE_LIMIT_ENABLED"] = "False"
+    return database_url, scratch
+
+
+def main(argv=None):
+    database_url, scratch = use_database(argv)
+    from seed_data import add_arguments as add_dataset_arguments
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="sync SQLAlchemy URL of a scratch database (default: temporary SQLite file)")
+    parser.add_argument("--iterations", type=int, default=200, help="timed requests per case")
+    parser.add_argument("--login-iterations", type=int, default=20, help="timed requests for login, which runs bcrypt")
+    parser.add_argument("--warmup", type=int, default=5, help="untimed requests before each case")
+    parser.add_argument("--cases", nargs="*", help="run only these cases")
+    parser.add_argument("--output", help="where to write the JSON results (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="fractional slowdown of p50 or p95 that counts as a regression (default: 0.15)")
+    add_dataset_arguments(parser)
+    args = parser.parse_args(argv)
+
+    from alembic import command
+    from alembic.config import Config
+    from sqlalchemy.engine import make_url
+    from app.database import engine
+    from seed_data import seed_from_args
+
+    command.upgrade(Config(os.path.join(BACKEND_DIR, "alembic.ini")), "head")
+    start = time.perf_counter()
+    data = seed_from_args(args)
+    print(f"Seeded {args.groups} groups x {args.expenses} expenses in {time.perf_counter() - start:.1f} s\n")
+
+    print_header()
+    bench_user, results = asyncio.run(run_suite(args, data))
+    engine.dispose()
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "database": make_url(database_url).get_backend_name(),
+        "python": platform.python_version(),
+        "dataset": {
+            "users": args.users, "groups": args.groups, "members_per_group": args.members,
+            "expenses_per_group": args.expenses, "payers_per_expense": args.payers,
+            "shares_per_expense": args.shares, "seed": args.seed, **bench_user,
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if scratch:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        regressions = compare(previous, report, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}.")
+            return 1
+        print("\nNo regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""
+Load test: latency of the expense endpoints during a flood of failed logins.
+
+Seeds a small dataset, then probes a member's expense endpoints (alternating
+GET /api/groups/{id}/expenses and POST /api/expenses) while --rate login
+attempts per second with wrong passwords arrive from --ips client addresses
+for --duration seconds. The flood is open-loop: attempts keep coming at the
+same rate however slowly they are answered, as they would from outside.
+
+Three rows:
+- idle: no flood, the baseline
+- no limits: app.rate_limit.auth_limiter switched off, so every attempt looks
+  the user up and queues for bcrypt until the hasher's queue limit refuses it
+- limits: the per-IP and per-account buckets refuse attempts before they
+  reach the database or the hasher
+
+By default it runs against a throwaway SQLite file. Pass --database-url to use
+a local Postgres instead; point it at a scratch database.
+
+Run from the backend/ directory:
+    python -m benchmarks.auth_flood_load
+    python -m benchmarks.auth_flood_load --rate 500 --ips 20 --duration 5
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import time
+from collections import Counter
+from benchmarks.api_bench import BACKEND_DIR, use_database
+from benchmarks.latency import measure_during, print_header, print_row
+
+
+async def flood(app, emails, args, statuses):
+    """Sends args.rate wrong-password logins per second, round-robin over the IPs and accounts."""
+    import httpx
+
+    clients = [
+        httpx.AsyncClient(transport=httpx.ASGITransport(app=app, client=(f"203.0.113.{i + 1}", 40000)),
+                          base_url="http://bench")
+        for i in range(args.ips)
+    ]
+
+    async def attempt(i):
+        response = await clients[i % len(clients)].post(
+            "/auth/token", data={"username": emails[i % len(emails)], "password": "wrong-password"})
+        statuses[response.status_code] += 1
+
+    tasks = []
+    start = time.perf_counter()
+    for i in range(int(args.rate * args.duration)):
+        await asyncio.sleep(max(0, start + i / args.rate - time.perf_counter()))
+        tasks.append(asyncio.create_task(attempt(i)))
+    await asyncio.gather(*tasks)
+    for client in clients:
+        await client.aclose()
+
+
+async def run(args, data):
+    import httpx
+    from app.auth_utils import create_access_token
+    from app.config import settings
+    from app.database import async_engine
+    from app.hashing import password_hasher
+    from app.main import app
+    from app.rate_limit import auth_limiter, MemoryBackend
+
+    group_id, members = next(iter(data.members.items()))
+    user_id = members[0]
+    emails = [email for uid, email in data.user_emails.items() if uid != user_id][:args.accounts]
+    headers = {"Authorization": f"Bearer {create_access_token(data={'sub': str(user_id)})}"}
+    expense = {
+        "group_id": group_id, "description": "probe", "total_amount": 10.0 * len(members),
+        "payers": [{"user_id": user_id, "paid_amount": 10.0 * len(members)}],
+        "shares": [{"user_id": m, "share_amount": 10.0} for m in members],
+    }
+    probes = Counter()
+
+    async def send(client):
+        probes["sent"] += 1
+        if probes["sent"] % 2:
+            response = await client.get(f"/api/groups/{group_id}/expenses", params={"limit": 20})
+        else:
+            response = await client.post("/api/expenses", json=expense)
+        response.raise_for_status()
+
+    print(f"{args.rate:g} failed logins/s from {args.ips} IPs against {len(emails)} accounts for {args.duration:g} s, "
+          f"{password_hasher.max_workers} hashing threads")
+    print_header()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+        for label, limits in (("idle", None), ("no limits", False), ("limits", True)):
+            statuses = Counter()
+            # Fresh buckets, so the previous row's flood doesn't count against this one
+            auth_limiter.enabled = bool(limits)
+            auth_limiter.backend = MemoryBackend(max_keys=settings.auth_rate_limit_max_keys)
+
+            async def load():
+                if limits is None:
+                    await asyncio.sleep(args.duration)
+                else:
+                    await flood(app, emails, args, statuses)
+            print_row(label, await measure_during(client, load, args.interval, send=send))
+            if statuses:
+                print(f"{'':>8} logins: {dict(sorted(statuses.items()))}")
+    await async_engine.dispose()
+
+
+def main(argv=None):
+    database_url, scratch = use_database(argv)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="sync SQLAlchemy URL of a scratch database (default: temporary SQLite file)")
+    parser.add_argument("--rate", type=float, default=200, help="failed login attempts per second")
+    parser.add_argument("--duration", type=float, default=3, help="seconds the flood lasts")
+    parser.add_argument("--ips", type=int, default=8, help="client addresses the flood comes from")
+    parser.add_argument("--accounts", type=int, default=4, help="accounts the flood tries to log into")
+    parser.add_argument("--interval", type=float, default=0.05, help="seconds between probes")
+    args = parser.parse_args(argv)
+
+    from alembic import command
+    from alembic.config import Config
+    from app.database import engine
+    from seed_data import seed
+
+    command.upgrade(Config(os.path.join(BACKEND_DIR, "alembic.ini")), "head")
+    data = seed(users=50, groups=4, members_per_group=8, expenses_per_group=500,
+                payers_per_expense=1, shares_per_expense=4)
+    asyncio.run(run(args, data))
+    engine.dispose()
+    if scratch:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
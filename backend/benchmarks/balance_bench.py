@@ -0,0 +1,148 @@
+"""
+Benchmark: recomputing group balances in Python vs in SQL.
+
+Seeds a dataset with seed_data.py, then recomputes every group's balances two
+ways:
+
+- ORM loop: load the group's Expense rows with their ExpensePayer and
+  ExpenseShare objects and add the amounts up in Python, as the group summary
+  did before the ledger
+- SQL aggregate: ledger.compute_group_balances, which sums paid and owed
+  amounts per user in the database and gets one row per member back
+
+Reports wall time, statements and the peak Python memory allocated by each
+(measured in a separate run, as tracing slows allocation down). Also checks
+that both give every member the same balance to the cent, the precision
+debts are settled at, and exits non-zero on any mismatch.
+
+By default it runs against a throwaway SQLite file. Pass --database-url to use
+a local Postgres instead; point it at a scratch database.
+
+Run from the backend/ directory:
+    python -m benchmarks.balance_bench
+    python -m benchmarks.balance_bench --groups 2 --members 50 --expenses 100000
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from benchmarks.api_bench import BACKEND_DIR, use_database
+
+
+async def orm_loop_balances(session, group_id: int):
+    """The pre-ledger summary's computation: hydrate every expense, payer and share."""
+    from sqlmodel import select
+    from sqlalchemy.orm import selectinload
+    from app.models import Expense
+
+    balances = defaultdict(float)
+    expenses = (await session.exec(
+        select(Expense)
+        .where(Expense.group_id == group_id)
+        .options(selectinload(Expense.payers), selectinload(Expense.shares))
+    )).all()
+    for expense in expenses:
+        for payer in expense.payers:
+            balances[payer.user_id] += payer.paid_amount
+        for share in expense.shares:
+            balances[share.user_id] -= share.share_amount
+    return dict(balances)
+
+
+async def measure(compute, group_ids, trace_memory=False):
+    """
+    Runs `compute` for every group, each in a fresh session. Returns the results
+    and (seconds, statements, peak MiB); memory is only traced when asked, since
+    tracing slows allocation-heavy code down far more than the rest.
+    """
+    from sqlmodel.ext.asyncio.session import AsyncSession
+    from app.database import async_engine
+    from app.query_counter import QueryCounter
+
+    results = {}
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with QueryCounter(async_engine) as queries:
+        for group_id in group_ids:
+            async with AsyncSession(async_engine) as session:
+                results[group_id] = await compute(session, group_id)
+    elapsed = time.perf_counter() - start
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+    return results, (elapsed, queries.count, peak)
+
+
+async def run(group_ids):
+    from app import ledger
+    from app.database import async_engine
+    from app.settlement import to_cents
+
+    # Warm the connection pool and SQLite's page cache before timing either side
+    await measure(ledger.compute_group_balances, group_ids)
+    stats = {}
+    for name, compute in (("ORM loop", orm_loop_balances), ("SQL aggregate", ledger.compute_group_balances)):
+        results, (elapsed, statements, _) = await measure(compute, group_ids)
+        peak = (await measure(compute, group_ids, trace_memory=True))[1][2]
+        stats[name] = (results, (elapsed, statements, peak))
+    await async_engine.dispose()
+    python_results, sql_results = stats["ORM loop"][0], stats["SQL aggregate"][0]
+
+    mismatches = []
+    max_difference = 0.0
+    for group_id in group_ids:
+        expected, actual = python_results[group_id], sql_results[group_id]
+        for user_id in set(expected) | set(actual):
+            a, b = expected.get(user_id, 0.0), actual.get(user_id, 0.0)
+            max_difference = max(max_difference, abs(a - b))
+            if to_cents(a) != to_cents(b):
+                mismatches.append((group_id, user_id, a, b))
+    return {name: result[1] for name, result in stats.items()}, mismatches, max_difference
+
+
+def main(argv=None):
+    database_url, scratch = use_database(argv)
+    from seed_data import add_arguments as add_dataset_arguments
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="sync SQLAlchemy URL of a scratch database (default: temporary SQLite file)")
+    add_dataset_arguments(parser)
+    parser.set_defaults(users=200, groups=4, members=20, expenses=25000, payers=2, shares=6)
+    args = parser.parse_args(argv)
+
+    from alembic import command
+    from alembic.config import Config
+    from app.database import engine
+    from seed_data import seed_from_args
+
+    command.upgrade(Config(os.path.join(BACKEND_DIR, "alembic.ini")), "head")
+    start = time.perf_counter()
+    data = seed_from_args(args)
+    print(f"Seeded {args.groups} groups x {args.expenses} expenses "
+          f"({args.payers} payers, {args.shares} shares each) in {time.perf_counter() - start:.1f} s\n")
+
+    results, mismatches, max_difference = asyncio.run(run(list(data.members)))
+    engine.dispose()
+
+    print(f"{'strategy':<15} {'seconds':>8} {'stmts':>6} {'peak MiB':>9}")
+    for name, (elapsed, statements, peak) in results.items():
+        print(f"{name:<15} {elapsed:>8.3f} {statements:>6} {peak:>9.2f}")
+    print(f"\nLargest difference between the two: {max_difference:.2e}")
+    for group_id, user_id, expected, actual in mismatches:
+        print(f"MISMATCH group {group_id} user {user_id}: ORM loop {expected!r}, SQL {actual!r}")
+    if not mismatches:
+        print("Every member's balance matches to the cent.")
+
+    if scratch:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
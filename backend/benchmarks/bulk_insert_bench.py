@@ -0,0 +1,82 @@
+"""
+Benchmark: creating N expenses one request at a time vs one bulk request.
+
+Creates a throwaway group with a few members, then times N calls to
+POST /api/expenses against a single POST /api/expenses/bulk with the same
+N expenses. It writes to the configured database, so point DATABASE_URL_DEV
+at a scratch database first.
+
+Run from the backend/ directory:
+    python -m benchmarks.bulk_insert_bench --count 500
+"""
+import argparse
+import asyncio
+import secrets
+import time
+import httpx
+from sqlmodel import SQLModel, Session
+from app.auth_utils import create_access_token
+from app.database import engine, async_engine
+from app.main import app
+from app.models import User, Group, GroupStats, Membership
+
+MEMBERS = 4
+
+
+def create_fixture():
+    """A group with MEMBERS users, created directly so bcrypt doesn't skew the timings."""
+    SQLModel.metadata.create_all(engine)
+    tag = secrets.token_hex(4)
+    with Session(engine) as session:
+        users = [User(email=f"bench-{tag}-{i}@example.com", name=f"bench{i}", password_hash="-") for i in range(MEMBERS)]
+        session.add_all(users)
+        session.flush()
+        group = Group(name=f"bulk bench {tag}", created_by=users[0].id)
+        session.add(group)
+        session.flush()
+        session.add_all(Membership(user_id=u.id, group_id=group.id) for u in users)
+        session.add(GroupStats(group_id=group.id, member_count=len(users)))
+        session.commit()
+        return group.id, [u.id for u in users]
+
+
+def make_expense(group_id, user_ids, i):
+    share = round(100 / len(user_ids), 2)
+    return {
+        "group_id": group_id,
+        "description": f"receipt {i}",
+        "total_amount": share * len(user_ids),
+        "payers": [{"user_id": user_ids[i % len(user_ids)], "paid_amount": share * len(user_ids)}],
+        "shares": [{"user_id": u, "share_amount": share} for u in user_ids],
+    }
+
+
+async def main(args):
+    group_id, user_ids = create_fixture()
+    headers = {"Authorization": f"Bearer {create_access_token(data={'sub': str(user_ids[0])})}"}
+    expenses = [make_expense(group_id, user_ids, i) for i in range(args.count)]
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+        start = time.perf_counter()
+        for expense in expenses:
+            response = await client.post("/api/expenses", json=expense)
+            response.raise_for_status()
+        per_item = time.perf_counter() - start
+
+        start = time.perf_counter()
+        response = await client.post("/api/expenses/bulk", json={"expenses": expenses})
+        response.raise_for_status()
+        bulk = time.perf_counter() - start
+
+    await async_engine.dispose()
+    print(f"{args.count} expenses x {MEMBERS} members")
+    print(f"  per-item endpoint: {per_item:8.3f} s  ({per_item / args.count * 1000:.2f} ms/expense)")
+    print(f"  bulk endpoint:     {bulk:8.3f} s  ({bulk / args.count * 1000:.2f} ms/expense)")
+    print(f"  speed-up:          {per_item / bulk:8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=500, help="expenses to create (bulk accepts up to 1000)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,68 @@
+"""
+Load test: latency of a cheap endpoint while slow queries are in flight.
+
+Fires --slow concurrent requests that each run a deliberately slow query, and
+meanwhile probes GET / every few milliseconds. The query runs once through a
+blocking sync Session (how the routers used to work) and once through the
+AsyncSession from app.database, so the two latency columns show what a slow
+query does to every other request in the same worker.
+
+Run from the backend/ directory against the configured database:
+    python -m benchmarks.concurrency_load
+"""
+import argparse
+import asyncio
+import httpx
+from fastapi import APIRouter, Depends
+from sqlalchemy import text
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.database import engine, async_engine, get_session
+from app.main import app
+from benchmarks.latency import measure_during, print_header, print_row
+
+# Counting through a recursive CTE keeps the database busy on both SQLite and Postgres
+SLOW_QUERY = text(
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < :n) "
+    "SELECT count(*) FROM c"
+)
+
+router = APIRouter()
+
+
+@router.get("/_load/sync")
+async def slow_sync(n: int):
+    with Session(engine) as session:
+        return {"count": session.exec(SLOW_QUERY, params={"n": n}).one()[0]}
+
+
+@router.get("/_load/async")
+async def slow_async(n: int, session: AsyncSession = Depends(get_session)):
+    return {"count": (await session.exec(SLOW_QUERY, params={"n": n})).one()[0]}
+
+
+app.include_router(router)
+
+
+async def run_scenario(path, args):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        def load():
+            return asyncio.gather(*(client.get(path, params={"n": args.rows}) for _ in range(args.slow)))
+        return await measure_during(client, load, args.interval)
+
+
+async def main(args):
+    print(f"{args.slow} concurrent slow requests, {args.rows} rows each")
+    print_header()
+    for label, path in (("sync", "/_load/sync"), ("async", "/_load/async")):
+        print_row(label, await run_scenario(path, args))
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slow", type=int, default=8, help="concurrent slow requests")
+    parser.add_argument("--rows", type=int, default=300_000, help="rows counted by each slow query")
+    parser.add_argument("--interval", type=float, default=0.005, help="seconds between probes")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,142 @@
+"""
+Benchmark: deleting a large group, application-side deletes vs ON DELETE CASCADE.
+
+Seeds two identical groups with --expenses expenses each (default 100k, with
+one payer and four shares per expense). One is deleted the way delete_group
+used to: load every expense, then one DELETE per child table. The other goes
+through DELETE /api/groups/{id}, which now sends a single DELETE and lets the
+foreign keys cascade. Reports wall time, statements sent and the peak Python
+memory allocated during each delete.
+
+By default it runs against a throwaway SQLite file. Pass --database-url to use
+a local Postgres instead; point it at a scratch database.
+
+Run from the backend/ directory:
+    python -m benchmarks.delete_group_bench
+    python -m benchmarks.delete_group_bench --expenses 10000 --database-url postgresql://localhost/splitmoney_bench
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import time
+import tracemalloc
+from benchmarks.api_bench import BACKEND_DIR, use_database
+
+MEMBERS = 8
+
+# The old code sent all of a group's expense ids in one IN list. Past 32766
+# (SQLite) or 32767 (asyncpg) bind parameters that statement fails outright, so
+# the reproduction below sends them in chunks to be measurable at all
+LEGACY_IN_CHUNK = 10000
+
+
+async def legacy_delete_group(session, group_id: int):
+    """delete_group before cascading foreign keys, apart from the chunked IN lists."""
+    from sqlmodel import select, delete
+    from app import ledger
+    from app.models import Group, Expense, ExpensePayer, ExpenseShare, Membership, GroupInvitation
+
+    group = await session.get(Group, group_id)
+    expenses = (await session.exec(select(Expense).where(Expense.group_id == group_id))).all()
+    expense_ids = [exp.id for exp in expenses]
+    for i in range(0, len(expense_ids), LEGACY_IN_CHUNK):
+        chunk = expense_ids[i:i + LEGACY_IN_CHUNK]
+        await session.exec(delete(ExpenseShare).where(ExpenseShare.expense_id.in_(chunk)))
+        await session.exec(delete(ExpensePayer).where(ExpensePayer.expense_id.in_(chunk)))
+    await session.exec(delete(Expense).where(Expense.group_id == group_id))
+    await session.exec(delete(Membership).where(Membership.group_id == group_id))
+    await ledger.clear_group(session, group_id)
+    await session.exec(delete(GroupInvitation).where(GroupInvitation.group_id == group_id))
+    await session.delete(group)
+    await session.commit()
+
+
+async def measure(run):
+    """(seconds, statements, peak MiB of Python allocations) for one awaited delete."""
+    from app.database import async_engine
+    from app.query_counter import QueryCounter
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    with QueryCounter(async_engine) as queries:
+        await run()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    return elapsed, queries.count, peak
+
+
+async def run(group_ids):
+    import httpx
+    from sqlmodel import select, func
+    from sqlmodel.ext.asyncio.session import AsyncSession
+    from app.auth_utils import create_access_token
+    from app.database import async_engine
+    from app.main import app
+    from app.models import Group, Expense, ExpenseShare
+
+    legacy_group, cascade_group = group_ids
+    async with AsyncSession(async_engine) as session:
+        owner = (await session.get(Group, cascade_group)).created_by
+
+    async def legacy():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            await legacy_delete_group(session, legacy_group)
+
+    headers = {"Authorization": f"Bearer {create_access_token(data={'sub': str(owner)})}"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+        async def cascade():
+            (await client.delete(f"/api/groups/{cascade_group}")).raise_for_status()
+
+        results = {
+            "application deletes": await measure(legacy),
+            "ON DELETE CASCADE": await measure(cascade),
+        }
+
+    async with AsyncSession(async_engine) as session:
+        left = (await session.exec(
+            select(func.count(ExpenseShare.id))
+            .join(Expense, Expense.id == ExpenseShare.expense_id)
+            .where(Expense.group_id.in_(group_ids))
+        )).one()
+    await async_engine.dispose()
+    return results, left
+
+
+def main(argv=None):
+    database_url, scratch = use_database(argv)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="sync SQLAlchemy URL of a scratch database (default: temporary SQLite file)")
+    parser.add_argument("--expenses", type=int, default=100000, help="expenses in each group")
+    args = parser.parse_args(argv)
+
+    from alembic import command
+    from alembic.config import Config
+    from app.database import engine
+    from seed_data import seed
+
+    command.upgrade(Config(os.path.join(BACKEND_DIR, "alembic.ini")), "head")
+    start = time.perf_counter()
+    data = seed(users=MEMBERS, groups=2, members_per_group=MEMBERS, expenses_per_group=args.expenses,
+                payers_per_expense=1, shares_per_expense=4)
+    print(f"Seeded 2 groups x {args.expenses} expenses in {time.perf_counter() - start:.1f} s\n")
+
+    results, left = asyncio.run(run(list(data.members)))
+    engine.dispose()
+
+    print(f"{'strategy':<22} {'seconds':>8} {'stmts':>6} {'peak MiB':>9}")
+    for name, (elapsed, statements, peak) in results.items():
+        print(f"{name:<22} {elapsed:>8.2f} {statements:>6} {peak:>9.1f}")
+    if left:
+        print(f"\n{left} expense shares were left behind")
+
+    if scratch:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return 1 if left else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
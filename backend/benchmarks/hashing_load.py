@@ -0,0 +1,68 @@
+"""
+Load test: latency of a cheap endpoint during a burst of password checks.
+
+Fires --logins concurrent bcrypt verifications and meanwhile probes GET /.
+The verification runs once inline on the event loop (how the auth routes
+used to call passlib) and once through app.hashing.password_hasher, so
+the two rows show what a login storm does to unrelated endpoints. Requests
+rejected by the hasher's queue limit are counted separately.
+
+Run from the backend/ directory:
+    python -m benchmarks.hashing_load
+"""
+import argparse
+import asyncio
+import httpx
+from fastapi import APIRouter
+from app.hashing import get_pwd_context, password_hasher
+from app.main import app
+from benchmarks.latency import measure_during, print_header, print_row
+
+PASSWORD = "Passw0rdX"
+PASSWORD_HASH = get_pwd_context().hash(PASSWORD)
+
+router = APIRouter()
+
+
+@router.post("/_load/verify-inline")
+async def verify_inline():
+    return {"ok": get_pwd_context().verify(PASSWORD, PASSWORD_HASH)}
+
+
+@router.post("/_load/verify-executor")
+async def verify_executor():
+    return {"ok": await password_hasher.verify(PASSWORD, PASSWORD_HASH)}
+
+
+app.include_router(router)
+
+
+async def run_scenario(path, args):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        responses = []
+
+        async def load():
+            responses.extend(await asyncio.gather(*(client.post(path) for _ in range(args.logins))))
+
+        result = await measure_during(client, load, args.interval)
+        result["rejected"] = sum(1 for r in responses if r.status_code == 429)
+        return result
+
+
+async def main(args):
+    print(f"{args.logins} concurrent password checks, {password_hasher.max_workers} hashing threads")
+    print_header()
+    for label, path in (("inline", "/_load/verify-inline"), ("executor", "/_load/verify-executor")):
+        result = await run_scenario(path, args)
+        print_row(label, result)
+        if result["rejected"]:
+            print(f"{'':>8} {result['rejected']} check(s) rejected by the queue limit")
+    print(password_hasher.snapshot())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=24, help="concurrent password checks")
+    parser.add_argument("--interval", type=float, default=0.005, help="seconds between probes")
+    asyncio.run(main(parser.parse_args()))
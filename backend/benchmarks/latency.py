@@ -0,0 +1,49 @@
+"""Shared helpers for the load tests: probe a cheap endpoint while other work runs."""
+import asyncio
+import statistics
+import time
+
+
+async def probe(client, finished, latencies, interval, path="/", send=None):
+    # Latency is measured from when each probe was due, so time spent with the
+    # event loop blocked counts against the probes that couldn't be sent
+    due = time.perf_counter()
+    while not finished or due < finished[0]:
+        await asyncio.sleep(max(0, due - time.perf_counter()))
+        await (send(client) if send else client.get(path))
+        latencies.append(time.perf_counter() - due)
+        due += interval
+
+
+async def measure_during(client, start_load, interval, path="/", send=None):
+    """
+    Probes `path` (or awaits `send(client)`, if given) while the awaitable
+    returned by `start_load()` runs; returns latency stats in ms.
+    """
+    latencies = []
+    finished = []
+    prober = asyncio.create_task(probe(client, finished, latencies, interval, path, send))
+    await asyncio.sleep(interval * 10)
+    start = time.perf_counter()
+    await start_load()
+    elapsed = time.perf_counter() - start
+    # The prober still sends every probe that fell due while the load ran
+    finished.append(time.perf_counter())
+    await prober
+
+    latencies.sort()
+    return {
+        "probes": len(latencies),
+        "p50": statistics.median(latencies) * 1000,
+        "p99": latencies[max(0, int(len(latencies) * 0.99) - 1)] * 1000,
+        "max": latencies[-1] * 1000,
+        "wall": elapsed,
+    }
+
+
+def print_header():
+    print(f"{'mode':>8} {'probes':>7} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9} {'wall s':>7}")
+
+
+def print_row(label, r):
+    print(f"{label:>8} {r['probes']:>7} {r['p50']:>9.1f} {r['p99']:>9.1f} {r['max']:>9.1f} {r['wall']:>7.2f}")
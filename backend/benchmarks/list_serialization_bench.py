@@ -0,0 +1,168 @@
+"""
+Benchmark: the expense listings with and without the fast JSON path.
+
+Seeds a large account (a user in several groups with thousands of expenses,
+each with several payers and shares), then times GET /api/expenses and
+GET /api/groups/{id}/expenses at the largest page size two ways:
+
+- validated: FAST_JSON_RESPONSES off, so FastAPI validates the payload against
+  the route's response_model and encodes it with the stdlib json module
+- fast: app.responses.fast_json sends the payload as built, encoded by orjson
+
+The two ways take turns request by request, so drift in the machine's speed
+over the run affects both alike. Also times walking the user's whole history
+through /api/expenses cursors, as a client syncing everything would. Checks
+that both ways return the same JSON and headers for the first page of each
+listing, and exits non-zero if they differ.
+
+By default it runs against a throwaway SQLite file. Pass --database-url to use
+a local Postgres instead; point it at a scratch database.
+
+Run from the backend/ directory:
+    python -m benchmarks.list_serialization_bench
+    python -m benchmarks.list_serialization_bench --expenses 5000 --shares 10 --iterations 100
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import time
+from benchmarks.api_bench import BACKEND_DIR, use_database, summarize, check_response, print_header, print_result
+
+MODES = (("validated", False), ("fast", True))
+
+
+async def run_modes(client, path, params, iterations, warmup):
+    """Sends the request `iterations` times per mode, alternating modes; returns {label: summary}."""
+    from app.config import settings
+    from app.database import async_engine
+    from app.query_counter import QueryCounter
+
+    latencies = {label: [] for label, _ in MODES}
+    statements = {label: 0 for label, _ in MODES}
+    for i in range(warmup + iterations):
+        for label, fast in MODES:
+            settings.fast_json_responses = fast
+            with QueryCounter(async_engine) as queries:
+                start = time.perf_counter()
+                response = await client.get(path, params=params)
+                elapsed = time.perf_counter() - start
+            check_response(response)
+            if i >= warmup:
+                latencies[label].append(elapsed)
+                statements[label] += queries.count
+    return {label: summarize(latencies[label], statements[label]) for label, _ in MODES}
+
+
+async def walk_history(client, limit):
+    """Follows /api/expenses cursors to the end; returns (seconds, pages, expenses)."""
+    start = time.perf_counter()
+    pages = expenses = 0
+    cursor = None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        body = (await client.get("/api/expenses", params=params)).json()
+        pages += 1
+        expenses += len(body["items"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return time.perf_counter() - start, pages, expenses
+
+
+async def run(args, data):
+    import httpx
+    from app.auth_utils import create_access_token
+    from app.config import settings
+    from app.database import async_engine
+    from app.main import app
+    from app.pagination import MAX_PAGE_SIZE
+
+    memberships = {}
+    for group_id, user_ids in data.members.items():
+        for user_id in user_ids:
+            memberships.setdefault(user_id, []).append(group_id)
+    user_id = max(memberships, key=lambda u: len(memberships[u]))
+    group_id = memberships[user_id][0]
+    headers = {"Authorization": f"Bearer {create_access_token(data={'sub': str(user_id)})}"}
+    paths = {
+        "get_expenses": "/api/expenses",
+        "get_group_expenses": f"/api/groups/{group_id}/expenses",
+    }
+
+    mismatches = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+        # The same requests both ways first, to check the fast path changes nothing a client sees
+        for path in paths.values():
+            responses = []
+            for _, fast in MODES:
+                settings.fast_json_responses = fast
+                response = await client.get(path, params={"limit": MAX_PAGE_SIZE})
+                responses.append((response.status_code, response.json(), response.headers.get("etag"),
+                                  response.headers.get("content-type")))
+            if responses[0] != responses[1]:
+                mismatches.append(path)
+        size = len((await client.get(paths["get_expenses"], params={"limit": MAX_PAGE_SIZE})).content)
+        print(f"User {user_id} in {len(memberships[user_id])} groups, "
+              f"{MAX_PAGE_SIZE} expenses per page ({size / 1024:.0f} KiB for /api/expenses)\n")
+
+        print_header()
+        for name, path in paths.items():
+            results = await run_modes(client, path, {"limit": MAX_PAGE_SIZE}, args.iterations, args.warmup)
+            for label, result in results.items():
+                print_result(f"{name} ({label})", result)
+        walks = {}
+        for _ in range(args.walks):
+            for label, fast in MODES:
+                settings.fast_json_responses = fast
+                elapsed, pages, expenses = await walk_history(client, MAX_PAGE_SIZE)
+                best = walks.get(label, (elapsed,))[0]
+                walks[label] = (min(best, elapsed), pages, expenses)
+
+    heading = f"full history (best of {args.walks})"
+    print(f"\n{heading:<30} {'pages':>5} {'expenses':>9} {'seconds':>8}")
+    for label, (elapsed, pages, expenses) in walks.items():
+        print(f"{label:<30} {pages:>5} {expenses:>9} {elapsed:>8.2f}")
+    await async_engine.dispose()
+    return mismatches
+
+
+def main(argv=None):
+    database_url, scratch = use_database(argv)
+    from seed_data import add_arguments as add_dataset_arguments
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="sync SQLAlchemy URL of a scratch database (default: temporary SQLite file)")
+    parser.add_argument("--iterations", type=int, default=50, help="timed requests per case")
+    parser.add_argument("--warmup", type=int, default=5, help="untimed requests before each case")
+    parser.add_argument("--walks", type=int, default=3, help="full-history walks per mode")
+    add_dataset_arguments(parser)
+    parser.set_defaults(users=100, groups=4, members=10, expenses=2500, payers=2, shares=6)
+    args = parser.parse_args(argv)
+
+    from alembic import command
+    from alembic.config import Config
+    from app.database import engine
+    from seed_data import seed_from_args
+
+    command.upgrade(Config(os.path.join(BACKEND_DIR, "alembic.ini")), "head")
+    start = time.perf_counter()
+    data = seed_from_args(args)
+    print(f"Seeded {args.groups} groups x {args.expenses} expenses "
+          f"({args.payers} payers, {args.shares} shares each) in {time.perf_counter() - start:.1f} s")
+
+    mismatches = asyncio.run(run(args, data))
+    engine.dispose()
+    for path in mismatches:
+        print(f"MISMATCH {path}: the fast path returned a different body or headers")
+    if not mismatches:
+        print("\nBoth ways return the same JSON and headers.")
+
+    if scratch:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""
+Micro-benchmark for the debt simplification engine.
+
+Run from the backend/ directory:
+    python -m benchmarks.settlement_bench
+"""
+import argparse
+import random
+import time
+from app.settlement import simplify_debts
+
+GROUP_SIZES = [10, 1_000, 100_000]
+# The old quadratic loop takes minutes at 100k members, so it is only timed below this
+LEGACY_MAX_SIZE = 1_000
+
+
+def make_balances(size: int, seed: int = 42):
+    """Random balances in cents that sum to zero, like a real group ledger."""
+    rng = random.Random(seed)
+    balances = {user_id: rng.randint(-50_000, 50_000) for user_id in range(1, size)}
+    balances[size] = -sum(balances.values())
+    return balances
+
+
+def legacy_simplify(balances):
+    """The previous min()/max() scan over float balances, kept for comparison."""
+    debtors = {u: b / 100 for u, b in balances.items() if b / 100 < -0.01}
+    creditors = {u: b / 100 for u, b in balances.items() if b / 100 > 0.01}
+    transactions = []
+    while debtors and creditors:
+        debtor_id, debt = min(debtors.items(), key=lambda item: item[1])
+        creditor_id, credit = max(creditors.items(), key=lambda item: item[1])
+        amount = min(abs(debt), credit)
+        transactions.append((debtor_id, creditor_id, amount))
+        debtors[debtor_id] += amount
+        creditors[creditor_id] -= amount
+        if abs(debtors[debtor_id]) < 0.01:
+            del debtors[debtor_id]
+        if abs(creditors[creditor_id]) < 0.01:
+            del creditors[creditor_id]
+    return transactions
+
+
+def best_of(func, balances, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(balances)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'members':>10} {'heap (ms)':>12} {'transfers':>10} {'legacy (ms)':>12}")
+    for size in GROUP_SIZES:
+        balances = make_balances(size)
+        elapsed, transfers = best_of(simplify_debts, balances, args.repeat)
+        assert len(transfers) <= size - 1
+
+        # Every balance must end at exactly zero
+        settled = dict(balances)
+        for t in transfers:
+            settled[t.from_user_id] += t.amount_cents
+            settled[t.to_user_id] -= t.amount_cents
+        assert not any(settled.values())
+
+        legacy = "-"
+        if size <= LEGACY_MAX_SIZE:
+            legacy_elapsed, _ = best_of(legacy_simplify, balances, args.repeat)
+            legacy = f"{legacy_elapsed * 1000:.2f}"
+        print(f"{size:>10} {elapsed * 1000:>12.2f} {len(transfers):>10} {legacy:>12}")
+
+
+if __name__ == "__main__":
+    main()
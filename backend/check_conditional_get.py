@@ -0,0 +1,115 @@
+"""
+Check the ETag / If-None-Match handling of the polled read endpoints.
+
+Seeds a scratch SQLite database (see endpoint_harness.py), then checks that
+/api/groups/summary, /api/groups/{id}/summary, /api/groups/{id}/expenses and
+/api/me/balances:
+
+- answer a repeated request with 304 after a single version lookup
+- change their ETag after every kind of write that changes the body
+- keep it for groups the write didn't touch
+- still refuse non-members, whatever If-None-Match says
+
+Usage (from the backend/ directory):
+    python check_conditional_get.py
+"""
+import sys
+from endpoint_harness import USERS, seed, cleanup
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+from app.auth_utils import create_access_token
+from app.database import engine, async_engine
+from app.main import app
+from app.models import Expense, Membership
+from app.query_counter import QueryCounter
+
+GROUP = 1
+OTHER_GROUP = 2
+READS = {
+    "groups summary": ("/api/groups/summary", {}),
+    "group summary": (f"/api/groups/{GROUP}/summary", {}),
+    "group expenses": (f"/api/groups/{GROUP}/expenses", {"limit": 10}),
+    "my balances": ("/api/me/balances", {}),
+    "other group summary": (f"/api/groups/{OTHER_GROUP}/summary", {}),
+}
+
+
+def auth(user_id: int) -> dict:
+    return {"Authorization": f"Bearer {create_access_token(data={'sub': str(user_id)})}"}
+
+
+def main():
+    seed()
+    results = []
+
+    def check(name, ok, detail=""):
+        results.append(ok)
+        print(f"{'PASS' if ok else 'FAIL'}  {name}{f'  ({detail})' if detail else ''}")
+
+    with Session(engine) as session:
+        member = session.exec(
+            select(Membership.user_id).where(Membership.group_id == GROUP, Membership.user_id != 1)
+        ).first()
+        expense_id = session.exec(select(Expense.id).where(Expense.group_id == GROUP)).first()
+    owner = auth(1)
+    new_expense = {
+        "group_id": GROUP, "description": "check", "total_amount": 2,
+        "payers": [{"user_id": 1, "paid_amount": 2}],
+        "shares": [{"user_id": 1, "share_amount": 1}, {"user_id": member, "share_amount": 1}],
+    }
+
+    try:
+        with TestClient(app) as client:
+            def etags(headers=owner):
+                return {name: client.get(path, params=params, headers=headers).headers.get("etag")
+                        for name, (path, params) in READS.items()}
+
+            before = etags()
+            check("reads return an ETag", all(before.values()), str(before))
+
+            for name, (path, params) in READS.items():
+                with QueryCounter(async_engine) as queries:
+                    response = client.get(path, params=params, headers={**owner, "If-None-Match": before[name]})
+                check(f"{name}: 304 on a matching If-None-Match",
+                      response.status_code == 304 and response.content == b"" and queries.count <= 1,
+                      f"{response.status_code}, {queries.count} statements")
+
+            response = client.get(READS["group expenses"][0], params={"limit": 5}, headers=owner)
+            check("each page has its own ETag", response.headers["etag"] != before["group expenses"])
+
+            outsider = auth(USERS)
+            response = client.get(READS["group summary"][0], headers={**outsider, "If-None-Match": "*"})
+            check("non-members get 403, not 304", response.status_code == 403)
+
+            writes = [
+                ("create expense", lambda: client.post("/api/expenses", json=new_expense, headers=owner)),
+                ("update expense", lambda: client.put(f"/api/expenses/{expense_id}", json=new_expense, headers=owner)),
+                ("delete expense", lambda: client.delete(f"/api/expenses/{expense_id}", headers=owner)),
+                ("bulk create", lambda: client.post("/api/expenses/bulk", json={"expenses": [new_expense]}, headers=owner)),
+                ("settle up", lambda: client.post(f"/api/groups/{GROUP}/settle",
+                                                  json={"to_user_id": member, "amount": 1}, headers=owner)),
+                ("rename group", lambda: client.put(f"/api/groups/{GROUP}", json={"name": "renamed"}, headers=owner)),
+                ("rename member", lambda: client.put("/auth/users/me/name", json={"name": "renamed"}, headers=auth(member))),
+                ("remove member", lambda: client.delete(f"/api/groups/{GROUP}/members/{member}", headers=owner)),
+            ]
+            for name, write in writes:
+                response = write()
+                after = etags()
+                changed = [read for read in READS if after[read] != before[read]]
+                # Renaming a member also touches the member's other groups, none of which is OTHER_GROUP
+                expected = ["groups summary", "group summary", "group expenses", "my balances"]
+                check(f"{name} changes the group's ETags only",
+                      response.status_code < 400 and changed == expected, f"changed: {changed}")
+                before = after
+
+            client.portal.call(async_engine.dispose)
+    finally:
+        engine.dispose()
+        cleanup()
+
+    print(f"\n{sum(results)}/{len(results)} checks passed.")
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
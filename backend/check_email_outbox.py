@@ -0,0 +1,229 @@
+"""
+Check email outbox delivery against a local SMTP sink.
+
+Starts an aiosmtpd server on a free local port and points the app's mail
+settings at it along with a throwaway SQLite database, then checks that:
+
+- an email is only stored if the transaction that enqueued it commits
+- a backlog is drained in batches, one SMTP connection per batch
+- temporary SMTP errors are retried with backoff and then delivered
+- permanent errors are given up on without retrying
+- an outage leaves mail queued until the server is back
+- forgot-password returns without waiting on SMTP, and the email follows
+
+Usage (from the backend/ directory):
+    python check_email_outbox.py
+"""
+import os
+import socket
+import sys
+import tempfile
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="splitmoney-outbox-"), "outbox.db")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        return s.getsockname()[1]
+
+
+SMTP_PORT = free_port()
+
+# Point the app at the scratch database and the sink before app.config is imported
+os.environ.update({
+    "ENVIRONMENT": "development",
+    "DATABASE_URL_DEV": f"sqlite:///{DB_PATH}",
+    "MAIL_SERVER": "localhost",
+    "MAIL_PORT": str(SMTP_PORT),
+    "MAIL_STARTTLS": "False",
+    "MAIL_SSL_TLS": "False",
+    "MAIL_USERNAME": "check",
+    "MAIL_PASSWORD": "check",
+    "MAIL_FROM": "noreply@example.com",
+})
+os.environ.setdefault("SECRET_KEY", "outbox-check")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+import asyncio
+import shutil
+import time
+from alembic import command
+from alembic.config import Config
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select, func
+from app.database import engine, async_engine
+from app.main import app
+from app.models import EmailOutbox, User
+from app.outbox import OutboxSender, enqueue_email, email_smtp_connections_total
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+BOUNCE = "bounce@example.com"
+
+
+class Sink:
+    """Collects delivered messages; can refuse the next few with a temporary error."""
+
+    def __init__(self):
+        self.messages = []
+        self.fail_next = 0
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address == BOUNCE:
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.fail_next:
+            self.fail_next -= 1
+            return "451 Try again later"
+        self.messages.extend(envelope.rcpt_tos)
+        return "250 OK"
+
+
+def start_sink(sink: Sink) -> Controller:
+    controller = Controller(
+        sink, hostname="localhost", port=SMTP_PORT,
+        authenticator=lambda *args: AuthResult(success=True), auth_require_tls=False,
+    )
+    controller.start()
+    return controller
+
+
+def new_sender(**overrides) -> OutboxSender:
+    options = dict(batch_size=50, poll_interval=0.1, max_attempts=3,
+                   backoff_base=0.05, backoff_max=0.2, claim_seconds=60)
+    options.update(overrides)
+    return OutboxSender(**options)
+
+
+async def enqueue(recipients, commit=True):
+    async with AsyncSession(async_engine) as session:
+        for recipient in recipients:
+            enqueue_email(session, recipient, "Check", "<p>Hello</p>")
+        if commit:
+            await session.commit()
+
+
+def outbox_counts():
+    with Session(engine) as session:
+        return dict(session.exec(select(EmailOutbox.status, func.count(EmailOutbox.id)).group_by(EmailOutbox.status)).all())
+
+
+def clear_outbox():
+    with Session(engine) as session:
+        for email in session.exec(select(EmailOutbox)).all():
+            session.delete(email)
+        session.commit()
+
+
+def smtp_connections() -> float:
+    return sum(email_smtp_connections_total._values.values())
+
+
+async def drain_until_idle(sender: OutboxSender, timeout=5.0):
+    """Runs send cycles until nothing due is left (waiting out any backoff)."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        await sender.drain_once()
+        counts = outbox_counts()
+        if not counts.get("pending"):
+            return
+        await asyncio.sleep(0.05)
+
+
+async def run_checks(sink: Sink, controller_box: list, results: list):
+    def check(name, ok, detail=""):
+        results.append(ok)
+        print(f"{'PASS' if ok else 'FAIL'}  {name}{f'  ({detail})' if detail else ''}")
+
+    # Rolled-back transactions leave nothing behind
+    await enqueue(["rollback@example.com"], commit=False)
+    check("rolled-back email is not stored", outbox_counts() == {})
+
+    # A backlog goes out in batches over one connection each
+    sender = new_sender()
+    connections = smtp_connections()
+    await enqueue([f"user{i}@example.com" for i in range(120)])
+    await drain_until_idle(sender)
+    opened = smtp_connections() - connections
+    check("backlog of 120 delivered", len(sink.messages) == 120 and outbox_counts() == {"sent": 120},
+          f"{len(sink.messages)} received")
+    check("one SMTP connection per batch of 50", opened == 3, f"{opened:.0f} connections")
+
+    # Temporary failures back off and retry
+    clear_outbox()
+    sink.messages.clear()
+    sink.fail_next = 2
+    await enqueue(["retry1@example.com", "retry2@example.com"])
+    await sender.drain_once()
+    with Session(engine) as session:
+        attempts = session.exec(select(EmailOutbox.attempts).where(EmailOutbox.status == "pending")).all()
+    check("temporary failures are rescheduled", attempts == [1, 1], f"attempts {attempts}")
+    await drain_until_idle(sender)
+    check("rescheduled emails are delivered", sorted(sink.messages) == ["retry1@example.com", "retry2@example.com"])
+
+    # Permanent (5xx) failures are not retried
+    clear_outbox()
+    await enqueue([BOUNCE])
+    await drain_until_idle(sender)
+    with Session(engine) as session:
+        bounced = session.exec(select(EmailOutbox)).one()
+    check("rejected recipient marked failed without retrying",
+          bounced.status == "failed" and bounced.attempts == 1, f"{bounced.status}, {bounced.attempts} attempts")
+
+    # An outage keeps mail queued until the server is back
+    clear_outbox()
+    sink.messages.clear()
+    controller_box[0].stop()
+    await enqueue(["outage@example.com"])
+    await sender.drain_once()
+    check("email stays queued while SMTP is down", outbox_counts() == {"pending": 1})
+    controller_box[0] = start_sink(sink)
+    await drain_until_idle(sender)
+    check("queued email delivered once SMTP is back", sink.messages == ["outage@example.com"])
+
+
+def main():
+    command.upgrade(Config(os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")), "head")
+    sink = Sink()
+    controller_box = [start_sink(sink)]
+    results = []
+    try:
+        asyncio.run(run_checks(sink, controller_box, results))
+        asyncio.run(async_engine.dispose())
+
+        # End to end: the request returns before the email is sent, and the app's
+        # own sender delivers it shortly after
+        clear_outbox()
+        sink.messages.clear()
+        with Session(engine) as session:
+            session.add(User(email="reset@example.com", name="Reset", password_hash="-"))
+            session.commit()
+        with TestClient(app) as client:
+            start = time.perf_counter()
+            response = client.post("/auth/forgot-password", json={"email": "reset@example.com"})
+            elapsed = time.perf_counter() - start
+            deadline = time.monotonic() + 5
+            while not sink.messages and time.monotonic() < deadline:
+                time.sleep(0.02)
+            delivered = time.perf_counter() - start
+            client.portal.call(async_engine.dispose)
+        ok = response.status_code == 200 and sink.messages == ["reset@example.com"]
+        results.append(ok)
+        print(f"{'PASS' if ok else 'FAIL'}  forgot-password email delivered by the worker "
+              f"(response {elapsed * 1000:.0f} ms, delivered after {delivered * 1000:.0f} ms)")
+    finally:
+        controller_box[0].stop()
+        engine.dispose()
+        shutil.rmtree(os.path.dirname(DB_PATH), ignore_errors=True)
+
+    print(f"\n{sum(results)}/{len(results)} checks passed.")
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""
+Check that importing the app stays within its startup budget.
+
+Imports app.main in fresh interpreters under `python -X importtime`, next to
+the framework it can't start without (FLOOR_MODULES), and fails when:
+
+- importing app.main takes more than MAX_RATIO times as long as importing the
+  floor alone (the median over --runs pairs); a ratio keeps the budget the
+  same on a fast laptop and a slow CI box
+- it takes longer than --budget-ms, if given, on the fastest run
+- any module in DEFERRED_MODULES gets imported at startup; those are only
+  loaded on first use (mail, scheduler, templates, password hashing), and an
+  eager import of one of them is how startup time usually creeps back
+
+When a change really needs to load more at startup, raise MAX_RATIO in the
+same commit.
+
+Usage (from the backend/ directory):
+    python check_import_time.py
+    python check_import_time.py --runs 10 --budget-ms 1200
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+# The measured interpreters inherit the environment; importing app.main needs
+# the settings it validates, so fill in placeholders for any that aren't set.
+# Nothing connects to the database while importing
+os.environ.setdefault("DATABASE_URL_DEV", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "import-check")
+os.environ.setdefault("ALGORITHM", "HS256")
+for name, value in {"MAIL_USERNAME": "check", "MAIL_PASSWORD": "check", "MAIL_FROM": "check@example.com",
+                    "MAIL_SERVER": "localhost"}.items():
+    os.environ.setdefault(name, value)
+
+FLOOR_MODULES = ("fastapi", "sqlmodel", "sqlalchemy.ext.asyncio")
+# Measured at about 1.35 with the deferred imports below, and 1.7 without them
+MAX_RATIO = 1.5
+
+# Modules the app loads on first use, and which importing it must not pull in
+DEFERRED_MODULES = {
+    "fastapi_mail": "app.mail_utils.get_mail_config",
+    "httpx": "fastapi_mail, via app.mail_utils.get_mail_config",
+    "rich": "fastapi_mail, via app.mail_utils.get_mail_config",
+    "aiosmtplib": "app.outbox.OutboxSender._connect",
+    "apscheduler": "app.maintenance.MaintenanceScheduler.start",
+    "jinja2": "app.templating.get_templates",
+    "passlib": "app.hashing.get_pwd_context",
+}
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_time(statement: str) -> dict:
+    """Runs `statement` in a new interpreter; returns {module: (cumulative us, nesting depth)}."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"'{statement}' failed:\n{result.stderr}")
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            modules[match.group(4)] = (int(match.group(2)), len(match.group(3)))
+    return modules
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="app/floor import pairs to measure")
+    parser.add_argument("--budget-ms", type=float, help="also fail if the fastest app import takes longer than this")
+    args = parser.parse_args(argv)
+
+    apps, ratios = [], []
+    for _ in range(args.runs):
+        app = import_time("import app.main")
+        floor = import_time("import " + ", ".join(FLOOR_MODULES))
+        apps.append(app)
+        ratios.append(app["app.main"][0] / sum(floor[name][0] for name in FLOOR_MODULES))
+    fastest = min(apps, key=lambda modules: modules["app.main"][0])
+    total_ms = fastest["app.main"][0] / 1000
+    ratio = statistics.median(ratios)
+
+    # What app.main imports directly, heaviest first
+    print(f"{'module':<30} {'ms':>8}")
+    direct = sorted(((name, us) for name, (us, depth) in fastest.items() if depth == 3), key=lambda item: -item[1])
+    for name, us in direct[:10]:
+        print(f"{name:<30} {us / 1000:>8.1f}")
+    print(f"{'app.main':<30} {total_ms:>8.1f}  ({ratio:.2f}x {' + '.join(FLOOR_MODULES)}, budget {MAX_RATIO:g}x)")
+
+    failures = []
+    if ratio > MAX_RATIO:
+        failures.append(f"importing app.main takes {ratio:.2f}x as long as its framework, over the {MAX_RATIO:g}x budget")
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        failures.append(f"importing app.main took {total_ms:.0f} ms, over the {args.budget_ms:g} ms budget")
+    for module, loaded_by in DEFERRED_MODULES.items():
+        if any(name == module or name.startswith(module + ".") for name in fastest):
+            failures.append(f"{module} is imported at startup; it should only be loaded by {loaded_by}")
+
+    print()
+    for failure in failures:
+        print(f"FAIL  {failure}")
+    if not failures:
+        print(f"PASS  app.main imports in {total_ms:.0f} ms ({ratio:.2f}x its framework) "
+              f"without any of {', '.join(DEFERRED_MODULES)}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
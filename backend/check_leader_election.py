@@ -0,0 +1,146 @@
+"""
+Check leader election for the retention jobs with several worker processes.
+
+Starts `python run.py` with WEB_CONCURRENCY workers against a scratch SQLite
+file (or --database-url, e.g. a scratch Postgres database), then checks from
+the workers' logs that:
+
+- exactly one worker is elected and schedules the maintenance jobs
+- it stays the only leader while it is alive
+- after it is killed with SIGKILL, one surviving worker takes over within a
+  few LEADER_POLL_INTERVALs
+- the server still shuts down cleanly
+
+Usage (from the backend/ directory, POSIX only since it sends SIGKILL):
+    python check_leader_election.py
+    python check_leader_election.py --workers 4 --database-url postgresql://localhost/splitmoney_check
+"""
+import argparse
+import os
+import re
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from benchmarks.api_bench import BACKEND_DIR, use_database
+
+# The workers inherit the environment; use_database() sets the database, and
+# these fill in the other settings the app validates if they aren't set
+os.environ.setdefault("SECRET_KEY", "leader-check")
+os.environ.setdefault("ALGORITHM", "HS256")
+for name, value in {"MAIL_USERNAME": "check", "MAIL_PASSWORD": "check", "MAIL_FROM": "check@example.com",
+                    "MAIL_SERVER": "localhost"}.items():
+    os.environ.setdefault(name, value)
+
+POLL_INTERVAL = 0.5
+STARTED = re.compile(r"Started server process \[(\d+)\]")
+ELECTED = re.compile(r"Worker (\d+) is now the leader")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Server:
+    """`python run.py` in a subprocess, with its output collected line by line."""
+
+    def __init__(self, workers: int):
+        env = {
+            **os.environ,
+            "WEB_CONCURRENCY": str(workers),
+            "PORT": str(free_port()),
+            "LEADER_POLL_INTERVAL": str(POLL_INTERVAL),
+            "PYTHONUNBUFFERED": "1",
+        }
+        self.lines = []
+        self.process = subprocess.Popen(
+            [sys.executable, "run.py"], cwd=BACKEND_DIR, env=env,
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+        )
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        for line in self.process.stdout:
+            self.lines.append(line.rstrip())
+
+    def matches(self, pattern):
+        return [int(m.group(1)) for line in list(self.lines) for m in [pattern.search(line)] if m]
+
+    def wait_for(self, condition, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if condition():
+                return True
+            time.sleep(0.1)
+        return condition()
+
+    def stop(self) -> int:
+        self.process.send_signal(signal.SIGINT)
+        try:
+            return self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            return self.process.wait()
+
+
+def main(argv=None):
+    database_url, scratch = use_database(argv)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="sync SQLAlchemy URL of a scratch database (default: temporary SQLite file)")
+    parser.add_argument("--workers", type=int, default=3, help="worker processes to start")
+    args = parser.parse_args(argv)
+
+    from alembic import command
+    from alembic.config import Config
+    command.upgrade(Config(os.path.join(BACKEND_DIR, "alembic.ini")), "head")
+
+    results = []
+
+    def check(name, ok, detail=""):
+        results.append(ok)
+        print(f"{'PASS' if ok else 'FAIL'}  {name}{f'  ({detail})' if detail else ''}")
+
+    server = Server(args.workers)
+    try:
+        started = server.wait_for(lambda: len(server.matches(STARTED)) >= args.workers and server.matches(ELECTED), 60)
+        workers = server.matches(STARTED)
+        check(f"{args.workers} workers start and one is elected", started, f"workers {workers}")
+        if not started:
+            return 1
+
+        # Give every worker several chances to (wrongly) take the lock as well
+        time.sleep(POLL_INTERVAL * 6)
+        elected = server.matches(ELECTED)
+        scheduled = sum("Maintenance jobs scheduled" in line for line in server.lines)
+        check("exactly one leader while it lives", len(elected) == 1 and scheduled == 1,
+              f"elected {elected}, jobs scheduled {scheduled} time(s)")
+
+        leader = elected[0]
+        os.kill(leader, signal.SIGKILL)
+        killed_at = time.monotonic()
+        took_over = server.wait_for(lambda: len(server.matches(ELECTED)) > 1, POLL_INTERVAL * 10)
+        failover = time.monotonic() - killed_at
+        time.sleep(POLL_INTERVAL * 6)
+        elected = server.matches(ELECTED)
+        check("a surviving worker takes over after the leader is killed",
+              took_over and len(elected) == 2 and elected[1] in workers and elected[1] != leader,
+              f"elected {elected}, after {failover:.1f} s")
+    finally:
+        code = server.stop()
+        if scratch:
+            shutil.rmtree(scratch, ignore_errors=True)
+    check("server shuts down cleanly", code == 0, f"exit code {code}")
+
+    if not all(results):
+        print("\n".join(server.lines[-40:]))
+    print(f"\n{sum(results)}/{len(results)} checks passed.")
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""
+Check that no endpoint sends more SQL statements than its budget.
+
+Drives each endpoint against a seeded scratch SQLite database (see
+endpoint_harness.py) while a QueryCounter records the statements each request
+sends, and fails if any route exceeds its entry in QUERY_BUDGETS. Seeded groups
+have several members and expenses, so a query issued per row (an N+1) pushes
+the count well past the budget instead of slipping through.
+
+Counts include the user lookup in get_current_user (the user cache is cleared
+before each call). When a change legitimately needs more queries, raise the
+budget and update its comment in the same commit.
+
+Usage (from the backend/ directory):
+    python check_query_budgets.py
+"""
+import sys
+from endpoint_harness import exercise, cleanup
+
+# Each budget is the statements the route needs whatever the data size, listed
+# in the comment; "auth" is get_current_user's user lookup. None of them grows
+# with the number of members, expenses, payers or shares involved, so a query
+# per row goes over budget.
+QUERY_BUDGETS = {
+    # user by email
+    "POST /auth/token": 1,
+    # user by id
+    "GET /auth/users/{user_id}": 1,
+    # auth, user, UPDATE name, the user's group ids, bump their versions, reload the user
+    "PUT /auth/users/me/name": 6,
+    # auth, groups joined to memberships
+    "GET /api/groups": 2,
+    # auth, groups joined to memberships and group_stats
+    "GET /api/groups/summary": 2,
+    # group by id
+    "GET /api/groups/{group_id}": 1,
+    # group, members joined to users
+    "GET /api/groups/{group_id}/members": 2,
+    # auth, membership and version, members joined to their ledger rows
+    "GET /api/groups/{group_id}/summary": 3,
+    # auth, the user's groups joined to their ledger rows
+    "GET /api/me/balances": 2,
+    # auth, membership and version, one page of expenses
+    "GET /api/groups/{group_id}/expenses": 3,
+    # auth, one page of expenses, the page's payers, the page's shares
+    "GET /api/expenses": 4,
+    # auth, membership, then per 1000 expenses: the page of expenses, its payers and shares
+    "GET /api/groups/{group_id}/export": 4,
+    # expense by id
+    "GET /api/expenses/{expense_id}": 1,
+    # expense, its payers, its shares
+    "GET /api/expenses/{expense_id}/details": 3,
+    # group, INSERT expense, INSERT payers, INSERT shares, ledger upsert, stats, version, reload the expense
+    "POST /api/expenses": 8,
+    # auth, memberships of the groups, INSERT expenses, INSERT payers, INSERT shares,
+    # then per group (one here) ledger upsert and stats, and one version bump
+    "POST /api/expenses/bulk": 8,
+    # expense, UPDATE expense, old payers, old shares, ledger upsert reversing them,
+    # DELETE payers, DELETE shares, INSERT payers, INSERT shares, ledger upsert, stats,
+    # version, reload the expense
+    "PUT /api/expenses/{expense_id}": 13,
+    # expense, its payers, its shares, ledger upsert, DELETE expense (cascades), stats, version
+    "DELETE /api/expenses/{expense_id}": 7,
+    # auth, INSERT expense, INSERT payer, INSERT share, ledger upsert, stats, version, reload the expense
+    "POST /api/groups/{group_id}/settle": 8,
+    # group, invitee, existing membership, pending invitation, auth, INSERT outbox email, INSERT invitation
+    "POST /api/groups/{group_id}/invite": 7,
+    # auth, group, UPDATE name, version, reload the group
+    "PUT /api/groups/{group_id}": 5,
+    # membership, DELETE membership, stats, version
+    "DELETE /api/groups/{group_id}/members/{user_id}": 4,
+    # user, existing token, INSERT outbox email, INSERT token
+    "POST /auth/forgot-password": 4,
+    # auth, group, DELETE group (cascades)
+    "DELETE /api/groups/{group_id}": 3,
+    # token
+    "GET /auth/reset-password/{token}": 1,
+    # token, user, UPDATE password, mark the token used
+    "POST /auth/reset-password": 4,
+}
+
+
+def main():
+    failures = []
+    print(f"{'route':<50} {'queries':>7} {'budget':>6}")
+    for route, queries in exercise():
+        budget = QUERY_BUDGETS.get(route)
+        print(f"{route:<50} {queries.count:>7} {budget if budget is not None else '-':>6}")
+        if budget is None:
+            failures.append(f"{route} has no query budget; add one to QUERY_BUDGETS")
+        elif queries.count > budget:
+            statements = "\n    ".join(" ".join(s.split())[:160] for s, _, _ in queries.statements)
+            failures.append(f"{route} sent {queries.count} statements, budget is {budget}:\n    {statements}")
+    cleanup()
+
+    for failure in failures:
+        print(f"\n{failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+"""
+Check that every query the routers run is served by an index.
+
+Drives each endpoint against a seeded scratch SQLite database (see
+endpoint_harness.py), then runs EXPLAIN QUERY PLAN on every statement it sent.
+Exits non-zero if any plan contains a full table scan, so a missing index
+shows up before it reaches production.
+
+Usage (from the backend/ directory):
+    python check_query_plans.py
+"""
+import re
+import sqlite3
+import sys
+from endpoint_harness import DB_PATH, exercise, cleanup
+from sqlmodel import SQLModel
+
+# SQLite reports a full scan as "SCAN <table>"; "SCAN <table> USING INDEX" walks an index instead
+FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?! USING)(?:\s|$)")
+
+
+def main():
+    statements = []
+    for route, queries in exercise():
+        for statement, parameters, executemany in queries.statements:
+            if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "WITH")):
+                # One parameter set is enough to get the plan of an executemany
+                statements.append((route, statement, parameters[0] if executemany else parameters))
+
+    tables = set(SQLModel.metadata.tables)
+    failures = []
+    checked = set()
+    conn = sqlite3.connect(DB_PATH)
+    for route, statement, parameters in statements:
+        if statement in checked:
+            continue
+        checked.add(statement)
+        plan = conn.execute(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+        for _, _, _, detail in plan:
+            match = FULL_SCAN.match(detail)
+            if match and match.group(1) in tables:
+                failures.append((route, match.group(1), " ".join(statement.split())))
+    conn.close()
+    cleanup()
+
+    print(f"Checked {len(checked)} distinct statements from {len({r for r, _, _ in statements})} routes.")
+    for route, table, statement in failures:
+        print(f"\nFULL SCAN of {table} in {route}:\n  {statement}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
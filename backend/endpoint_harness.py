@@ -0,0 +1,162 @@
+"""
+Shared scaffolding for the check_*.py scripts: points the app at a throwaway
+SQLite database, seeds it through the migrations, and calls every endpoint
+in-process while recording the SQL each call sends.
+
+Import this module before anything from `app`, since the settings read the
+database URL at import time.
+"""
+import os
+import shutil
+import tempfile
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="splitmoney-check-"), "check.db")
+
+# Point the app at the scratch database before app.config is imported
+os.environ["ENVIRONMENT"] = "development"
+os.environ["DATABASE_URL_DEV"] = f"sqlite:///{DB_PATH}"
+# The outbox sender polls in the background, which would add to every route's count
+os.environ["EMAIL_OUTBOX_WORKER"] = "False"
+os.environ.setdefault("SECRET_KEY", "endpoint-check")
+os.environ.setdefault("ALGORITHM", "HS256")
+for name, value in {"MAIL_USERNAME": "check", "MAIL_PASSWORD": "check", "MAIL_FROM": "check@example.com",
+                    "MAIL_SERVER": "localhost"}.items():
+    os.environ.setdefault(name, value)
+
+from alembic import command
+from alembic.config import Config
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+from app.auth_utils import create_access_token
+from app.database import engine, async_engine
+from app.hashing import get_pwd_context
+from app.main import app
+from app.models import User, Group, GroupStats, Membership, Expense, ExpensePayer, ExpenseShare, PasswordResetToken
+from app.query_counter import QueryCounter
+from app.user_cache import user_cache
+
+# Enough groups that any one of them is a small slice of each table, as in
+# production; with only a handful the planner rightly prefers to scan
+USERS = 200
+GROUPS = 40
+MEMBERS_PER_GROUP = 8
+EXPENSES_PER_GROUP = 50
+PASSWORD = "Passw0rdX"
+
+
+def seed():
+    command.upgrade(Config(os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")), "head")
+    password_hash = get_pwd_context().hash(PASSWORD)
+    with Session(engine) as session:
+        users = [User(email=f"user{i}@example.com", name=f"user{i}", password_hash=password_hash) for i in range(USERS)]
+        session.add_all(users)
+        session.flush()
+        for g in range(GROUPS):
+            group = Group(name=f"group{g}", created_by=users[0].id)
+            session.add(group)
+            session.flush()
+            # The first user belongs to the first few groups only
+            start = 1 + (g * MEMBERS_PER_GROUP) % (USERS - MEMBERS_PER_GROUP)
+            members = users[start:start + MEMBERS_PER_GROUP]
+            if g < 3:
+                members = [users[0]] + members
+            session.add_all(Membership(user_id=u.id, group_id=group.id) for u in members)
+            for e in range(EXPENSES_PER_GROUP):
+                expense = Expense(group_id=group.id, description=f"expense {e}", total_amount=len(members))
+                session.add(expense)
+                session.flush()
+                session.add(ExpensePayer(expense_id=expense.id, user_id=members[e % len(members)].id, paid_amount=len(members)))
+                session.add_all(ExpenseShare(expense_id=expense.id, user_id=u.id, share_amount=1) for u in members)
+            session.add(GroupStats(group_id=group.id, member_count=len(members), expense_count=EXPENSES_PER_GROUP,
+                                   total_spent=EXPENSES_PER_GROUP * len(members)))
+        session.commit()
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+
+
+def endpoint_calls():
+    """
+    (method, route template, path params, request kwargs, authenticated) for every
+    endpoint, in an order where each call's data still exists.
+    """
+    with Session(engine) as session:
+        owner = session.get(User, 1)
+        outsider = session.get(User, USERS)
+        expense_id = session.exec(select(Expense.id).where(Expense.group_id == 1)).first()
+        members = session.exec(select(Membership.user_id).where(Membership.group_id == 1)).all()
+    # Split between every member, so a statement per payer or share would show
+    # up as several extra statements against the write budgets
+    new_expense = {
+        "group_id": 1, "description": "check", "total_amount": len(members),
+        "payers": [{"user_id": user_id, "paid_amount": len(members) / 2} for user_id in members[:2]],
+        "shares": [{"user_id": user_id, "share_amount": 1} for user_id in members],
+    }
+    expense = {"expense_id": expense_id}
+    group = {"group_id": 1}
+
+    return [
+        ("POST", "/auth/token", {}, {"data": {"username": owner.email, "password": PASSWORD}}, False),
+        ("GET", "/auth/users/{user_id}", {"user_id": owner.id}, {}, True),
+        ("PUT", "/auth/users/me/name", {}, {"json": {"name": "owner"}}, True),
+        ("GET", "/api/groups", {}, {}, True),
+        ("GET", "/api/groups/summary", {}, {}, True),
+        ("GET", "/api/groups/{group_id}", group, {}, True),
+        ("GET", "/api/groups/{group_id}/members", group, {}, True),
+        ("GET", "/api/groups/{group_id}/summary", group, {}, True),
+        ("GET", "/api/me/balances", {}, {}, True),
+        ("GET", "/api/groups/{group_id}/expenses", group, {"params": {"limit": 10, "type": "regular", "participant_id": 2}}, True),
+        ("GET", "/api/expenses", {}, {"params": {"limit": 10}}, True),
+        ("GET", "/api/expenses", {}, {"params": {"group_id": 1, "start": "2000-01-01T00:00:00", "participant_id": 2}}, True),
+        ("GET", "/api/groups/{group_id}/export", group, {"params": {"format": "ndjson"}}, True),
+        ("GET", "/api/expenses/{expense_id}", expense, {}, True),
+        ("GET", "/api/expenses/{expense_id}/details", expense, {}, True),
+        ("POST", "/api/expenses", {}, {"json": new_expense}, True),
+        ("POST", "/api/expenses/bulk", {}, {"json": {"expenses": [new_expense, new_expense]}}, True),
+        ("PUT", "/api/expenses/{expense_id}", expense, {"json": new_expense}, True),
+        ("DELETE", "/api/expenses/{expense_id}", expense, {}, True),
+        ("POST", "/api/groups/{group_id}/settle", group, {"json": {"to_user_id": 2, "amount": 1}}, True),
+        ("POST", "/api/groups/{group_id}/invite", group, {"json": {"email": outsider.email}}, True),
+        ("PUT", "/api/groups/{group_id}", group, {"json": {"name": "renamed"}}, True),
+        ("DELETE", "/api/groups/{group_id}/members/{user_id}", {"group_id": 1, "user_id": 3}, {}, True),
+        ("POST", "/auth/forgot-password", {}, {"json": {"email": owner.email}}, False),
+        ("DELETE", "/api/groups/{group_id}", {"group_id": 2}, {}, True),
+    ]
+
+
+def reset_calls():
+    """The reset endpoints, which need the token created by forgot-password."""
+    with Session(engine) as session:
+        token = session.exec(select(PasswordResetToken.token).where(PasswordResetToken.used == False)).first()
+    return [
+        ("GET", "/auth/reset-password/{token}", {"token": token}, {}, False),
+        ("POST", "/auth/reset-password", {}, {"json": {"token": token, "new_password": "N3wPassword"}}, False),
+    ]
+
+
+def exercise():
+    """
+    Seeds the database, then calls each endpoint once and yields
+    ("METHOD /route/{template}", QueryCounter) for every call. The user cache
+    is cleared first so each count includes the authentication lookup.
+    """
+    seed()
+    headers = {"Authorization": f"Bearer {create_access_token(data={'sub': '1'})}"}
+    try:
+        with TestClient(app) as client:
+            for calls in (endpoint_calls, reset_calls):
+                for method, template, path_params, kwargs, authenticated in calls():
+                    path = template.format(**path_params)
+                    user_cache.clear()
+                    with QueryCounter(async_engine) as queries:
+                        response = client.request(method, path, headers=headers if authenticated else {}, **kwargs)
+                    if response.status_code >= 400:
+                        raise RuntimeError(f"{method} {path} returned {response.status_code}: {response.text}")
+                    yield f"{method} {template}", queries
+            # Close the aiosqlite connections on the loop that opened them
+            client.portal.call(async_engine.dispose)
+    finally:
+        engine.dispose()
+
+
+def cleanup():
+    shutil.rmtree(os.path.dirname(DB_PATH), ignore_errors=True)
@@ -0,0 +1,152 @@
+"""initial schema
+
+The tables as setup_db.py created them before migrations existed. Constraint
+names follow the Postgres defaults so later migrations can refer to them. On a
+database from that setup_db.py, only the tables it lacks are created.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 22:32:42.923055
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # A database that setup_db.py created before migrations existed already has
+    # the original tables; only the missing ones (group_balances) are created, so
+    # `alembic upgrade head` brings it up to date like any other database
+    existing = set() if context.is_offline_mode() else set(sa.inspect(op.get_bind()).get_table_names())
+    if 'users' not in existing:
+        op.create_table('users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('email', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('name', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('password_hash', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('created_at', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('id', name='users_pkey')
+        )
+        with op.batch_alter_table('users', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_users_email'), ['email'], unique=True)
+    if 'groups' not in existing:
+        op.create_table('groups',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('created_by', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['created_by'], ['users.id'], name='groups_created_by_fkey'),
+        sa.PrimaryKeyConstraint('id', name='groups_pkey')
+        )
+    if 'password_reset_tokens' not in existing:
+        op.create_table('password_reset_tokens',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('token', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('expires_at', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column('used', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], name='password_reset_tokens_user_id_fkey'),
+        sa.PrimaryKeyConstraint('id', name='password_reset_tokens_pkey')
+        )
+        with op.batch_alter_table('password_reset_tokens', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_password_reset_tokens_token'), ['token'], unique=True)
+    if 'expenses' not in existing:
+        op.create_table('expenses',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('group_id', sa.Integer(), nullable=False),
+        sa.Column('description', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('type', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('total_amount', sa.Float(), nullable=False),
+        sa.Column('created_at', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['group_id'], ['groups.id'], name='expenses_group_id_fkey'),
+        sa.PrimaryKeyConstraint('id', name='expenses_pkey')
+        )
+    if 'group_balances' not in existing:
+        op.create_table('group_balances',
+        sa.Column('group_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('net_balance', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['group_id'], ['groups.id'], name='group_balances_group_id_fkey'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], name='group_balances_user_id_fkey'),
+        sa.PrimaryKeyConstraint('group_id', 'user_id', name='group_balances_pkey')
+        )
+    if 'group_invitations' not in existing:
+        op.create_table('group_invitations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('group_id', sa.Integer(), nullable=False),
+        sa.Column('invitee_email', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('token', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('expires_at', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column('status', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('created_at', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['group_id'], ['groups.id'], name='group_invitations_group_id_fkey'),
+        sa.PrimaryKeyConstraint('id', name='group_invitations_pkey')
+        )
+        with op.batch_alter_table('group_invitations', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_group_invitations_invitee_email'), ['invitee_email'], unique=False)
+            batch_op.create_index(batch_op.f('ix_group_invitations_token'), ['token'], unique=True)
+    if 'memberships' not in existing:
+        op.create_table('memberships',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('group_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['group_id'], ['groups.id'], name='memberships_group_id_fkey'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], name='memberships_user_id_fkey'),
+        sa.PrimaryKeyConstraint('id', name='memberships_pkey'),
+        sa.UniqueConstraint('user_id', 'group_id', name='memberships_user_id_group_id_key')
+        )
+    if 'expense_payers' not in existing:
+        op.create_table('expense_payers',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('expense_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('paid_amount', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['expense_id'], ['expenses.id'], name='expense_payers_expense_id_fkey'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], name='expense_payers_user_id_fkey'),
+        sa.PrimaryKeyConstraint('id', name='expense_payers_pkey')
+        )
+    if 'expense_shares' not in existing:
+        op.create_table('expense_shares',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('expense_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('share_amount', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['expense_id'], ['expenses.id'], name='expense_shares_expense_id_fkey'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], name='expense_shares_user_id_fkey'),
+        sa.PrimaryKeyConstraint('id', name='expense_shares_pkey')
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('expense_shares')
+    op.drop_table('expense_payers')
+    op.drop_table('memberships')
+    with op.batch_alter_table('group_invitations', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_group_invitations_token'))
+        batch_op.drop_index(batch_op.f('ix_group_invitations_invitee_email'))
+
+    op.drop_table('group_invitations')
+    op.drop_table('group_balances')
+    op.drop_table('expenses')
+    with op.batch_alter_table('password_reset_tokens', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_password_reset_tokens_token'))
+
+    op.drop_table('password_reset_tokens')
+    op.drop_table('groups')
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_users_email'))
+
+    op.drop_table('users')
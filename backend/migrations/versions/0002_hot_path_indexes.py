@@ -0,0 +1,66 @@
+"""hot path indexes
+
+Composite indexes for the filters the routers actually run: expenses by group in
+(created_at, id) order, payers/shares by expense (and participant), memberships
+by group, invitations by (group, email) and reset tokens by user.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 22:33:03.912857
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('expense_payers', schema=None) as batch_op:
+        batch_op.create_index('ix_expense_payers_expense_id_user_id', ['expense_id', 'user_id'], unique=False)
+
+    with op.batch_alter_table('expense_shares', schema=None) as batch_op:
+        batch_op.create_index('ix_expense_shares_expense_id_user_id', ['expense_id', 'user_id'], unique=False)
+
+    with op.batch_alter_table('expenses', schema=None) as batch_op:
+        batch_op.create_index('ix_expenses_group_id_created_at_id', ['group_id', 'created_at', 'id'], unique=False)
+
+    with op.batch_alter_table('group_invitations', schema=None) as batch_op:
+        batch_op.create_index('ix_group_invitations_group_id_invitee_email', ['group_id', 'invitee_email'], unique=False)
+
+    with op.batch_alter_table('memberships', schema=None) as batch_op:
+        batch_op.create_index('ix_memberships_group_id_user_id', ['group_id', 'user_id'], unique=False)
+
+    with op.batch_alter_table('password_reset_tokens', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_password_reset_tokens_user_id'), ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('password_reset_tokens', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_password_reset_tokens_user_id'))
+
+    with op.batch_alter_table('memberships', schema=None) as batch_op:
+        batch_op.drop_index('ix_memberships_group_id_user_id')
+
+    with op.batch_alter_table('group_invitations', schema=None) as batch_op:
+        batch_op.drop_index('ix_group_invitations_group_id_invitee_email')
+
+    with op.batch_alter_table('expenses', schema=None) as batch_op:
+        batch_op.drop_index('ix_expenses_group_id_created_at_id')
+
+    with op.batch_alter_table('expense_shares', schema=None) as batch_op:
+        batch_op.drop_index('ix_expense_shares_expense_id_user_id')
+
+    with op.batch_alter_table('expense_payers', schema=None) as batch_op:
+        batch_op.drop_index('ix_expense_payers_expense_id_user_id')
+
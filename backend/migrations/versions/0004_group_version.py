@@ -0,0 +1,35 @@
+"""group version
+
+A per-group counter bumped by every write that changes what the group's read
+endpoints return; ETags for conditional GETs are derived from it. Existing
+groups start at version 1.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 22:47:55.392249
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('groups', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('groups', schema=None) as batch_op:
+        batch_op.drop_column('version')
@@ -0,0 +1,60 @@
+"""cascade deletes
+
+Recreates the foreign keys from a group's or an expense's own rows to their
+parent with ON DELETE CASCADE, so the database removes memberships, expenses
+(with their payers and shares), ledger rows and invitations along with the
+group. Each constraint keeps its name.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 22:50:52.631053
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (table, column, referenced table) of every foreign key that cascades
+CASCADING_FOREIGN_KEYS = [
+    ('expense_payers', 'expense_id', 'expenses'),
+    ('expense_shares', 'expense_id', 'expenses'),
+    ('expenses', 'group_id', 'groups'),
+    ('group_balances', 'group_id', 'groups'),
+    ('group_invitations', 'group_id', 'groups'),
+    ('memberships', 'group_id', 'groups'),
+]
+
+
+# Databases that setup_db.py built with create_all before migrations existed
+# have unnamed foreign keys on SQLite. Batch mode reflects those and names them
+# by this convention, which is the Postgres default the constraints carry
+# everywhere else, so they can be dropped by name either way.
+NAMING_CONVENTION = {'fk': '%(table_name)s_%(column_0_name)s_fkey'}
+
+
+def recreate_foreign_keys(ondelete) -> None:
+    for table, column, referred_table in CASCADING_FOREIGN_KEYS:
+        name = f'{table}_{column}_fkey'
+        with op.batch_alter_table(table, schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+            batch_op.drop_constraint(name, type_='foreignkey')
+            batch_op.create_foreign_key(name, referred_table, [column], ['id'], ondelete=ondelete)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    recreate_foreign_keys('CASCADE')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    recreate_foreign_keys(None)
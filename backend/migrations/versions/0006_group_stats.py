@@ -0,0 +1,53 @@
+"""group stats
+
+Per-group member count, expense count, total spent and last activity for the
+groups overview, kept up to date by the membership and expense endpoints.
+Existing groups are backfilled from the source tables; their last activity
+starts at their newest expense (or creation), the latest time those tables
+record.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 22:54:39.229088
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, Sequence[str], None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('group_stats',
+    sa.Column('group_id', sa.Integer(), nullable=False),
+    sa.Column('member_count', sa.Integer(), nullable=False),
+    sa.Column('expense_count', sa.Integer(), nullable=False),
+    sa.Column('total_spent', sa.Float(), nullable=False),
+    sa.Column('last_activity_at', sa.TIMESTAMP(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['group_id'], ['groups.id'], name='group_stats_group_id_fkey', ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('group_id', name='group_stats_pkey')
+    )
+    op.execute("""
+        INSERT INTO group_stats (group_id, member_count, expense_count, total_spent, last_activity_at)
+        SELECT
+            g.id,
+            (SELECT count(*) FROM memberships m WHERE m.group_id = g.id),
+            (SELECT count(*) FROM expenses e WHERE e.group_id = g.id),
+            (SELECT coalesce(sum(e.total_amount), 0) FROM expenses e WHERE e.group_id = g.id AND e.type = 'regular'),
+            coalesce((SELECT max(e.created_at) FROM expenses e WHERE e.group_id = g.id), g.created_at)
+        FROM groups g
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('group_stats')
@@ -0,0 +1,85 @@
+import argparse
+import asyncio
+import sys
+from typing import Callable, NamedTuple
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.database import async_engine
+from app.models import Group
+from app import group_stats, ledger
+
+
+class Target(NamedTuple):
+    """A table derived from the source tables, with its module's find_drift/rebuild_group."""
+    name: str
+    module: object
+    # What the drift entries count, e.g. "member(s)"
+    unit: str
+    describe: Callable[[dict], str]
+
+
+TARGETS = {
+    target.name: target for target in (
+        # group_balances, from the raw expense_payers/expense_shares tables
+        Target("ledger", ledger, "member(s)",
+               lambda entry: f"user {entry['user_id']}: ledger={entry['actual']:.2f} expected={entry['expected']:.2f}"),
+        # group_stats, from the memberships and expenses tables
+        Target("stats", group_stats, "stat(s)",
+               lambda entry: f"{entry['field']}: stored={entry['actual']} expected={entry['expected']}"),
+    )
+}
+
+
+async def rebuild(session: AsyncSession, target: Target, group_ids, verify: bool) -> int:
+    """Checks each group against the source tables and rebuilds the ones that drifted; returns how many did."""
+    drifted_groups = 0
+    for group_id in group_ids:
+        drift = await target.module.find_drift(session, group_id)
+        if not drift:
+            continue
+        drifted_groups += 1
+        print(f"Group {group_id}: {len(drift)} {target.unit} out of sync")
+        for entry in drift:
+            print(f"  {target.describe(entry)}")
+        if not verify:
+            await target.module.rebuild_group(session, group_id)
+            await session.commit()
+            print(f"  rebuilt {target.name} for group {group_id}")
+    print(f"{target.name}: checked {len(group_ids)} group(s), {drifted_groups} with drift.")
+    return drifted_groups
+
+
+async def run(args):
+    """
+    Recompute the derived tables (the group_balances ledger, the group_stats
+    table, or both) from the tables they summarize.
+    With --verify, only report drift without changing anything.
+    """
+    try:
+        async with AsyncSession(async_engine) as session:
+            if args.group_id is not None:
+                group_ids = [args.group_id]
+            else:
+                group_ids = (await session.exec(select(Group.id).order_by(Group.id))).all()
+
+            drifted = 0
+            for name in args.target or TARGETS:
+                drifted += await rebuild(session, TARGETS[name], group_ids, args.verify)
+            # A non-zero exit lets --verify be used as a health check
+            return 1 if args.verify and drifted else 0
+    except Exception as e:
+        print(f"Error rebuilding: {e}")
+        return 1
+    finally:
+        await async_engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild or verify the group balance ledger and the per-group stats.")
+    parser.add_argument("--target", choices=list(TARGETS), action="append",
+                        help="only process this table: ledger (group_balances) or stats (group_stats); default both")
+    parser.add_argument("--verify", action="store_true", help="report drift without rewriting anything")
+    parser.add_argument("--group-id", type=int, help="only process this group")
+    return asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,21 @@
 import uvicorn
 from app.main import app
+from app.config import settings
 import os
 
 if __name__ == "__main__":
     is_dev = os.getenv("ENVIRONMENT", "development") == "development"
+    # Several worker processes share the port; one of them is elected to run
+    # the scheduled jobs (see app/leader.py). Reload only works with one
+    workers = int(os.getenv("WEB_CONCURRENCY", 1))
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
-        port=8000,
-        reload=is_dev
-    )
\ No newline at end of file
+        port=int(os.getenv("PORT", 8000)),
+        reload=is_dev and workers == 1,
+        workers=workers,
+        # The client address (and so the auth rate limits' per-IP bucket) comes
+        # from X-Forwarded-For only when the peer is one of these proxies
+        proxy_headers=True,
+        forwarded_allow_ips=settings.trusted_proxies,
+    )
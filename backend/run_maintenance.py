@@ -0,0 +1,33 @@
+import argparse
+import sys
+from app.config import settings
+from app.database import engine
+from app import maintenance
+
+def run(args):
+    """
+    Run the retention jobs once, outside the API's scheduler, e.g. to catch up
+    after a long outage or from cron when the scheduler is disabled.
+    """
+    rules = [rule for rule in maintenance.RETENTION_RULES if not args.job or rule.name in args.job]
+    try:
+        for rule in rules:
+            deleted = maintenance.purge(rule, args.chunk_size, args.pause)
+            print(f"{rule.name}: removed {deleted} row(s)")
+        return 0
+    except Exception as e:
+        print(f"Error running maintenance: {e}")
+        return 1
+    finally:
+        engine.dispose()
+
+def main():
+    names = [rule.name for rule in maintenance.RETENTION_RULES]
+    parser = argparse.ArgumentParser(description="Delete expired invitations, reset tokens and old outbox emails.")
+    parser.add_argument("--job", action="append", choices=names, help="only run this job (repeatable)")
+    parser.add_argument("--chunk-size", type=int, default=settings.maintenance_chunk_size, help="rows per delete")
+    parser.add_argument("--pause", type=float, default=settings.maintenance_chunk_pause, help="seconds between deletes")
+    return run(parser.parse_args())
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+"""
+Fill the configured database with a synthetic but realistic dataset.
+
+Users, groups, memberships, expenses with their payers and shares, and the
+matching group_balances ledger rows are all generated from the models in
+app/models.py and written with multi-row inserts, so even large datasets load
+in seconds. Every user gets the same password (SEED_PASSWORD) so the data can
+be used to log in. The schema must already exist (python setup_db.py or
+alembic upgrade head).
+
+Usage (from the backend/ directory):
+    python seed_data.py --users 1000 --groups 200 --members 8 --expenses 100 --payers 1 --shares 4
+"""
+import argparse
+import random
+import secrets
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, NamedTuple
+from sqlalchemy import insert
+from sqlmodel import Session
+from app.database import engine
+from app.hashing import get_pwd_context
+from app.models import User, Group, Membership, Expense, ExpensePayer, ExpenseShare, GroupBalance, GroupStats
+
+SEED_PASSWORD = "SeedPassw0rd"
+
+# Rows per INSERT statement
+CHUNK_SIZE = 1000
+
+
+class SeededData(NamedTuple):
+    user_ids: List[int]
+    user_emails: Dict[int, str]
+    # group id -> member user ids
+    members: Dict[int, List[int]]
+
+
+def _split_cents(total_cents: int, parts: int) -> List[int]:
+    """Splits an amount into `parts` integer-cent pieces that add up exactly."""
+    base, remainder = divmod(total_cents, parts)
+    return [base + (1 if i < remainder else 0) for i in range(parts)]
+
+
+def _insert_returning_ids(session: Session, model, rows: List[dict]) -> List[int]:
+    """Inserts `rows` and returns their ids, in the same order as `rows`."""
+    # SQLAlchemy can't match SQLite's RETURNING rows to their parameters, so
+    # sort_by_parameter_order would send one INSERT per row there. SQLite has one
+    # writer at a time and hands out rowids in VALUES order, so the sorted ids
+    # of each chunk are in row order.
+    ordered = session.bind.dialect.name != "sqlite"
+    ids = []
+    for i in range(0, len(rows), CHUNK_SIZE):
+        result = session.execute(
+            insert(model).returning(model.id, sort_by_parameter_order=ordered),
+            rows[i:i + CHUNK_SIZE],
+        )
+        ids.extend(result.scalars().all() if ordered else sorted(result.scalars().all()))
+    return ids
+
+
+def _insert(session: Session, model, rows: List[dict]):
+    for i in range(0, len(rows), CHUNK_SIZE):
+        session.execute(insert(model), rows[i:i + CHUNK_SIZE])
+
+
+def seed(
+    users: int = 100,
+    groups: int = 20,
+    members_per_group: int = 5,
+    expenses_per_group: int = 50,
+    payers_per_expense: int = 1,
+    shares_per_expense: int = 3,
+    random_seed: int = 0,
+    db_engine=engine,
+) -> SeededData:
+    """
+    Writes the dataset in one transaction and returns the generated ids. Payers and
+    shares are drawn from the group's members, so they are capped at members_per_group.
+    Expenses are spread over the past year.
+    """
+    if members_per_group > users:
+        raise ValueError("members_per_group cannot exceed users")
+    payers_per_expense = max(1, min(payers_per_expense, members_per_group))
+    shares_per_expense = max(1, min(shares_per_expense, members_per_group))
+
+    rng = random.Random(random_seed)
+    # Unique per run, so seeding twice into the same database doesn't collide on email
+    tag = secrets.token_hex(3)
+    password_hash = get_pwd_context().hash(SEED_PASSWORD)
+    now = datetime.now(timezone.utc)
+
+    with Session(db_engine) as session:
+        emails = [f"seed-{tag}-{i}@example.com" for i in range(users)]
+        user_ids = _insert_returning_ids(session, User, [
+            {"email": email, "name": f"Seed User {i}", "password_hash": password_hash, "created_at": now}
+            for i, email in enumerate(emails)
+        ])
+
+        group_members = [rng.sample(user_ids, members_per_group) for _ in range(groups)]
+        group_ids = _insert_returning_ids(session, Group, [
+            {"name": f"Seed Group {g}", "created_by": members[0], "created_at": now}
+            for g, members in enumerate(group_members)
+        ])
+        members = dict(zip(group_ids, group_members))
+        _insert(session, Membership, [
+            {"user_id": user_id, "group_id": group_id}
+            for group_id, user_ids_in_group in members.items()
+            for user_id in user_ids_in_group
+        ])
+
+        for group_id, user_ids_in_group in members.items():
+            expense_rows, splits = [], []
+            for e in range(expenses_per_group):
+                total_cents = rng.randint(100, 50000)
+                payers = rng.sample(user_ids_in_group, payers_per_expense)
+                sharers = rng.sample(user_ids_in_group, shares_per_expense)
+                expense_rows.append({
+                    "group_id": group_id,
+                    "description": f"Seed expense {e}",
+                    "type": "regular",
+                    "total_amount": total_cents / 100,
+                    "created_at": now - timedelta(seconds=rng.randint(0, 365 * 24 * 3600)),
+                })
+                splits.append((
+                    list(zip(payers, _split_cents(total_cents, len(payers)))),
+                    list(zip(sharers, _split_cents(total_cents, len(sharers)))),
+                ))
+            expense_ids = _insert_returning_ids(session, Expense, expense_rows)
+            session.execute(insert(GroupStats).values(
+                group_id=group_id,
+                member_count=len(user_ids_in_group),
+                expense_count=len(expense_rows),
+                total_spent=sum(row["total_amount"] for row in expense_rows),
+                # Expenses are backdated, but the group itself was created (and last changed) now
+                last_activity_at=now,
+            ))
+
+            payer_rows, share_rows = [], []
+            balances = defaultdict(int)
+            for expense_id, (payers, shares) in zip(expense_ids, splits):
+                for user_id, cents in payers:
+                    payer_rows.append({"expense_id": expense_id, "user_id": user_id, "paid_amount": cents / 100})
+                    balances[user_id] += cents
+                for user_id, cents in shares:
+                    share_rows.append({"expense_id": expense_id, "user_id": user_id, "share_amount": cents / 100})
+                    balances[user_id] -= cents
+            _insert(session, ExpensePayer, payer_rows)
+            _insert(session, ExpenseShare, share_rows)
+            # Keep the ledger in step with the raw rows, as the expense endpoints do
+            _insert(session, GroupBalance, [
+                {"group_id": group_id, "user_id": user_id, "net_balance": cents / 100}
+                for user_id, cents in balances.items()
+            ])
+
+        session.commit()
+
+    return SeededData(user_ids=user_ids, user_emails=dict(zip(user_ids, emails)), members=members)
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Dataset-shape options, shared with the benchmark suite."""
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--groups", type=int, default=20)
+    parser.add_argument("--members", type=int, default=5, help="members per group")
+    parser.add_argument("--expenses", type=int, default=50, help="expenses per group")
+    parser.add_argument("--payers", type=int, default=1, help="payers per expense")
+    parser.add_argument("--shares", type=int, default=3, help="shares per expense")
+    parser.add_argument("--seed", type=int, default=0, help="random seed, for reproducible datasets")
+
+
+def seed_from_args(args, db_engine=engine) -> SeededData:
+    return seed(
+        users=args.users,
+        groups=args.groups,
+        members_per_group=args.members,
+        expenses_per_group=args.expenses,
+        payers_per_expense=args.payers,
+        shares_per_expense=args.shares,
+        random_seed=args.seed,
+        db_engine=db_engine,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    args = parser.parse_args()
+    data = seed_from_args(args)
+    expenses = args.groups * args.expenses
+    print(f"Seeded {len(data.user_ids)} users, {len(data.members)} groups and {expenses} expenses.")
+    print(f"Every seeded user's password is {SEED_PASSWORD!r}, e.g. {data.user_emails[data.user_ids[0]]}")
@@ -1,23 +1,31 @@
 import os
 import sys
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import text
 from app.database import engine
 from sqlmodel import SQLModel
 
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
+
 def main():
     """
     Setup the database tables for the SplitMoney application.
-    This will drop all existing tables and recreate them.
+    This will drop all existing tables and recreate them through the migrations.
+    For schema changes on a database with real data, run `alembic upgrade head` instead.
     """
     print("Setting up database tables...")
     try:
         print("Dropping all existing tables...")
         # Import all your models here so the metadata knows about them
-        from app.models import User, Group, Membership, Expense, ExpensePayer, ExpenseShare, GroupInvitation, PasswordResetToken
+        import app.models  # noqa: F401
         SQLModel.metadata.drop_all(engine)
+        with engine.begin() as conn:
+            conn.execute(text("DROP TABLE IF EXISTS alembic_version"))
         print("Tables dropped.")
         
         print("Creating new tables...")
-        SQLModel.metadata.create_all(engine)
+        command.upgrade(Config(ALEMBIC_INI), "head")
         print("Database setup complete!")
         return 0
     except Exception as e:
@@ -25,4 +33,4 @@ def main():
         return 1
 
 if __name__ == "__main__":
-    sys.exit(main())
\ No newline at end of file
+    sys.exit(main())
@@ -78,4 +78,18 @@ apiClient.interceptors.response.use(
 	}
 );
 
+// Follow next_cursor through a paginated list endpoint and return every item
+export const fetchAllPages = async (url, params = {}) => {
+	const items = [];
+	let cursor = null;
+	do {
+		const response = await apiClient.get(url, {
+			params: { ...params, limit: 200, ...(cursor ? { cursor } : {}) },
+		});
+		items.push(...response.data.items);
+		cursor = response.data.next_cursor;
+	} while (cursor);
+	return items;
+};
+
 export default apiClient;
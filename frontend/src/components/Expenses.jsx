@@ -2,7 +2,7 @@ import { useState, useEffect } from 'react';
 import { useAuth } from '../context/AuthContext';
 import { useNavigate, useLocation } from 'react-router-dom';
 import { toast } from 'react-toastify';
-import apiClient from '../api/apiClient';
+import apiClient, { fetchAllPages } from '../api/apiClient';
 import Spinner from './Spinner';
 
 
@@ -27,8 +27,7 @@ const Expenses = () => {
 
     const fetchExpenses = async () => {
         try {
-            const response = await apiClient.get('/api/expenses');
-            setExpenses(response.data);
+            setExpenses(await fetchAllPages('/api/expenses'));
         } catch (err) {
             setError('Failed to load expenses');
             toast.error('Failed to load expenses');
@@ -2,7 +2,7 @@ import { useState, useEffect } from 'react';
 import { useParams, useNavigate, useLocation } from 'react-router-dom';
 import { useAuth } from '../context/AuthContext';
 import { toast } from 'react-toastify';
-import apiClient from '../api/apiClient';
+import apiClient, { fetchAllPages } from '../api/apiClient';
 import ConfirmationModal from './ConfirmationModal';
 import EditExpenseModal from './EditExpenseModal';
 import { FontAwesomeIcon } from '@fortawesome/react-fontawesome';
@@ -76,8 +76,7 @@ const GroupDetails = () => {
 	const fetchGroupExpenses = async () => {
 		setExpensesLoading(true);
 		try {
-			const response = await apiClient.get(`/api/groups/${groupId}/expenses`);
-			const expenses = response.data;
+			const expenses = await fetchAllPages(`/api/groups/${groupId}/expenses`);
 	
 			// Fetch details for each expense in parallel
 			const detailedExpenses = await Promise.all(